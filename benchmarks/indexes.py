@@ -0,0 +1,119 @@
+"""This module is the benchmark of the lookups served by the indexes of the users table.
+
+A small and a large table are seeded, then the lookups by name and nickname are timed on both. With their index,
+a lookup takes about as long on the large table as on the small one, i.e. grows with log(rows); a full scan would
+be about `large / small` times slower.
+
+Example:
+    ```bash
+    python -m benchmarks.indexes --rows 1000 --rows 100000 --iterations 500 --output indexes.json
+    ```
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import orjson
+from sqlalchemy import Engine, create_engine, insert
+
+from database.models import Base, User
+from src.endpoints.v1.user import users_by_query
+
+COLUMNS = ("name", "nickname")
+
+
+def seed(path: Path, rows: int) -> Engine:
+    """Create a SQLite database with the given number of users, 10 per name and per nickname."""
+    path.unlink(missing_ok=True)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    users = [
+        {"name": f"name{i // 10}", "fullname": f"Full {i}", "nickname": f"nick{i % max(rows // 10, 1)}"}
+        for i in range(rows)
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), users)
+    return engine
+
+
+def median_lookup_time(engine: Engine, column_name: str, iterations: int = 200) -> float:
+    """Return the median time of a lookup by the given column, in seconds."""
+    timings = []
+    with engine.connect() as connection:
+        for i in range(iterations):
+            stmt = users_by_query(getattr(User, column_name), f"{column_name[:4]}{i}", 0).order_by(User.id).limit(101)
+            start = time.perf_counter()
+            connection.execute(stmt).all()
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def benchmark(rows: list[int], iterations: int) -> dict[str, Any]:
+    """Seed a table of each size and time the lookups by each indexed column.
+
+    Args:
+        rows (list[int]): The sizes of the tables.
+        iterations (int): The number of lookups timed per column and table.
+
+    Returns:
+        dict[str, Any]: The parameters, and the median lookup time in microseconds per column and table size.
+    """
+    lookups: dict[str, dict[str, float]] = {column_name: {} for column_name in COLUMNS}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in rows:
+            engine = seed(Path(directory) / f"index_benchmark_{size}.db", size)
+            for column_name in COLUMNS:
+                lookups[column_name][str(size)] = round(median_lookup_time(engine, column_name, iterations) * 1e6, 1)
+            engine.dispose()
+
+    return {"python": platform.python_version(), "rows": rows, "iterations": iterations, "lookup_us": lookups}
+
+
+def format_results(results: dict[str, Any]) -> str:
+    """Format the results as a table, with the ratio of the largest table to the smallest."""
+    sizes = [str(size) for size in results["rows"]]
+    lines = [
+        f"median lookup time in microseconds, {results['iterations']} lookups, Python {results['python']}",
+        f"{'column':<12}" + "".join(f"{size + ' rows':>16}" for size in sizes) + f"{'ratio':>10}",
+    ]
+    for column_name, timings in results["lookup_us"].items():
+        smallest, largest = timings[sizes[0]], timings[sizes[-1]]
+        ratio = f"{largest / smallest:.2f}" if smallest else "-"
+        lines.append(f"{column_name:<12}" + "".join(f"{timings[size]:>16}" for size in sizes) + f"{ratio:>10}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark from the command line.
+
+    Args:
+        argv (list[str] | None): The command line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: 0.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0] if __doc__ else None)
+    parser.add_argument("--rows", type=int, action="append", help="a table size, repeatable (default: 1000 50000)")
+    parser.add_argument("--iterations", type=int, default=200, help="lookups timed per column and table")
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    rows = sorted(args.rows or [1000, int(os.getenv("INDEX_BENCHMARK_ROWS", "50000"))])
+    results = benchmark(rows, args.iterations)
+    print(format_results(results))
+    if args.output is not None:
+        args.output.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""This module is the load and latency benchmark of the /v1 API.
+
+It drives `GET /v1/`, `POST /v1/users`, `GET /v1/users/{user_id}` and `DELETE /v1/users/{user_id}`
+at a given concurrency and reports the throughput and the p50/p95/p99 latency of each scenario.
+
+By default the application runs in-process (ASGI transport, lifespan included) on a temporary
+SQLite database. With `--url`, the benchmark targets a running server instead,
+e.g. `python -m src.server` against a local MariaDB.
+
+Example:
+    ```bash
+    # run and save the results
+    python -m benchmarks.load --requests 2000 --concurrency 32 --output results.json
+    # compare with a stored baseline, exit with status 1 if p95/p99 regressed by more than 20%
+    python -m benchmarks.load --baseline benchmarks/baseline.json --threshold 0.2
+    ```
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import AsyncExitStack
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import httpx
+import orjson
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Awaitable, Callable
+
+# The latency percentiles compared with the baseline
+COMPARED_METRICS = ("p95_ms", "p99_ms")
+
+
+@dataclass
+class ScenarioResult:
+    """The measurements of one scenario.
+
+    Attributes:
+        requests (int): The number of requests sent.
+        errors (int): The number of requests that failed or answered an unexpected status.
+        duration_s (float): The wall time of the scenario in seconds.
+        throughput_rps (float): The number of requests per second.
+        mean_ms (float): The mean latency in milliseconds.
+        p50_ms (float): The median latency in milliseconds.
+        p95_ms (float): The 95th percentile of the latency in milliseconds.
+        p99_ms (float): The 99th percentile of the latency in milliseconds.
+    """
+
+    requests: int
+    errors: int
+    duration_s: float
+    throughput_rps: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    @classmethod
+    def from_latencies(cls, latencies: list[float], errors: int, duration: float) -> ScenarioResult:
+        """Summarize the latencies (in seconds) of a scenario.
+
+        Args:
+            latencies (list[float]): The latency of each request, in seconds.
+            errors (int): The number of failed requests.
+            duration (float): The wall time of the scenario, in seconds.
+
+        Returns:
+            ScenarioResult: The summary.
+        """
+        milliseconds = [latency * 1000 for latency in latencies] or [0.0]
+        # 99 cut points: quantiles[n - 1] is the n-th percentile
+        quantiles = statistics.quantiles(milliseconds * 2 if len(milliseconds) == 1 else milliseconds, n=100)
+        return cls(
+            requests=len(latencies),
+            errors=errors,
+            duration_s=round(duration, 4),
+            throughput_rps=round(len(latencies) / duration, 2) if duration > 0 else 0.0,
+            mean_ms=round(statistics.fmean(milliseconds), 3),
+            p50_ms=round(quantiles[49], 3),
+            p95_ms=round(quantiles[94], 3),
+            p99_ms=round(quantiles[98], 3),
+        )
+
+
+async def run_scenario(requests: int, concurrency: int, send: Callable[[int], Awaitable[bool]]) -> ScenarioResult:
+    """Send `requests` requests with `concurrency` requests in flight at a time.
+
+    Args:
+        requests (int): The number of requests.
+        concurrency (int): The number of concurrent workers.
+        send (Callable[[int], Awaitable[bool]]): Sends the i-th request and returns whether it succeeded.
+
+    Returns:
+        ScenarioResult: The measurements.
+    """
+    latencies: list[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal errors, next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                ok = await send(index)
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return ScenarioResult.from_latencies(latencies, errors, time.perf_counter() - start)
+
+
+async def run_benchmark(client: httpx.AsyncClient, requests: int, concurrency: int) -> dict[str, ScenarioResult]:
+    """Run every scenario against the client, in order: version, create, get, delete.
+
+    The users created by the create scenario are read and then deleted by the next ones.
+
+    Args:
+        client (httpx.AsyncClient): The client of the application.
+        requests (int): The number of requests per scenario.
+        concurrency (int): The number of concurrent requests.
+
+    Returns:
+        dict[str, ScenarioResult]: The measurements per scenario.
+    """
+    user_ids: list[int] = []
+
+    async def get_version(_: int) -> bool:
+        return (await client.get("/v1/")).status_code == 200
+
+    async def create_user(index: int) -> bool:
+        user = {"name": f"bench{index}", "fullname": f"Bench User {index}", "nickname": f"b{index}"}
+        response = await client.post("/v1/users", json=user)
+        if response.status_code != 200:
+            return False
+        user_ids.append(response.json()["id"])
+        return True
+
+    async def get_user(index: int) -> bool:
+        return (await client.get(f"/v1/users/{user_ids[index % len(user_ids)]}")).status_code == 200
+
+    async def delete_user(index: int) -> bool:
+        return (await client.delete(f"/v1/users/{user_ids[index]}")).status_code == 200
+
+    results = {
+        "get_version": await run_scenario(requests, concurrency, get_version),
+        "create_user": await run_scenario(requests, concurrency, create_user),
+    }
+    if user_ids:
+        results["get_user"] = await run_scenario(requests, concurrency, get_user)
+        results["delete_user"] = await run_scenario(len(user_ids), concurrency, delete_user)
+    return results
+
+
+async def benchmark(url: str | None, requests: int, concurrency: int) -> dict[str, Any]:
+    """Run the benchmark in-process on a temporary SQLite database, or against the server at `url`.
+
+    Args:
+        url (str | None): The base URL of a running server, or None to run the application in-process.
+        requests (int): The number of requests per scenario.
+        concurrency (int): The number of concurrent requests.
+
+    Returns:
+        dict[str, Any]: The results, with the run parameters under `meta`.
+    """
+    async with AsyncExitStack() as stack:
+        if url is None:
+            database = Path(tempfile.mkdtemp()) / "benchmark.db"
+            stack.callback(database.unlink, missing_ok=True)
+            stack.enter_context(patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": f"sqlite:///{database}"}))
+
+            from src import app  # noqa: PLC0415
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport: httpx.AsyncBaseTransport = httpx.ASGITransport(app=app)
+            base_url = "http://benchmark"
+        else:
+            transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=concurrency))
+            base_url = url
+
+        client = await stack.enter_async_context(httpx.AsyncClient(transport=transport, base_url=base_url))
+        scenarios = await run_benchmark(client, requests, concurrency)
+
+    return {
+        "meta": {
+            "target": url or "in-process (SQLite)",
+            "requests": requests,
+            "concurrency": concurrency,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "scenarios": {name: asdict(result) for name, result in scenarios.items()},
+    }
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Compare the latency of the results with the baseline.
+
+    Args:
+        results (dict[str, Any]): The results of this run.
+        baseline (dict[str, Any]): The stored results of a reference run.
+        threshold (float): The allowed relative increase, e.g. 0.2 for 20%.
+
+    Returns:
+        list[str]: A description of each regression; empty if there is none.
+    """
+    regressions = []
+    for name, reference in baseline.get("scenarios", {}).items():
+        current = results["scenarios"].get(name)
+        if current is None:
+            continue
+        for metric in COMPARED_METRICS:
+            limit = reference[metric] * (1 + threshold)
+            if current[metric] > limit:
+                regressions.append(
+                    f"{name} {metric}: {current[metric]:.2f} ms > {limit:.2f} ms "
+                    f"(baseline {reference[metric]:.2f} ms + {threshold:.0%})"
+                )
+    return regressions
+
+
+def format_results(results: dict[str, Any]) -> str:
+    """Format the results as a table."""
+    lines = [f"{'scenario':<14}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for name, result in results["scenarios"].items():
+        lines.append(
+            f"{name:<14}{result['requests']:>10}{result['errors']:>8}{result['throughput_rps']:>10.1f}"
+            f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark from the command line.
+
+    Args:
+        argv (list[str] | None): The command line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: 0, or 1 if the latency regressed beyond the threshold or a request failed.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0] if __doc__ else None)
+    parser.add_argument("--url", help="base URL of a running server (default: run the app in-process)")
+    parser.add_argument("--requests", type=int, default=int(os.getenv("BENCHMARK_REQUESTS", "1000")))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BENCHMARK_CONCURRENCY", "16")))
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare the results with this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative latency increase")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(benchmark(args.url, args.requests, args.concurrency))
+    print(format_results(results))
+
+    if args.output is not None:
+        args.output.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+
+    failed = any(result["errors"] for result in results["scenarios"].values())
+    if failed:
+        print("Some requests failed")
+
+    if args.baseline is not None:
+        regressions = compare(results, orjson.loads(args.baseline.read_bytes()), args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        failed = failed or bool(regressions)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""This module is the memory benchmark of the user read paths: ORM instances versus Core rows.
+
+Each mapping runs in its own process against the same temporary SQLite database, and serves page lookups
+the way the read endpoints do (a session per lookup, the query, the mapping of the rows and the JSON body):
+- `orm` (before): `select(User)`, a `User` instance per row in the identity map, copied into a `UserResponse`.
+- `core` (after): `select()` of the columns, a slotted `UserRecord` per row, see `src.endpoints.v1.user`.
+
+For each mapping, it reports the memory allocated per lookup (the peak traced by tracemalloc above the memory
+in use before the lookup), the memory still held after the lookups, the resident set size of the process
+after sustained load and the throughput. The lookups use a sync session: the async session of the
+endpoints runs the same session in a greenlet, and adds the same overhead to both mappings.
+
+Example:
+    ```bash
+    python -m benchmarks.memory --users 10000 --lookups 5000 --page-size 100 --output memory.json
+    ```
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import orjson
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from database.models import Base, User
+from src.endpoints.v1.user import select_user_records
+from src.scheme.user import UserListResponse, UserRecord, UserResponse
+from src.utils.responses import ORJSONResponse
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable
+
+    from sqlalchemy import Engine
+
+MODES = ("orm", "core")
+
+
+def seed(path: Path, users: int) -> None:
+    """Create a SQLite database with the given number of users."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    rows = [{"name": f"name{i}", "fullname": f"Full Name {i}", "nickname": f"nick{i}"} for i in range(users)]
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), rows)
+    engine.dispose()
+
+
+def orm_lookup(engine: Engine, after: int, page_size: int) -> bytes | memoryview:
+    """Return the body of a page of users loaded as ORM instances and copied into UserResponse models."""
+    with Session(engine) as session:
+        db_users = session.execute(select(User).filter(User.id > after).order_by(User.id).limit(page_size)).scalars()
+        page = [UserResponse.model_validate(db_user) for db_user in db_users]
+        return ORJSONResponse(UserListResponse.model_construct(users=page, missing=[], next_cursor=None)).body
+
+
+def core_lookup(engine: Engine, after: int, page_size: int) -> bytes | memoryview:
+    """Return the body of a page of users selected as rows and mapped into UserRecord."""
+    with Session(engine) as session:
+        rows = session.execute(select_user_records().filter(User.id > after).order_by(User.id).limit(page_size))
+        page = [UserRecord(*row) for row in rows]
+        return ORJSONResponse({"users": page, "missing": [], "next_cursor": None}).body
+
+
+LOOKUPS: dict[str, Callable[[Engine, int, int], bytes | memoryview]] = {"orm": orm_lookup, "core": core_lookup}
+
+
+def rss_bytes() -> int:
+    """Return the resident set size of the process, or its peak where the current one is not available."""
+    statm = Path("/proc/self/statm")
+    if statm.exists():
+        return int(statm.read_text().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_mode(  # noqa: PLR0913
+    mode: str, database: Path, *, users: int, lookups: int, traced_lookups: int, page_size: int
+) -> dict[str, float]:
+    """Measure one mapping in the current process.
+
+    Args:
+        mode (str): `orm` or `core`.
+        database (Path): The seeded SQLite database.
+        users (int): The number of users of the database.
+        lookups (int): The number of lookups of the sustained load.
+        traced_lookups (int): The number of lookups traced by tracemalloc.
+        page_size (int): The number of users per lookup.
+
+    Returns:
+        dict[str, float]: The measurements.
+    """
+    lookup = LOOKUPS[mode]
+    engine = create_engine(f"sqlite:///{database}")
+    offsets = random.Random(0)
+
+    def next_after() -> int:
+        return offsets.randrange(max(users - page_size, 1))
+
+    # warm up the pool, the statement caches and the imports
+    for _ in range(20):
+        lookup(engine, next_after(), page_size)
+    gc.collect()
+
+    tracemalloc.start()
+    peaks = []
+    start_traced, _ = tracemalloc.get_traced_memory()
+    for _ in range(traced_lookups):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        lookup(engine, next_after(), page_size)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    gc.collect()
+    end_traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    for _ in range(lookups):
+        lookup(engine, next_after(), page_size)
+    duration = time.perf_counter() - start
+    engine.dispose()
+
+    return {
+        "alloc_kib_per_lookup": round(statistics.fmean(peaks) / 1024, 1),
+        "alloc_kib_per_lookup_max": round(max(peaks) / 1024, 1),
+        "retained_kib": round((end_traced - start_traced) / 1024, 1),
+        "rss_mib_before": round(rss_before / 2**20, 1),
+        "rss_mib": round(rss_bytes() / 2**20, 1),
+        "lookups_per_second": round(lookups / duration, 1),
+    }
+
+
+def benchmark(users: int, lookups: int, traced_lookups: int, page_size: int) -> dict[str, Any]:
+    """Seed a temporary database and measure each mapping in a fresh process.
+
+    Args:
+        users (int): The number of users of the database.
+        lookups (int): The number of lookups of the sustained load.
+        traced_lookups (int): The number of lookups traced by tracemalloc.
+        page_size (int): The number of users per lookup.
+
+    Returns:
+        dict[str, Any]: The parameters and the measurements per mapping.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        database = Path(directory) / "memory_benchmark.db"
+        seed(database, users)
+
+        modes = {}
+        for mode in MODES:
+            # a fresh process per mapping, so that the RSS of one does not include the other
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.memory",
+                    "--worker",
+                    mode,
+                    "--database",
+                    str(database),
+                    "--users",
+                    str(users),
+                    "--lookups",
+                    str(lookups),
+                    "--traced-lookups",
+                    str(traced_lookups),
+                    "--page-size",
+                    str(page_size),
+                ],
+                cwd=Path(__file__).parent.parent,
+                capture_output=True,
+                check=True,
+            )
+            modes[mode] = orjson.loads(result.stdout)
+
+    return {
+        "python": platform.python_version(),
+        "users": users,
+        "lookups": lookups,
+        "page_size": page_size,
+        "modes": modes,
+    }
+
+
+def format_results(results: dict[str, Any]) -> str:
+    """Format the results as a table, with the ratio of `core` to `orm`."""
+    metrics = list(results["modes"]["orm"])
+    lines = [
+        f"{results['lookups']} lookups of {results['page_size']} users, Python {results['python']}",
+        f"{'metric':<26}{'orm':>12}{'core':>12}{'core/orm':>10}",
+    ]
+    for metric in metrics:
+        orm, core = results["modes"]["orm"][metric], results["modes"]["core"][metric]
+        ratio = f"{core / orm:.2f}" if orm else "-"
+        lines.append(f"{metric:<26}{orm:>12}{core:>12}{ratio:>10}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark from the command line.
+
+    Args:
+        argv (list[str] | None): The command line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: 0.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0] if __doc__ else None)
+    parser.add_argument("--users", type=int, default=int(os.getenv("MEMORY_BENCHMARK_USERS", "10000")))
+    parser.add_argument("--lookups", type=int, default=int(os.getenv("MEMORY_BENCHMARK_LOOKUPS", "5000")))
+    parser.add_argument("--traced-lookups", type=int, default=200, help="lookups traced by tracemalloc")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--database", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        measurements = run_mode(
+            args.worker,
+            args.database,
+            users=args.users,
+            lookups=args.lookups,
+            traced_lookups=args.traced_lookups,
+            page_size=args.page_size,
+        )
+        sys.stdout.write(orjson.dumps(measurements).decode())
+        return 0
+
+    results = benchmark(args.users, args.lookups, args.traced_lookups, args.page_size)
+    print(format_results(results))
+    if args.output is not None:
+        args.output.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
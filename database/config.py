@@ -0,0 +1,145 @@
+"""This module resolves the database connection settings.
+
+It is the single source of truth for the connection string and the engine options,
+shared by `src.utils.database.Database`, `src.utils.async_database.AsyncDatabase` and the Alembic environment.
+Nothing here connects to the database or imports a database driver.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any
+
+from sqlalchemy import make_url
+from sqlalchemy.pool import StaticPool
+
+
+def pytest_enabled() -> bool:
+    """Return whether the testing mode is enabled, i.e. env PYTEST is set to true."""
+    return os.getenv("PYTEST", "false").lower() == "true"
+
+
+def database_url(
+    sqlite_path: str | None = None,
+    host: str | None = None,
+    db_name: str | None = None,
+    db_user: str | None = None,
+    db_pass: str | None = None,
+) -> str:
+    """Resolve the database connection string.
+
+    If env PYTEST is set to true, it will use the env PYTEST_DB as the database path
+    (in-memory SQLite if it is not set) and, sqlite_path, host, db_name, db_user, db_pass will be ignored.
+
+    And,if sqlite_path, host, db_name, db_user, db_pass is not provided,
+    it will read the values from the environment variables
+    - MYSQL_DATABASE
+    - MYSQL_PASSWORD
+    - MYSQL_USER
+    - MYSQL_HOST (default: db).
+
+    Args:
+        sqlite_path (str | None): The path to the SQLite database.
+        host (str | None): The hostname of the database server.
+        db_name (str | None): The name of the database.
+        db_user (str | None): The username for the database connection.
+        db_pass (str | None): The password for the database connection.
+
+    Returns:
+        str: The database connection string.
+
+    Raises:
+        ValueError: If both sqlite_path and MySQL parameters are provided,
+        or if required MySQL parameters are missing.
+    """
+    # if pytest is enabled, use the pytest database
+    if pytest_enabled():
+        return os.getenv("PYTEST_DB", "") or "sqlite:///:memory:"
+
+    # you can't provide both sqlite_path and host, db_name, db_user, db_pass
+    if sqlite_path and (host or db_name or db_user or db_pass):
+        msg = "You can't provide both sqlite_path and host, db_name, db_user, db_pass"
+        raise ValueError(msg)
+
+    if sqlite_path:
+        return sqlite_path
+
+    # if host, db_name, db_user, db_pass provided, use mysql
+    if host or db_name or db_user or db_pass:
+        # check all the required fields are provided
+        if not all([host, db_name, db_user, db_pass]):
+            msg = "You must provide host, db_name, db_user, db_pass"
+            raise ValueError(msg)
+
+        return f"mysql://{db_user}:{db_pass}@{host}/{db_name}"
+
+    # if nothing provided, read value from env
+    db_name = os.getenv("MYSQL_DATABASE", "")
+    db_pass = os.getenv("MYSQL_PASSWORD", "")
+    db_user = os.getenv("MYSQL_USER", "")
+    db_host = os.getenv("MYSQL_HOST", "db")
+
+    if not (db_name and db_pass and db_user):
+        msg = "You must provide env variables MYSQL_DATABASE, MYSQL_PASSWORD, MYSQL_USER"
+        raise ValueError(msg)
+
+    return f"mysql://{db_user}:{db_pass}@{db_host}/{db_name}"
+
+
+def replica_urls() -> list[str]:
+    """Resolve the connection strings of the read replicas.
+
+    If env PYTEST is set to true, they are read from the env PYTEST_REPLICA_DBS (comma-separated connection
+    strings, e.g. SQLite files). Otherwise, the env MYSQL_REPLICA_HOSTS lists the replica hosts (`host` or
+    `host:port`, comma-separated), which have the same database and credentials as the primary.
+
+    Returns:
+        list[str]: The connection strings of the replicas; empty if there is none.
+
+    Raises:
+        ValueError: If replica hosts are set without the MySQL environment variables of the primary.
+    """
+    if pytest_enabled():
+        return [url.strip() for url in os.getenv("PYTEST_REPLICA_DBS", "").split(",") if url.strip()]
+
+    hosts = [host.strip() for host in os.getenv("MYSQL_REPLICA_HOSTS", "").split(",") if host.strip()]
+    if not hosts:
+        return []
+
+    primary = make_url(database_url())
+    urls = []
+    for host in hosts:
+        name, _, port = host.partition(":")
+        urls.append(primary.set(host=name, port=int(port) if port else None).render_as_string(hide_password=False))
+    return urls
+
+
+def engine_options(db_path: str) -> dict[str, Any]:
+    """Build the keyword arguments passed to `create_engine` for the given connection string.
+
+    MySQL connections are pooled with a QueuePool configured by the environment variables
+    - MYSQL_POOL_SIZE (default: 5)
+    - MYSQL_MAX_OVERFLOW (default: 10)
+    - MYSQL_POOL_RECYCLE (seconds, default: 3600)
+    - MYSQL_POOL_PRE_PING (default: true).
+
+    In-memory SQLite databases use a single shared connection, so that every thread sees the same database.
+
+    Args:
+        db_path (str): The database connection string.
+
+    Returns:
+        dict[str, Any]: The keyword arguments for `create_engine`.
+    """
+    url = make_url(db_path)
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+        return {}
+
+    return {
+        "pool_size": int(os.getenv("MYSQL_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("MYSQL_MAX_OVERFLOW", "10")),
+        "pool_recycle": int(os.getenv("MYSQL_POOL_RECYCLE", "3600")),
+        "pool_pre_ping": os.getenv("MYSQL_POOL_PRE_PING", "true").lower() == "true",
+    }
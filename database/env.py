@@ -1,34 +1,25 @@
 """This module sets up the Alembic context for database migrations."""
 
-import os
 from logging.config import fileConfig
 
 from alembic import context
 from sqlalchemy import engine_from_config, pool
 
+from database.config import database_url
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# It is skipped when the migrations are run from the application (src.startup.run_migrations).
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
-# Assuming you have an environment variable DATABASE_URL set
-USER = os.getenv("MYSQL_USER")
-PASSWORD = os.getenv("MYSQL_PASSWORD")
-DATABASE = os.getenv("MYSQL_DATABASE")
-
-database_url = f"mysql://{USER}:{PASSWORD}@db/{DATABASE}"
-
-if database_url is not None:
-    # Manually set the sqlalchemy.url configuration to the database URL from the environment
-    config.set_main_option("sqlalchemy.url", database_url)
-else:
-    # Handle the case when DATABASE_URL is not set
-    msg = "DATABASE_URL environment variable is not set."
-    raise ValueError(msg)
+# Set the sqlalchemy.url configuration to the connection string used by the application.
+# "%" is escaped because the configuration values are interpolated.
+config.set_main_option("sqlalchemy.url", database_url().replace("%", "%%"))
 
 # Other existing setup code...
 # add your model's MetaData object here
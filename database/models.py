@@ -1,32 +1,14 @@
-"""This module defines the SQLAlchemy models and database setup."""
+"""This module defines the SQLAlchemy models."""
 
-import os
 from typing import Any
 
-from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy import Column, Double, Integer, String, Text
 from sqlalchemy.ext.declarative import declarative_base
 
-# ---------------------------------------------------------------
-# SQLの初期設定
-
-USER = os.getenv("MYSQL_USER")
-PASSWORD = os.getenv("MYSQL_PASSWORD")
-DATABASE = os.getenv("MYSQL_DATABASE")
-
-path = f"mysql://{USER}:{PASSWORD}@db/{DATABASE}"
-# path = 'mysql+pymysql://root:@127.0.0.1:3306/alembic_sample'
-
-if path is not None:
-    # Engine の作成
-    Engine = create_engine(path, echo=False)
-else:
-    msg = "DATABASE_URL environment variable is not set."
-    raise ValueError(msg)
-
+# This module only holds the metadata of the tables.
+# Engines are created lazily from `database.config` by `src.utils.database` and the Alembic environment.
 Base: Any = declarative_base()
 
-# ---------------------------------------------------------------
-
 
 class User(Base):
     """SQLAlchemy User model for the users table."""
@@ -34,10 +16,29 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True)
-    name = Column(String(255))
+    name = Column(String(255), index=True)
     fullname = Column(String(255))
-    nickname = Column(String(255))
+    nickname = Column(String(255), index=True)
+    # Incremented on every update, used for optimistic concurrency and as the ETag of the user
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}  # noqa: RUF012
 
     def __repr__(self) -> str:
         """Return a string representation of the User instance."""
         return f"<User('name={self.name}', fullname={self.fullname}, nickname={self.nickname})>"
+
+
+class IdempotencyKey(Base):
+    """SQLAlchemy model for the idempotency_keys table, see `src.utils.idempotency`.
+
+    The primary key reserves an Idempotency-Key atomically for every worker and instance.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    # The stored response as JSON, NULL while the request holding the key is in progress
+    response = Column(Text)
+    # The time after which the key can be used again, in seconds since the epoch
+    expires_at = Column(Double, nullable=False, index=True)
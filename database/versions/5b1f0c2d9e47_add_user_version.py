@@ -0,0 +1,39 @@
+"""add user version
+
+Revision ID: 5b1f0c2d9e47
+Revises: 097d0a060aef
+Create Date: 2024-12-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1f0c2d9e47'
+down_revision: Union[str, None] = '097d0a060aef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The initial revision is empty, so the users table may not exist yet.
+    if "users" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(length=255)),
+            sa.Column("fullname", sa.String(length=255)),
+            sa.Column("nickname", sa.String(length=255)),
+            sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+        )
+        return
+
+    op.add_column("users", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("version")
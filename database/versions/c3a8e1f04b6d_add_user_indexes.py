@@ -0,0 +1,30 @@
+"""add user indexes
+
+Revision ID: c3a8e1f04b6d
+Revises: 5b1f0c2d9e47
+Create Date: 2024-12-21 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a8e1f04b6d'
+down_revision: Union[str, None] = '5b1f0c2d9e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The primary key is implicitly part of both indexes (InnoDB and SQLite),
+    # so lookups ordered by id are served by the index without sorting.
+    op.create_index("ix_users_name", "users", ["name"])
+    op.create_index("ix_users_nickname", "users", ["nickname"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_nickname", table_name="users")
+    op.drop_index("ix_users_name", table_name="users")
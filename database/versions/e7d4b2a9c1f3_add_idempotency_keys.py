@@ -0,0 +1,33 @@
+"""add idempotency keys
+
+Revision ID: e7d4b2a9c1f3
+Revises: c3a8e1f04b6d
+Create Date: 2024-12-28 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7d4b2a9c1f3'
+down_revision: Union[str, None] = 'c3a8e1f04b6d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("key", sa.String(length=255), primary_key=True),
+        sa.Column("response", sa.Text()),
+        sa.Column("expires_at", sa.Double(), nullable=False),
+    )
+    op.create_index("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_idempotency_keys_expires_at", table_name="idempotency_keys")
+    op.drop_table("idempotency_keys")
@@ -3,6 +3,10 @@
 import logging
 
 from .app import app
+from .endpoints.admin import include_admin
+from .endpoints.docs import include_docs
+from .endpoints.health import router as health_router
+from .endpoints.metrics import router as metrics_router
 from .endpoints.v1 import router as v1_router
 
 logger = logging.getLogger("uvicorn.api").getChild(__name__)
@@ -10,3 +14,7 @@ logger.debug("Debug Mode Enabled")
 
 # Write your routers here
 app.include_router(v1_router, prefix="/v1")
+app.include_router(metrics_router)
+app.include_router(health_router)
+include_docs(app)
+include_admin(app)
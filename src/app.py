@@ -5,19 +5,73 @@ the values in the APIDetail class in the app_detail.py module.
 
 """
 
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from src.app_detail import APIDetail
+from src.middleware.compression import CompressionMiddleware
+from src.middleware.load_shedding import LoadSheddingMiddleware
+from src.middleware.metrics import MetricsMiddleware
+from src.middleware.profiling import ProfilingMiddleware
+from src.middleware.rate_limit import RateLimitMiddleware
+from src.middleware.read_your_writes import ReadYourWritesMiddleware
+from src.middleware.request_context import RequestContextMiddleware
+from src.startup import startup_state, warm_up
+from src.utils.async_database import AsyncDatabase, dispose_async_engines, monitor_replicas
+from src.utils.database import Database, dispose_engines
+from src.utils.profiling import profiling_enabled
+from src.utils.responses import ORJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """Create the shared database engines at startup and dispose of their pools at shutdown.
+
+    The worker is warmed up in the background, so that /healthz answers immediately
+    and /readyz reports the progress until the worker is ready. If there are read replicas,
+    their health is checked in the background as well.
+    """
+    startup_state.reset()
+    Database().connect()
+    tasks = [asyncio.create_task(warm_up(app))]
+    if AsyncDatabase().connect().replicas is not None:
+        tasks.append(asyncio.create_task(monitor_replicas()))
+    yield
+    startup_state.phase = "stopping"
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await dispose_async_engines()
+    dispose_engines()
+
 
 app = FastAPI(
     title=APIDetail.API_TITLE,
     description=APIDetail.DESCRIPTION,
     version=APIDetail.VERSION,
-    openapi_url=APIDetail.OPENAPI_URL,
-    docs_url=APIDetail.DOCS_URL,
-    redoc_url=APIDetail.REDOC_URL,
+    # the OpenAPI document and the documentation pages are precomputed and served by src.endpoints.docs
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
+# the last added middleware is the outermost one: CORS and the metrics wrap the 429 and 503 responses
+# of the rate limiting and load shedding, so that browsers can read them and they are counted
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(RateLimitMiddleware, router=app.router)
+app.add_middleware(LoadSheddingMiddleware)
 app.add_middleware(
     CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"]
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+# only added when enabled, so that requests do not even check for the profiling header otherwise
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestContextMiddleware)
@@ -1,5 +1,7 @@
 """This module contains the APIDetail class which provides metadata and configuration for the API."""
 
+import os
+
 
 class APIDetail:
     """APIDetail class contains metadata and configuration for the FastAPI Template API.
@@ -11,6 +13,8 @@ class APIDetail:
         OPENAPI_URL (str): The URL path for the OpenAPI schema.
         DOCS_URL (str): The URL path for the interactive API documentation (Swagger UI).
         REDOC_URL (str): The URL path for the ReDoc documentation.
+        DOCS_ENABLED (bool): Whether the OpenAPI document and the documentation pages are served.
+            If env DOCS_ENABLED is set to false, this will be False.
     """
 
     API_TITLE = "FastAPI Template API"
@@ -21,3 +25,4 @@ class APIDetail:
     OPENAPI_URL = "/openapi.json"
     DOCS_URL = "/docs"
     REDOC_URL = "/redoc"
+    DOCS_ENABLED = os.getenv("DOCS_ENABLED", "true").lower() == "true"
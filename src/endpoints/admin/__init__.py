@@ -0,0 +1,46 @@
+"""This module contains the admin endpoints, for the operators of the API.
+
+The endpoints require the ADMIN_TOKEN as bearer token, are not part of the OpenAPI schema,
+and are not registered at all unless profiling is enabled, see `src.utils.profiling.profiling_enabled`.
+"""
+
+import hmac
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException
+
+from src.utils.profiling import admin_token, profiling_enabled
+
+from .profiling import router as profiling_router
+
+
+async def require_admin(authorization: Annotated[str | None, Header()] = None) -> None:
+    """Check that the request carries the admin token.
+
+    Args:
+        authorization (str | None): The Authorization header, `Bearer <ADMIN_TOKEN>`.
+
+    Raises:
+        HTTPException: If the token is missing or wrong.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    expected = admin_token()
+    if scheme.lower() != "bearer" or not expected or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(prefix="/admin", include_in_schema=False, dependencies=[Depends(require_admin)])
+
+# Add your admin routes here
+
+router.include_router(profiling_router)
+
+
+def include_admin(app: FastAPI) -> None:
+    """Register the admin routes on the application, unless profiling is disabled.
+
+    Args:
+        app (FastAPI): The application.
+    """
+    if profiling_enabled():
+        app.include_router(router)
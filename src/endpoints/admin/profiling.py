@@ -0,0 +1,145 @@
+"""This module defines the profiling endpoints of the admin API.
+
+- `GET /admin/profile/cpu`: sample the stacks of the worker for some seconds, returns collapsed stacks.
+- `POST /admin/profile/memory/start`, `GET /admin/profile/memory`, `POST /admin/profile/memory/stop`:
+  trace the allocations and report the top allocation sites, and their growth since the previous report.
+- `GET /admin/profile/requests`, `GET /admin/profile/requests/{profile_id}`: the profiles of the requests
+  sent with the `X-Profile` header, see `src.middleware.profiling.ProfilingMiddleware`.
+
+Each worker profiles itself: with several workers, the requests reach one of them.
+"""
+
+import asyncio
+import time
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from src.utils.profiling import (
+    MemoryReport,
+    RequestProfile,
+    SamplingProfiler,
+    max_profile_seconds,
+    memory_profiler,
+    request_profiles,
+)
+
+router = APIRouter(prefix="/profile")
+
+
+@router.get("/cpu")
+async def profile_cpu(
+    seconds: Annotated[float, Query(gt=0)] = 10,
+    interval_ms: Annotated[float, Query(ge=1, le=1000)] = 5,
+) -> PlainTextResponse:
+    """Sample the stacks of every thread of the worker, and return them in the collapsed stack format.
+
+    The file can be rendered with `flamegraph.pl profile.collapsed > profile.svg` or opened in speedscope.
+
+    Args:
+        seconds (float): The duration of the profile, at most PROFILING_MAX_SECONDS.
+        interval_ms (float): The time between two samples in milliseconds.
+
+    Returns:
+        PlainTextResponse: The collapsed stacks.
+
+    Raises:
+        HTTPException: If the duration is too long, or if another CPU profile is running.
+    """
+    if seconds > max_profile_seconds():
+        raise HTTPException(status_code=400, detail=f"The profile is limited to {max_profile_seconds():g} seconds")
+    if not SamplingProfiler.lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A CPU profile is already running")
+    try:
+        # the sampling thread observes the event loop thread, which keeps serving requests meanwhile
+        collapsed = await asyncio.to_thread(SamplingProfiler(interval_ms / 1000).run, seconds)
+    finally:
+        SamplingProfiler.lock.release()
+
+    filename = f"cpu-{time.strftime('%Y%m%dT%H%M%S')}.collapsed"
+    return PlainTextResponse(collapsed, headers={"content-disposition": f'attachment; filename="{filename}"'})
+
+
+@router.post("/memory/start")
+async def start_memory_profile(frames: Annotated[int, Query(ge=1, le=100)] = 1) -> dict[str, bool]:
+    """Start tracing the allocations of the worker, which slows them down until stopped.
+
+    Args:
+        frames (int): The number of frames kept per allocation.
+
+    Returns:
+        dict[str, bool]: Whether the allocations are traced.
+    """
+    memory_profiler.start(frames)
+    return {"tracing": True}
+
+
+@router.get("/memory")
+async def get_memory_profile(limit: Annotated[int, Query(ge=1, le=1000)] = 20) -> MemoryReport:
+    """Take a snapshot of the traced allocations, and compare it to the previous one.
+
+    Args:
+        limit (int): The number of allocation sites reported.
+
+    Returns:
+        MemoryReport: The top allocation sites, and the largest changes since the previous snapshot.
+
+    Raises:
+        HTTPException: If the allocations are not traced.
+    """
+    try:
+        # taking and comparing snapshots walks every traced block, keep it off the event loop
+        return await asyncio.to_thread(memory_profiler.snapshot, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from None
+
+
+@router.post("/memory/stop")
+async def stop_memory_profile() -> dict[str, bool]:
+    """Stop tracing the allocations of the worker.
+
+    Returns:
+        dict[str, bool]: Whether the allocations are traced.
+    """
+    memory_profiler.stop()
+    return {"tracing": False}
+
+
+@router.get("/requests")
+async def list_request_profiles() -> list[dict[str, str | int | float]]:
+    """List the request profiles kept by the worker, the most recent first.
+
+    Returns:
+        list[dict[str, str | int | float]]: The profiles, without their reports.
+    """
+    return [
+        {
+            "id": profile.id,
+            "method": profile.method,
+            "path": profile.path,
+            "status": profile.status,
+            "duration_ms": profile.duration_ms,
+            "started": profile.started,
+        }
+        for profile in request_profiles.list()
+    ]
+
+
+@router.get("/requests/{profile_id}")
+async def get_request_profile(profile_id: str) -> PlainTextResponse:
+    """Return the cProfile report of a request.
+
+    Args:
+        profile_id (str): The ID of the profile, returned in the X-Profile-ID response header.
+
+    Returns:
+        PlainTextResponse: The report, sorted by cumulative time.
+
+    Raises:
+        HTTPException: If the profile is unknown or no longer kept.
+    """
+    profile: RequestProfile | None = request_profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.stats)
@@ -0,0 +1,130 @@
+"""This module serves the OpenAPI document and the documentation pages, precomputed once.
+
+FastAPI generates the OpenAPI schema on the first request to /openapi.json, and renders the documentation
+pages on every request. Here, the documents are built once (by the warm-up at startup, or on the first
+request otherwise), encoded with gzip and brotli, and served as bytes with an ETag.
+
+The OpenAPI document can also be generated at build time with `python -m src.openapi openapi.json`
+and loaded from the file given by the environment variable OPENAPI_FILE.
+The routes are not registered at all when DOCS_ENABLED is set to false.
+"""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import orjson
+from fastapi import APIRouter, FastAPI, Request, Response
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html, get_swagger_ui_oauth2_redirect_html
+
+from src.app_detail import APIDetail
+from src.utils.responses import PrecomputedResponse
+
+router = APIRouter()
+
+
+@dataclass(frozen=True)
+class DocsDocuments:
+    """The precomputed documentation documents of an application.
+
+    Attributes:
+        openapi (PrecomputedResponse): The OpenAPI document.
+        swagger_ui (PrecomputedResponse): The Swagger UI page.
+        swagger_ui_oauth2_redirect (PrecomputedResponse): The OAuth2 redirect page of Swagger UI.
+        redoc (PrecomputedResponse): The ReDoc page.
+    """
+
+    openapi: PrecomputedResponse
+    swagger_ui: PrecomputedResponse
+    swagger_ui_oauth2_redirect: PrecomputedResponse
+    redoc: PrecomputedResponse
+
+
+def openapi_bytes(app: FastAPI) -> bytes:
+    """Return the OpenAPI document of the application as JSON.
+
+    If the environment variable OPENAPI_FILE points to an existing file, it is read instead
+    of generating the schema.
+
+    Args:
+        app (FastAPI): The application.
+
+    Returns:
+        bytes: The OpenAPI document.
+    """
+    openapi_file = os.getenv("OPENAPI_FILE", "")
+    if openapi_file and Path(openapi_file).is_file():
+        return Path(openapi_file).read_bytes()
+    return orjson.dumps(app.openapi())
+
+
+def build_docs(app: FastAPI) -> DocsDocuments:
+    """Build the documentation documents of the application and keep them in `app.state`.
+
+    Args:
+        app (FastAPI): The application.
+
+    Returns:
+        DocsDocuments: The precomputed documents.
+    """
+    openapi_url = app.root_path.rstrip("/") + APIDetail.OPENAPI_URL
+    oauth2_redirect_url = app.swagger_ui_oauth2_redirect_url
+    swagger_ui = get_swagger_ui_html(
+        openapi_url=openapi_url,
+        title=f"{app.title} - Swagger UI",
+        oauth2_redirect_url=app.root_path.rstrip("/") + oauth2_redirect_url if oauth2_redirect_url else None,
+        init_oauth=app.swagger_ui_init_oauth,
+        swagger_ui_parameters=app.swagger_ui_parameters,
+    )
+    redoc = get_redoc_html(openapi_url=openapi_url, title=f"{app.title} - ReDoc")
+
+    documents = DocsDocuments(
+        openapi=PrecomputedResponse.build(openapi_bytes(app), "application/json"),
+        swagger_ui=PrecomputedResponse.build(bytes(swagger_ui.body), "text/html; charset=utf-8"),
+        swagger_ui_oauth2_redirect=PrecomputedResponse.build(
+            bytes(get_swagger_ui_oauth2_redirect_html().body), "text/html; charset=utf-8"
+        ),
+        redoc=PrecomputedResponse.build(bytes(redoc.body), "text/html; charset=utf-8"),
+    )
+    app.state.docs = documents
+    return documents
+
+
+def _documents(request: Request) -> DocsDocuments:
+    """Return the precomputed documents of the application, building them on first use."""
+    documents: DocsDocuments | None = getattr(request.app.state, "docs", None)
+    return documents if documents is not None else build_docs(request.app)
+
+
+@router.get(APIDetail.OPENAPI_URL, include_in_schema=False)
+async def get_openapi(request: Request) -> Response:
+    """Serve the OpenAPI document."""
+    return _documents(request).openapi.respond(request)
+
+
+@router.get(APIDetail.DOCS_URL, include_in_schema=False)
+async def get_swagger_ui(request: Request) -> Response:
+    """Serve the Swagger UI page."""
+    return _documents(request).swagger_ui.respond(request)
+
+
+@router.get(APIDetail.DOCS_URL + "/oauth2-redirect", include_in_schema=False)
+async def get_swagger_ui_oauth2_redirect(request: Request) -> Response:
+    """Serve the OAuth2 redirect page of Swagger UI."""
+    return _documents(request).swagger_ui_oauth2_redirect.respond(request)
+
+
+@router.get(APIDetail.REDOC_URL, include_in_schema=False)
+async def get_redoc(request: Request) -> Response:
+    """Serve the ReDoc page."""
+    return _documents(request).redoc.respond(request)
+
+
+def include_docs(app: FastAPI) -> None:
+    """Register the documentation routes on the application, unless APIDetail.DOCS_ENABLED is false.
+
+    Args:
+        app (FastAPI): The application.
+    """
+    if APIDetail.DOCS_ENABLED:
+        app.include_router(router)
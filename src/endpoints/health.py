@@ -0,0 +1,29 @@
+"""This module defines the liveness and readiness endpoints for the orchestrator."""
+
+from fastapi import APIRouter
+
+from src.startup import startup_state
+from src.utils.responses import ORJSONResponse
+
+router = APIRouter()
+
+
+@router.get("/healthz", include_in_schema=False)
+async def get_healthz() -> ORJSONResponse:
+    """Report that the worker process is alive. This does not depend on the database."""
+    return ORJSONResponse({"status": "ok"})
+
+
+@router.get("/readyz", include_in_schema=False)
+async def get_readyz() -> ORJSONResponse:
+    """Report whether the worker is warmed up and can receive traffic.
+
+    Returns 200 when it is ready, and 503 with the current phase while it is warming up or stopping.
+    """
+    content = {
+        "status": "ready" if startup_state.ready else "not ready",
+        "phase": startup_state.phase,
+        "completed": startup_state.completed,
+        "error": startup_state.error,
+    }
+    return ORJSONResponse(content, status_code=200 if startup_state.ready else 503)
@@ -0,0 +1,13 @@
+"""This module defines the Prometheus metrics endpoint for the FastAPI application."""
+
+from fastapi import APIRouter, Response
+
+from src.utils.metrics import CONTENT_TYPE, REGISTRY
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Expose the application metrics in the Prometheus text format."""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
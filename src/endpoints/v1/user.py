@@ -1,90 +1,704 @@
 """This module contains the user-info-related endpoints for the FastAPI application."""
 
-from fastapi import APIRouter, HTTPException
+import base64
+import binascii
+import hashlib
+import json
+import os
+from collections.abc import AsyncGenerator, Sequence
+from dataclasses import fields
+from typing import Annotated, Any, NoReturn
+
+import orjson
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import ColumnElement, Select, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.models import User
-from src.scheme.user import UserCreate, UserResponse
-from src.utils.database import Database
+from src.scheme.user import (
+    UserBatchItemResult,
+    UserBatchResponse,
+    UserCreate,
+    UserListResponse,
+    UserRecord,
+    UserResponse,
+    UserUpdate,
+)
+from src.utils.async_database import AsyncDatabase, AsyncReadSessionDep, AsyncSessionDep
+from src.utils.cache import CacheGenerations, create_cache
+from src.utils.group_commit import GroupCommit
+from src.utils.idempotency import create_idempotency_store
+from src.utils.replicas import mark_write
+from src.utils.responses import ORJSONResponse, etag_matches
+from src.utils.singleflight import SingleFlight
 
 router = APIRouter()
 
+# Read-through cache of GET /users/{user_id}, see src.utils.cache.create_cache for its configuration
+user_cache = create_cache("user")
+# Invalidations of the users being loaded, so that a fill does not store a row read before a write
+user_generations = CacheGenerations()
+# Concurrent cache misses for the same user share one query, see src.utils.singleflight
+user_lookups: SingleFlight[dict[str, Any] | None] = SingleFlight("user")
+
+# Responses of POST /users stored by Idempotency-Key and replayed to the retries of the same request,
+# see src.utils.idempotency for its configuration
+idempotency_store = create_idempotency_store()
+# Concurrent requests of this worker with the same Idempotency-Key share one reservation of the store
+idempotent_creates: SingleFlight[dict[str, Any]] = SingleFlight("idempotency")
+# Longer keys are rejected, so that they can't bloat the store
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Whether POST /users inserts are grouped into shared transactions, see src.utils.group_commit
+# (window and batch size: env GROUP_COMMIT_WINDOW_MS and GROUP_COMMIT_MAX_SIZE)
+GROUP_COMMIT_ENABLED = os.getenv("USER_GROUP_COMMIT", "false").lower() == "true"
+# Maximum number of users in one POST /users:batch request
+BATCH_CREATE_MAX_SIZE = int(os.getenv("USER_BATCH_CREATE_MAX_SIZE", "1000"))
+# Maximum number of IDs in one GET /users?ids=... request
+BATCH_LOOKUP_MAX_SIZE = int(os.getenv("USER_BATCH_LOOKUP_MAX_SIZE", "1000"))
+# Maximum page size of GET /users
+LIST_MAX_LIMIT = int(os.getenv("USER_LIST_MAX_LIMIT", "1000"))
+# Number of rows fetched from the server-side cursor at a time by GET /users?stream=true
+STREAM_CHUNK_SIZE = int(os.getenv("USER_STREAM_CHUNK_SIZE", "1000"))
+
+# The columns of the users table in the order of the fields of UserRecord, see `select_user_records`
+USER_RECORD_COLUMNS = tuple(User.__table__.c[field.name] for field in fields(UserRecord))
+
+
+def select_user_records() -> Select[Any]:
+    """Select the users as plain rows, mapped with `UserRecord(*row)` or `row._asdict()`.
+
+    Rows of a Core select bypass the identity map of the session, the attribute instrumentation
+    and the expiry state of ORM instances, which the read paths have no use for.
+    """
+    return select(*USER_RECORD_COLUMNS)
+
+
+async def invalidate_user(user_id: int) -> None:
+    """Remove a user from the cache.
+
+    Every path that modifies or deletes a user must call this after its transaction is committed.
+    A `load_user` in progress for the user may have read the row before the write, so it won't store it,
+    and the next lookups don't wait for it but read the row again.
+    """
+    key = str(user_id)
+    user_generations.bump(key)
+    user_lookups.forget(key)
+    await user_cache.delete(key)
+
+
+async def prime_user_cache(count: int) -> int:
+    """Load the most recently created users into the cache, so that the first lookups are hits.
+
+    Args:
+        count (int): The maximum number of users to load.
+
+    Returns:
+        int: The number of cached users.
+    """
+    if count <= 0:
+        return 0
+
+    async with AsyncDatabase().connect().session() as session:
+        result = await session.execute(select_user_records().order_by(User.id.desc()).limit(count))
+        users = [row._asdict() for row in result]
+
+    for user in users:
+        await user_cache.set(str(user["id"]), user)
+    return len(users)
+
+
+async def load_user(user_id: int) -> dict[str, Any] | None:
+    """Load a user from the database into the cache.
+
+    It uses its own session rather than the one of the request, as its result may be shared
+    by the concurrent requests for the same user (`user_lookups`) and outlive the request that started it.
+    It reads from the primary even if there are replicas: a row read from a lagging replica
+    would stay in the cache, stale, after the invalidation of a write. For the same reason, it does not
+    store the row if the user is invalidated while it is loaded (`user_generations`).
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        dict[str, Any] | None: The user in the format of a dumped UserResponse, or None if the user does not exist.
+    """
+    key = str(user_id)
+    generation = user_generations.begin(key)
+    try:
+        async with AsyncDatabase().connect().session() as session:
+            row = (await session.execute(select_user_records().filter(User.id == user_id))).first()
+            if row is None:
+                return None
+            user = row._asdict()
+
+        if not user_generations.changed(key, generation):
+            await user_cache.set(key, user)
+            # an invalidation may also have reached the cache before this write did
+            if user_generations.changed(key, generation):
+                await user_cache.delete(key)
+    finally:
+        user_generations.end(key)
+    return user
+
+
+def user_etag(version: int) -> str:
+    """Return the weak ETag of a user, which is its row version."""
+    return f'W/"{version}"'
+
+
+def _list_etag(users: Sequence[UserResponse | UserRecord], missing: list[int], next_cursor: str | None) -> str:
+    """Return the weak ETag of a list of users, computed from their IDs and versions."""
+    versions = [(user.id, user.version) for user in users]
+    digest = hashlib.blake2b(repr((versions, missing, next_cursor)).encode(), digest_size=8)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _if_match_version(if_match: str | None) -> int | None:
+    """Return the user version required by an If-Match header, or None if the header is absent or `*`.
+
+    The weak and strong forms of the ETag are both accepted, the version identifies the row
+    regardless of the encoding of the representation.
+
+    Raises:
+        HTTPException: If the header is not the ETag of a user.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="Invalid If-Match header") from None
+
+
+async def _raise_not_found_or_conflict(session: AsyncSession, user_id: int) -> NoReturn:
+    """Raise the error of a conditional statement that matched no row: 404 if the user does not exist, else 412.
+
+    Raises:
+        HTTPException: Always.
+    """
+    result = await session.execute(select(User.__table__.c.id).where(User.__table__.c.id == user_id))
+    if result.first() is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    raise HTTPException(status_code=412, detail="User was modified, fetch it again")
+
+
+def _not_modified(etag: str) -> Response:
+    """Return the 304 response of a conditional request matching the current ETag."""
+    return Response(status_code=304, headers={"etag": etag})
+
+
+def _encode_cursor(last_id: int) -> str:
+    """Encode the ID of the last user of a page into an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps({"after": last_id}).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> int:
+    """Decode an opaque cursor into the ID after which the next page starts.
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(data["after"])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
+
+async def _insert_user(session: AsyncSession, user: UserCreate) -> int:
+    """Insert a user with a single statement and return the generated primary key.
+
+    The key is read with INSERT ... RETURNING where the dialect supports it,
+    and from the cursor lastrowid otherwise (MySQL).
+
+    Args:
+        session (AsyncSession): The database session.
+        user (UserCreate): The user information to insert.
+
+    Returns:
+        int: The ID of the inserted user.
+    """
+    stmt = insert(User.__table__).values(name=user.name, fullname=user.fullname, nickname=user.nickname)
+
+    if session.get_bind().dialect.insert_returning:
+        return int((await session.execute(stmt.returning(User.__table__.c.id))).scalar_one())
+
+    result = await session.execute(stmt)
+    return int(result.lastrowid)
+
+
+async def _insert_users(session: AsyncSession, users: list[UserCreate]) -> list[int]:
+    """Insert users in one transaction and return their generated primary keys in order.
+
+    Dialects that support RETURNING for executemany insert all rows with one multi-row statement.
+    Otherwise (MySQL) each row is inserted on its own to read its lastrowid, still in the same transaction.
+
+    Args:
+        session (AsyncSession): The database session.
+        users (list[UserCreate]): The users to insert.
+
+    Returns:
+        list[int]: The IDs of the inserted users, in the same order as `users`.
+    """
+    if not users:
+        return []
+
+    if not session.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        return [await _insert_user(session, user) for user in users]
+
+    table = User.__table__
+    result = await session.execute(
+        insert(table).returning(table.c.id, sort_by_parameter_order=True), [user.model_dump() for user in users]
+    )
+    return [int(user_id) for user_id in result.scalars()]
+
+
+async def _write_users(users: list[UserCreate]) -> list[int]:
+    """Insert the users of a group commit batch in one transaction, with its own session."""
+    async with AsyncDatabase().connect().session() as session:
+        return await _insert_users(session, users)
+
+
+# Concurrent POST /users inserts collected into batches, if GROUP_COMMIT_ENABLED
+user_creates: GroupCommit[UserCreate, int] = GroupCommit("user_create", _write_users)
+
+
+def _request_fingerprint(user: UserCreate) -> str:
+    """Return the fingerprint of a POST /users body, to detect an Idempotency-Key reused for another user."""
+    return hashlib.blake2b(user.model_dump_json().encode(), digest_size=16).hexdigest()
+
+
+async def _create_user_once(key: str, user: UserCreate, fingerprint: str) -> dict[str, Any]:
+    """Create the user of an Idempotency-Key and store the response, unless it is already stored.
+
+    The key is reserved in `idempotency_store` before the insert, so that a request with the same key on another
+    worker or instance waits for the response instead of inserting again. If the insert fails, the reservation
+    is released for the retries. It uses its own session rather than the one of the request, as its result
+    is shared by the concurrent requests of this worker with the same key (`idempotent_creates`).
+
+    Args:
+        key (str): The Idempotency-Key.
+        user (UserCreate): The user information to create.
+        fingerprint (str): The fingerprint of the request.
+
+    Returns:
+        dict[str, Any]: The stored response: the `fingerprint` of the request and the dumped UserResponse `user`.
+    """
+    # stored by a request with the same key that finished after the lookup of the caller, possibly elsewhere
+    stored = await idempotency_store.acquire(key)
+    if stored is not None:
+        return stored
+
+    try:
+        if GROUP_COMMIT_ENABLED:
+            user_id = await user_creates.submit(user)
+        else:
+            (user_id,) = await _write_users([user])
+    except BaseException:
+        await idempotency_store.release(key)
+        raise
+
+    created = UserResponse.model_construct(id=user_id, **user.model_dump()).model_dump()
+    stored = {"fingerprint": fingerprint, "user": created}
+    await idempotency_store.complete(key, stored)
+    return stored
+
+
+async def _create_user_idempotent(key: str, user: UserCreate) -> ORJSONResponse:
+    """Create a user at most once per Idempotency-Key, and replay the stored response to the retries.
+
+    Raises:
+        HTTPException: If the key is invalid, or was used for a request with another body.
+    """
+    if not 0 < len(key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key header")
+
+    fingerprint = _request_fingerprint(user)
+    stored = await idempotency_store.get(key)
+    replayed = stored is not None
+    if stored is None:
+        stored = await idempotent_creates.do(key, lambda: _create_user_once(key, user, fingerprint))
+        # the insert ran in the task of the first request with the key, outside of the context of this one
+        mark_write()
+
+    if stored["fingerprint"] != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for another request")
+    # stored values are dumped UserResponse, no need to validate them again
+    return ORJSONResponse(stored["user"], headers={"idempotent-replayed": "true"} if replayed else None)
 
-@router.post("/users")
-def create_user(user: UserCreate) -> UserResponse:
+
+@router.post("/users", response_model=UserResponse)
+async def create_user(
+    user: UserCreate, session: AsyncSessionDep, idempotency_key: Annotated[str | None, Header()] = None
+) -> ORJSONResponse:
     """Create a new user in the database.
 
+    With group commit (env USER_GROUP_COMMIT), the insert waits up to GROUP_COMMIT_WINDOW_MS for other ones
+    and they are committed together; each request still gets its own ID or error.
+
+    With an Idempotency-Key header, the response is stored for IDEMPOTENCY_TTL seconds: a retry with the same key
+    gets the stored response, with the header `Idempotent-Replayed: true`, without inserting the user again,
+    and concurrent requests with the key, on any worker sharing the store, wait for the first one.
+    Reusing a key for another body is rejected.
+
     Args:
         user (UserCreate): The user information to create.
+        session (AsyncSession): The database session.
+        idempotency_key (str | None): A unique key chosen by the client for this creation.
+
+    Returns:
+        ORJSONResponse: The created user information as UserResponse.
+
+    Raises:
+        HTTPException: If the Idempotency-Key is invalid, or was used for a request with another body.
+    """
+    if idempotency_key is not None:
+        return await _create_user_idempotent(idempotency_key, user)
+
+    if GROUP_COMMIT_ENABLED:
+        user_id = await user_creates.submit(user)
+        # the insert ran in the group commit task, outside of the context of this request
+        mark_write()
+    else:
+        user_id = await _insert_user(session, user)
+
+    # the input is already validated by UserCreate
+    return ORJSONResponse(UserResponse.model_construct(id=user_id, **user.model_dump()))
+
+
+@router.post("/users:batch", response_model=UserBatchResponse)
+async def create_users(users: list[UserCreate | Any], session: AsyncSessionDep) -> ORJSONResponse:
+    """Create many users in one transaction.
+
+    Each item is validated on its own; invalid items, including items that are not objects, are reported
+    in the result and do not prevent the valid ones from being created. The items are typed `UserCreate | Any`
+    so that the OpenAPI schema documents them as UserCreate while the malformed ones reach the endpoint.
+
+    Args:
+        users (list[UserCreate | Any]): The user information to create, in the `UserCreate` format.
+        session (AsyncSession): The database session.
 
     Returns:
-        UserResponse: The created user information.
-    """
-    db = Database()
-    db.connect()
-    db_user = User(name=user.name, fullname=user.fullname, nickname=user.nickname)
-
-    with db.session() as db_session:
-        db_session.add(db_user)
-
-    with db.session() as db_session:
-        db_user_id = (
-            db_session.query(User)
-            .filter(User.name == user.name)
-            .filter(User.fullname == user.fullname)
-            .filter(User.nickname == user.nickname)
-            .first()
+        ORJSONResponse: The result of each item, in request order, as UserBatchResponse.
+
+    Raises:
+        HTTPException: If the batch is larger than `BATCH_CREATE_MAX_SIZE`.
+    """
+    if len(users) > BATCH_CREATE_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Too many users in a batch (max {BATCH_CREATE_MAX_SIZE})")
+
+    results = [UserBatchItemResult(index=index) for index in range(len(users))]
+    valid: list[tuple[int, UserCreate]] = []
+    for index, item in enumerate(users):
+        try:
+            # the valid items are already UserCreate, the others are validated again for their errors
+            valid.append((index, item if isinstance(item, UserCreate) else UserCreate.model_validate(item)))
+        except ValidationError as e:
+            # errors of the item itself, e.g. not an object, have no location
+            results[index].error = "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" if err["loc"] else err["msg"] for err in e.errors()
+            )
+
+    user_ids = await _insert_users(session, [user for _, user in valid])
+    for (index, user), user_id in zip(valid, user_ids, strict=True):
+        results[index].user = UserResponse.model_construct(id=user_id, **user.model_dump())
+
+    return ORJSONResponse(UserBatchResponse(results=results))
+
+
+async def _stream_users(after: int) -> AsyncGenerator[bytes, None]:
+    """Yield all users with an ID greater than `after` as NDJSON lines.
+
+    Rows are pulled from a server-side cursor `STREAM_CHUNK_SIZE` at a time, so memory stays constant,
+    and each partition is sent as one chunk rather than a chunk per row, which the compression middleware
+    would flush one by one. The generator uses its own session because it runs after the endpoint has returned.
+    """
+    async with AsyncDatabase().connect().session(read_only=True) as session:
+        result = await session.stream(
+            select_user_records()
+            .filter(User.id > after)
+            .order_by(User.id)
+            .execution_options(yield_per=STREAM_CHUNK_SIZE)
         )
+        async for partition in result.partitions():
+            yield b"".join(orjson.dumps(UserRecord(*row), option=orjson.OPT_APPEND_NEWLINE) for row in partition)
 
-    # disable coverage for the following line
-    if db_user_id is None:  # pragma: no cover
-        raise HTTPException(status_code=404, detail="User not found")
 
-    return UserResponse(
-        id=int(db_user_id.id), name=str(db_user.name), fullname=str(db_user.fullname), nickname=str(db_user.nickname)
-    )
+def users_by_query(column: ColumnElement[str], value: str, after: int) -> Select[Any]:
+    """Select the users whose column equals the value and whose ID is greater than `after`.
+
+    `users.name` and `users.nickname` are indexed, and the index also holds the primary key, so
+    a page ordered by ID is read from the index: its cost grows with log(table size) instead of a full scan.
+
+    Args:
+        column (ColumnElement[str]): `User.name` or `User.nickname`.
+        value (str): The value to look up.
+        after (int): The ID after which the page starts.
+
+    Returns:
+        Select[Any]: The statement selecting the rows of UserRecord, without order and limit.
+    """
+    return select_user_records().filter(column == value, User.id > after)
+
+
+async def _page_response(session: AsyncSession, stmt: Select[Any], limit: int, if_none_match: str | None) -> Response:
+    """Execute a statement selecting user records and return the first `limit` users by ID as a page.
+
+    One extra row is fetched to know whether there is a next page.
+    """
+    result = await session.execute(stmt.order_by(User.id).limit(limit + 1))
+    rows = result.all()
+    page = [UserRecord(*row) for row in rows[:limit]]
+    next_cursor = _encode_cursor(page[-1].id) if len(rows) > limit else None
+    etag = _list_etag(page, [], next_cursor)
+    if if_none_match is not None and etag_matches(if_none_match, [etag]):
+        return _not_modified(etag)
+
+    # the fields of UserListResponse, the records are serialized by orjson
+    return ORJSONResponse({"users": page, "missing": [], "next_cursor": next_cursor}, headers={"etag": etag})
+
+
+@router.get("/users/by-name/{name}", response_model=UserListResponse)
+async def get_users_by_name(
+    name: str,
+    session: AsyncReadSessionDep,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=LIST_MAX_LIMIT)] = 100,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """List the users with the given name, ordered by ID and paginated like `GET /users`.
+
+    Args:
+        name (str): The name to look up.
+        session (AsyncSession): The database session.
+        cursor (str | None): The opaque cursor returned as `next_cursor` by the previous page.
+        limit (int): The maximum number of users in a page.
+        if_none_match (str | None): The If-None-Match header.
+
+    Returns:
+        Response: The users with the name as UserListResponse.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    after = _decode_cursor(cursor) if cursor else 0
+    return await _page_response(session, users_by_query(User.name, name, after), limit, if_none_match)
 
 
-@router.get("/users/{user_id}")
-def get_user(user_id: int) -> UserResponse:
+@router.get("/users/by-nickname/{nickname}", response_model=UserListResponse)
+async def get_users_by_nickname(
+    nickname: str,
+    session: AsyncReadSessionDep,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=LIST_MAX_LIMIT)] = 100,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """List the users with the given nickname, ordered by ID and paginated like `GET /users`.
+
+    Args:
+        nickname (str): The nickname to look up.
+        session (AsyncSession): The database session.
+        cursor (str | None): The opaque cursor returned as `next_cursor` by the previous page.
+        limit (int): The maximum number of users in a page.
+        if_none_match (str | None): The If-None-Match header.
+
+    Returns:
+        Response: The users with the nickname as UserListResponse.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    after = _decode_cursor(cursor) if cursor else 0
+    return await _page_response(session, users_by_query(User.nickname, nickname, after), limit, if_none_match)
+
+
+@router.get("/users", response_model=UserListResponse)
+async def get_users(  # noqa: PLR0913
+    session: AsyncReadSessionDep,
+    ids: Annotated[list[int] | None, Query()] = None,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=LIST_MAX_LIMIT)] = 100,
+    *,
+    stream: bool = False,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """List users ordered by ID, or retrieve many users by ID with a single query.
+
+    Without `ids`, users are paginated by keyset on `users.id`: pass the `next_cursor` of a page
+    as `cursor` to get the next one. Every page costs the same regardless of its position.
+    With `stream=true`, all users after `cursor` are streamed as NDJSON (`application/x-ndjson`);
+    it can't be combined with `ids`.
+
+    Pages have a weak ETag; a request with a matching If-None-Match is answered with 304 without a body.
+
+    Args:
+        session (AsyncSession): The database session.
+        ids (list[int] | None): The IDs of the users to retrieve, e.g. `?ids=1&ids=2`.
+        cursor (str | None): The opaque cursor returned as `next_cursor` by the previous page.
+        limit (int): The maximum number of users in a page.
+        stream (bool): Stream all users as NDJSON instead of returning a page.
+        if_none_match (str | None): The If-None-Match header.
+
+    Returns:
+        Response: The users in request or ID order, and the IDs that were not found, as UserListResponse.
+
+    Raises:
+        HTTPException: If more than `BATCH_LOOKUP_MAX_SIZE` IDs are requested, if `ids` is combined with
+            `stream`, or if the cursor is invalid.
+    """
+    after = _decode_cursor(cursor) if cursor else 0
+
+    if stream:
+        if ids is not None:
+            raise HTTPException(status_code=400, detail="ids can't be combined with stream")
+        return StreamingResponse(_stream_users(after), media_type="application/x-ndjson")
+
+    if ids is None:
+        return await _page_response(session, select_user_records().filter(User.id > after), limit, if_none_match)
+
+    if len(ids) > BATCH_LOOKUP_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Too many ids in a batch (max {BATCH_LOOKUP_MAX_SIZE})")
+
+    result = await session.execute(select_user_records().filter(User.id.in_(set(ids))))
+    found = {record.id: record for record in (UserRecord(*row) for row in result)}
+
+    users: list[UserRecord] = []
+    missing: list[int] = []
+    for user_id in dict.fromkeys(ids):
+        record = found.get(user_id)
+        if record is None:
+            missing.append(user_id)
+            continue
+        users.append(record)
+
+    etag = _list_etag(users, missing, None)
+    if if_none_match is not None and etag_matches(if_none_match, [etag]):
+        return _not_modified(etag)
+
+    # the fields of UserListResponse, the records are serialized by orjson
+    return ORJSONResponse({"users": users, "missing": missing, "next_cursor": None}, headers={"etag": etag})
+
+
+@router.get("/users/{user_id}", response_model=UserResponse)
+async def get_user(user_id: int, if_none_match: Annotated[str | None, Header()] = None) -> Response:
     """Retrieve a user from the database by user ID.
 
+    The response has a weak ETag, the version of the user; a request with a matching If-None-Match
+    is answered with 304 without serializing the user.
+
+    On a cache miss, concurrent requests for the same user wait for a single query, see `load_user`.
+
     Args:
         user_id (int): The ID of the user to retrieve.
+        if_none_match (str | None): The If-None-Match header.
 
     Returns:
-        UserResponse: The retrieved user information.
+        Response: The retrieved user information as UserResponse.
     """
-    db = Database()
-    db.connect()
+    user = await user_cache.get(str(user_id))
+    if user is None:
+        user = await user_lookups.do(str(user_id), lambda: load_user(user_id))
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
 
-    with db.session() as session:
-        db_user = session.query(User).filter(User.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    return UserResponse(
-        id=int(db_user.id), name=str(db_user.name), fullname=str(db_user.fullname), nickname=str(db_user.nickname)
-    )
+    etag = user_etag(user["version"])
+    if if_none_match is not None and etag_matches(if_none_match, [etag]):
+        return _not_modified(etag)
+    # cached values are dumped UserResponse, no need to validate them again
+    return ORJSONResponse(user, headers={"etag": etag})
 
 
-@router.delete("/users/{user_id}")
-def delete_user(user_id: int) -> UserResponse:
-    """Delete a user from the database by user ID.
+@router.patch("/users/{user_id}", response_model=UserResponse)
+async def update_user(
+    user_id: int, changes: UserUpdate, session: AsyncSessionDep, if_match: Annotated[str | None, Header()] = None
+) -> ORJSONResponse:
+    """Update the given fields of a user with a single conditional statement.
+
+    With an If-Match header (the ETag of the user), the update only happens if the user has not
+    been modified since (`UPDATE ... WHERE id = ? AND version = ?`), so concurrent updates are not lost.
+
+    Args:
+        user_id (int): The ID of the user to update.
+        changes (UserUpdate): The fields to change.
+        session (AsyncSession): The database session.
+        if_match (str | None): The If-Match header.
+
+    Returns:
+        ORJSONResponse: The updated user information as UserResponse, with its new ETag.
+
+    Raises:
+        HTTPException: 400 if no field is given, 404 if the user does not exist,
+            412 if it was modified since the version of If-Match. An explicit null is rejected with 422
+            by UserUpdate, as the fields can't be cleared.
+    """
+    values = changes.model_dump(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+
+    table = User.__table__
+    version = _if_match_version(if_match)
+    stmt = update(table).where(table.c.id == user_id).values(**values, version=table.c.version + 1)
+    if version is not None:
+        stmt = stmt.where(table.c.version == version)
+
+    if session.get_bind().dialect.update_returning:
+        row = (await session.execute(stmt.returning(*table.c))).first()
+    else:
+        # MySQL has no UPDATE ... RETURNING, the updated row is read in the same transaction
+        result = await session.execute(stmt)
+        row = (await session.execute(select(table).where(table.c.id == user_id))).first() if result.rowcount else None
+    if row is None:
+        await _raise_not_found_or_conflict(session, user_id)
+
+    await session.commit()
+    await invalidate_user(user_id)
+    user = UserResponse.model_validate(row)
+    return ORJSONResponse(user, headers={"etag": user_etag(user.version)})
+
+
+@router.delete("/users/{user_id}", response_model=UserResponse)
+async def delete_user(
+    user_id: int, session: AsyncSessionDep, if_match: Annotated[str | None, Header()] = None
+) -> ORJSONResponse:
+    """Delete a user from the database by user ID with a single conditional statement.
+
+    With an If-Match header (the ETag of the user), the user is only deleted if it has not
+    been modified since (`DELETE ... WHERE id = ? AND version = ?`).
 
     Args:
         user_id (int): The ID of the user to delete.
+        session (AsyncSession): The database session.
+        if_match (str | None): The If-Match header.
 
     Returns:
-        UserResponse: The deleted user information.
+        ORJSONResponse: The deleted user information as UserResponse.
+
+    Raises:
+        HTTPException: 404 if the user does not exist, 412 if it was modified since the version of If-Match.
     """
-    db = Database()
-    db.connect()
+    table = User.__table__
+    version = _if_match_version(if_match)
 
-    with db.session() as session:
-        db_user = session.query(User).filter(User.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    session.delete(db_user)
-    session.commit()
-    return UserResponse(
-        id=int(db_user.id), name=str(db_user.name), fullname=str(db_user.fullname), nickname=str(db_user.nickname)
-    )
+    if session.get_bind().dialect.delete_returning:
+        stmt = delete(table).where(table.c.id == user_id)
+        if version is not None:
+            stmt = stmt.where(table.c.version == version)
+        row = (await session.execute(stmt.returning(*table.c))).first()
+    else:
+        # MySQL has no DELETE ... RETURNING: read the row, then delete it only if it is still the same version
+        row = (await session.execute(select(table).where(table.c.id == user_id))).first()
+        if row is not None and version is not None and row.version != version:
+            row = None
+        if row is not None:
+            stmt = delete(table).where(table.c.id == user_id, table.c.version == row.version)
+            if not (await session.execute(stmt)).rowcount:
+                row = None
+    if row is None:
+        await _raise_not_found_or_conflict(session, user_id)
+
+    await session.commit()
+    await invalidate_user(user_id)
+    return ORJSONResponse(UserResponse.model_validate(row))
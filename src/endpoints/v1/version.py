@@ -6,15 +6,16 @@ from fastapi import APIRouter
 
 from src.app import app
 from src.scheme.version import VersionResponse
+from src.utils.responses import ORJSONResponse
 
 router = APIRouter()
 
 logger = getLogger("uvicorn.api.v1").getChild(__name__)
 
 
-@router.get("/")
-async def get_version() -> VersionResponse:
+@router.get("/", response_model=VersionResponse)
+async def get_version() -> ORJSONResponse:
     """Retrieve the current version of the application."""
     version: str = app.version
     logger.info("Version Function was called.")
-    return VersionResponse(version=version)
+    return ORJSONResponse(VersionResponse(version=version))
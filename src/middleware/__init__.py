@@ -0,0 +1 @@
+"""This module contains the ASGI middleware of the FastAPI Application."""
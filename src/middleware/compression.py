@@ -0,0 +1,141 @@
+"""This module provides the middleware compressing responses with gzip or brotli."""
+
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from src.utils.compression import DYNAMIC_LEVELS, ENCODINGS, StreamCompressor, compress, negotiate_encoding
+
+if TYPE_CHECKING:  # pragma: no cover
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Content types worth compressing; images, archives and the like are already compressed
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "+json", "+xml")
+
+
+def _compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return "content-encoding" not in headers and any(
+        content_type.startswith(kind) or content_type.endswith(kind) for kind in COMPRESSIBLE_TYPES
+    )
+
+
+class CompressionMiddleware:
+    """Compress response bodies with the best encoding accepted by the client (brotli, then gzip).
+
+    Bodies sent in one message are compressed only if they are at least `minimum_size` bytes.
+    Streaming responses (several body messages) are compressed chunk by chunk, each chunk being flushed.
+    Responses that already have a Content-Encoding, e.g. the precomputed documentation, are left as they are.
+
+    The middleware is configured by the environment variables
+    - COMPRESSION_MIN_SIZE: The minimum body size in bytes (default: 500)
+    - COMPRESSION_LEVEL: The compression level (default: 6 for gzip, 4 for brotli, see `DYNAMIC_LEVELS`).
+      The compression runs on the event loop, so the maximum levels would delay every other request.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int | None = None, level: int | None = None) -> None:
+        """Initialize the CompressionMiddleware class.
+
+        Args:
+            app (ASGIApp): The wrapped ASGI application.
+            minimum_size (int | None): The minimum body size. Defaults to env COMPRESSION_MIN_SIZE.
+            level (int | None): The compression level. Defaults to env COMPRESSION_LEVEL.
+        """
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+        env_level = os.getenv("COMPRESSION_LEVEL", "")
+        self.level = level if level is not None else (int(env_level) if env_level else None)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Process a request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), ENCODINGS)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressedResponder(encoding, self.minimum_size, self.level, send).run(self.app, scope, receive)
+
+
+class _CompressedResponder:
+    """Compress the response of one request."""
+
+    def __init__(self, encoding: str, minimum_size: int, level: int | None, send: Send) -> None:
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.level = level if level is not None else DYNAMIC_LEVELS[encoding]
+        self.send = send
+        self.start: Message | None = None
+        self.compressor: StreamCompressor | None = None
+        self.passthrough = False
+
+    async def run(self, app: ASGIApp, scope: Scope, receive: Receive) -> None:
+        await app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # hold the start message until the first body message tells whether the body is streamed
+            self.start = message
+            self.passthrough = not _compressible(Headers(raw=message["headers"]))
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+
+        if self.passthrough:
+            await self._send_start()
+            await self.send(message)
+            return
+
+        if self.compressor is None and not more_body:
+            # the whole body is in one message
+            if len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._send_start()
+                await self.send(message)
+                return
+            compressed = compress(body, self.encoding, self.level)
+            self._set_encoding_headers(content_length=len(compressed))
+            await self._send_start()
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        if self.compressor is None:
+            self.compressor = StreamCompressor(self.encoding, self.level)
+            self._set_encoding_headers(content_length=None)
+            await self._send_start()
+
+        chunk = self.compressor.compress(body) if body else b""
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _set_encoding_headers(self, content_length: int | None) -> None:
+        if self.start is None:  # pragma: no cover
+            return
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["content-length"]
+        else:
+            headers["content-length"] = str(content_length)
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            # the compressed body differs from the one the strong ETag was computed for
+            headers["etag"] = "W/" + etag
+
+    async def _send_start(self) -> None:
+        if self.start is not None:
+            await self.send(self.start)
+            self.start = None
@@ -0,0 +1,83 @@
+"""This module provides the middleware rejecting requests early when the worker is overloaded."""
+
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+from src.middleware.metrics import HTTP_REQUESTS_REJECTED
+from src.utils.database import DB_POOL_RECENT_WAIT
+from src.utils.rate_limit import exempt_paths
+from src.utils.responses import ORJSONResponse
+
+if TYPE_CHECKING:  # pragma: no cover
+    from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class LoadSheddingMiddleware:
+    """Answer 503 with Retry-After instead of queueing more work on an overloaded worker.
+
+    A request is shed when the worker already processes `max_in_flight` requests, or when the recent wait
+    for a pooled database connection exceeds `max_pool_wait`: a fast rejection lets the client retry
+    elsewhere, instead of a timeout after queueing behind the other requests.
+
+    The paths of LIMIT_EXEMPT_PATHS, the probes and the metrics, are never shed.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_in_flight: int | None = None,
+        max_pool_wait: float | None = None,
+        retry_after: int | None = None,
+    ) -> None:
+        """Initialize the LoadSheddingMiddleware class.
+
+        Args:
+            app (ASGIApp): The wrapped ASGI application.
+            max_in_flight (int | None): The maximum number of concurrent requests, 0 for no limit.
+                Defaults to env LOAD_SHED_MAX_IN_FLIGHT (default: 0).
+            max_pool_wait (float | None): The maximum recent pool checkout wait in seconds, 0 for no limit.
+                Defaults to env LOAD_SHED_MAX_POOL_WAIT_MS (milliseconds, default: 0).
+            retry_after (int | None): The Retry-After of the rejections in seconds.
+                Defaults to env LOAD_SHED_RETRY_AFTER (default: 1).
+        """
+        self.app = app
+        self.max_in_flight = (
+            max_in_flight if max_in_flight is not None else int(os.getenv("LOAD_SHED_MAX_IN_FLIGHT", "0"))
+        )
+        self.max_pool_wait = (
+            max_pool_wait if max_pool_wait is not None else float(os.getenv("LOAD_SHED_MAX_POOL_WAIT_MS", "0")) / 1000
+        )
+        self.retry_after = retry_after if retry_after is not None else int(os.getenv("LOAD_SHED_RETRY_AFTER", "1"))
+        self.exempt = exempt_paths()
+        self.in_flight = 0
+
+    def _overload(self) -> str | None:
+        """Return the reason to shed the next request, or None to process it."""
+        if self.max_in_flight > 0 and self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        if self.max_pool_wait > 0 and DB_POOL_RECENT_WAIT.get() > self.max_pool_wait:
+            return "pool_wait"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Process a request."""
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+
+        reason = self._overload()
+        if reason is not None:
+            HTTP_REQUESTS_REJECTED.labels(reason).inc()
+            response = ORJSONResponse(
+                {"detail": "Service overloaded"}, status_code=503, headers={"Retry-After": str(self.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
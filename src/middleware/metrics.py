@@ -0,0 +1,70 @@
+"""This module provides the middleware recording request metrics."""
+
+from __future__ import annotations
+
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from src.utils.metrics import Counter, Gauge, Histogram
+
+if TYPE_CHECKING:  # pragma: no cover
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+HTTP_REQUESTS = Counter("http_requests_total", "Number of HTTP requests.", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Duration of HTTP requests in seconds.", ["method", "route"]
+)
+HTTP_REQUESTS_REJECTED = Counter(
+    "http_requests_rejected_total", "Number of HTTP requests rejected by rate limiting or load shedding.", ["reason"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "Number of HTTP requests being processed.")
+
+# Route label of requests that did not match any route, so that unknown paths do not create new time series
+UNMATCHED_ROUTE = "<unmatched>"
+# Method label of requests with any other method, so that arbitrary methods do not create new time series
+OTHER_METHOD = "OTHER"
+KNOWN_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "TRACE", "CONNECT"})
+
+
+class MetricsMiddleware:
+    """Record the latency, status code and number of in-flight HTTP requests per route.
+
+    Requests are labeled by their route template (e.g. `/v1/users/{user_id}`), not by their path.
+    This is a pure ASGI middleware, so it does not buffer or wrap the response body.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Initialize the MetricsMiddleware class.
+
+        Args:
+            app (ASGIApp): The wrapped ASGI application.
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Process a request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            # the router stores the matched route in the scope
+            route = scope.get("route")
+            path = getattr(route, "path", UNMATCHED_ROUTE)
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else OTHER_METHOD
+            HTTP_REQUEST_DURATION.labels(method, path).observe(elapsed)
+            HTTP_REQUESTS.labels(method, path, str(status)).inc()
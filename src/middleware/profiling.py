@@ -0,0 +1,92 @@
+"""This module provides the middleware profiling the requests that ask for it."""
+
+from __future__ import annotations
+
+import cProfile
+import hmac
+import time
+import uuid
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from src.utils.log import request_id
+from src.utils.profiling import RequestProfile, RequestProfiles, admin_token, format_stats, request_profiles
+
+if TYPE_CHECKING:  # pragma: no cover
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# The request header carrying the admin token to profile a request, and the response header with the profile ID
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+
+class ProfilingMiddleware:
+    """Profile the requests carrying the admin token in the X-Profile header with cProfile.
+
+    The response carries the ID of the profile in the X-Profile-ID header, and the report is served by
+    `GET /admin/profile/requests/{profile_id}`. Only one request is profiled at a time: while one is,
+    other requests asking for a profile are processed without. cProfile profiles the event loop thread,
+    so the report also contains the requests processed concurrently on the worker.
+
+    This middleware is only added when profiling is enabled, see `src.utils.profiling.profiling_enabled`.
+    """
+
+    def __init__(self, app: ASGIApp, profiles: RequestProfiles | None = None) -> None:
+        """Initialize the ProfilingMiddleware class.
+
+        Args:
+            app (ASGIApp): The wrapped ASGI application.
+            profiles (RequestProfiles | None): The store of the profiles. Defaults to the shared one.
+        """
+        self.app = app
+        self.profiles = profiles if profiles is not None else request_profiles
+        self.token = admin_token().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Process a request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = dict(scope["headers"]).get(PROFILE_HEADER)
+        if (
+            header is None
+            or not self.token
+            or not hmac.compare_digest(header, self.token)
+            or not RequestProfiles.lock.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = request_id.get() or uuid.uuid4().hex
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, profile_id.encode("latin-1"))]
+            await send(message)
+
+        started = time.time()
+        start = perf_counter()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profile.disable()
+        finally:
+            RequestProfiles.lock.release()
+            self.profiles.add(
+                RequestProfile(
+                    id=profile_id,
+                    method=scope["method"],
+                    path=scope["path"],
+                    status=status,
+                    duration_ms=round((perf_counter() - start) * 1000, 3),
+                    started=started,
+                    stats=format_stats(profile),
+                )
+            )
@@ -0,0 +1,132 @@
+"""This module provides the middleware limiting the request rate of each client."""
+
+from __future__ import annotations
+
+import math
+import os
+from logging import getLogger
+from typing import TYPE_CHECKING
+
+from starlette.routing import Match
+
+from src.middleware.metrics import HTTP_REQUESTS_REJECTED
+from src.utils.rate_limit import Rate, create_token_buckets, exempt_paths, parse_rate, parse_route_rates
+from src.utils.responses import ORJSONResponse
+
+if TYPE_CHECKING:  # pragma: no cover
+    from starlette.routing import Router
+    from starlette.types import ASGIApp, Receive, Scope, Send
+
+    from src.utils.rate_limit import TokenBuckets
+
+logger = getLogger("uvicorn.api").getChild(__name__)
+
+
+class RateLimitMiddleware:
+    """Limit the request rate of each client with token buckets, and answer 429 with Retry-After beyond it.
+
+    The limits are configured by the environment variables
+    - RATE_LIMIT: The limit of each client over every route, e.g. `100/second` (default: none).
+    - RATE_LIMIT_ROUTES: The limits of each client on given routes, by method and route template,
+      e.g. `POST /v1/users=10/second,GET /v1/users/{user_id}=100/second` (default: none).
+    - RATE_LIMIT_KEY_HEADER: The request header identifying the client, e.g. `x-api-key`
+      (default: none, the client address is used).
+    - RATE_LIMIT_BACKEND, RATE_LIMIT_MAX_KEYS, REDIS_URL: see `src.utils.rate_limit.create_token_buckets`.
+
+    Without any limit, requests are passed through untouched. The paths of LIMIT_EXEMPT_PATHS are never limited.
+    If the shared backend fails, requests are let through rather than rejected.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        app: ASGIApp,
+        *,
+        router: Router | None = None,
+        default: Rate | None = None,
+        routes: dict[str, Rate] | None = None,
+        buckets: TokenBuckets | None = None,
+        key_header: str | None = None,
+    ) -> None:
+        """Initialize the RateLimitMiddleware class.
+
+        Args:
+            app (ASGIApp): The wrapped ASGI application.
+            router (Router | None): The router matching the route templates of RATE_LIMIT_ROUTES,
+                required for route limits.
+            default (Rate | None): Defaults to env RATE_LIMIT.
+            routes (dict[str, Rate] | None): The limits by `<method> <route template>`.
+                Defaults to env RATE_LIMIT_ROUTES.
+            buckets (TokenBuckets | None): Defaults to `create_token_buckets()`.
+            key_header (str | None): Defaults to env RATE_LIMIT_KEY_HEADER.
+        """
+        self.app = app
+        self.router = router
+        limit = os.getenv("RATE_LIMIT")
+        self.default = default if default is not None else parse_rate(limit) if limit else None
+        self.routes = routes if routes is not None else parse_route_rates(os.getenv("RATE_LIMIT_ROUTES", ""))
+        header = key_header if key_header is not None else os.getenv("RATE_LIMIT_KEY_HEADER", "")
+        self.key_header = header.lower().encode("latin-1") or None
+        self.exempt = exempt_paths()
+        self.enabled = self.default is not None or bool(self.routes and router is not None)
+        # the backend is only created when a limit is configured, so that redis is not required otherwise
+        self.buckets = buckets if buckets is not None or not self.enabled else create_token_buckets()
+
+    def _route(self, scope: Scope) -> str | None:
+        """Return the `<method> <route template>` of the request if it has a limit."""
+        if self.router is None or not self.routes:
+            return None
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                key = f"{scope['method']} {getattr(route, 'path', '')}"
+                return key if key in self.routes else None
+        return None
+
+    def _client(self, scope: Scope) -> str:
+        """Return the key identifying the client of the request."""
+        if self.key_header is not None:
+            value = dict(scope["headers"]).get(self.key_header)
+            if value:
+                return value.decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def _wait(self, scope: Scope) -> float:
+        """Take a token from the buckets of the request, and return the seconds to wait if one is empty.
+
+        The tokens are taken from the route and client buckets together, or from neither, so that a request
+        rejected by one bucket does not spend the token of the other.
+        """
+        if self.buckets is None:  # pragma: no cover (set whenever enabled)
+            return 0.0
+        client = self._client(scope)
+        route = self._route(scope)
+        buckets = {}
+        if route is not None:
+            buckets[f"{client}:{route}"] = self.routes[route]
+        if self.default is not None:
+            buckets[client] = self.default
+        return await self.buckets.take_all(buckets) if buckets else 0.0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Process a request."""
+        if scope["type"] != "http" or not self.enabled or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            wait = await self._wait(scope)
+        except Exception:
+            # fail open: an outage of the shared backend must not take the API down with it
+            logger.warning("Rate limit backend failed, the request is not limited", exc_info=True)
+            wait = 0.0
+
+        if wait > 0:
+            HTTP_REQUESTS_REJECTED.labels("rate_limited").inc()
+            response = ORJSONResponse(
+                {"detail": "Too many requests"}, status_code=429, headers={"Retry-After": str(math.ceil(wait))}
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,87 @@
+"""This module provides the middleware keeping the reads of a client on the primary right after its writes."""
+
+from __future__ import annotations
+
+import math
+import time
+from contextlib import suppress
+from typing import TYPE_CHECKING
+
+from starlette.requests import cookie_parser
+
+from src.utils.replicas import ReadYourWrites, read_your_writes, replicas_configured, sticky_seconds
+
+if TYPE_CHECKING:  # pragma: no cover
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# The cookie holding the time of the last write of the client, in seconds since the epoch
+LAST_WRITE_COOKIE = "last_write"
+
+
+def parse_last_write(cookie: bytes) -> float | None:
+    """Return the time of the last write from the Cookie header, or None if it is missing or invalid.
+
+    The cookie is sent by the client, so it is not trusted: values that are not finite are ignored,
+    and times in the future are capped at now plus DB_REPLICA_STICKY_SECONDS, so that a forged cookie
+    can't keep the reads of a client on the primary for longer than a real write would.
+
+    Args:
+        cookie (bytes): The value of the Cookie header.
+
+    Returns:
+        float | None: The time of the last write, in seconds since the epoch.
+    """
+    with suppress(KeyError, ValueError):
+        last_write = float(cookie_parser(cookie.decode("latin-1"))[LAST_WRITE_COOKIE])
+        if math.isfinite(last_write):
+            return min(last_write, time.time() + sticky_seconds())
+    return None
+
+
+class ReadYourWritesMiddleware:
+    """Carry the time of the last write of a client between its requests, see `src.utils.replicas`.
+
+    The time is read from the `last_write` cookie into the request context; when the request writes
+    to the primary, the response sets the cookie for DB_REPLICA_STICKY_SECONDS, during which the reads
+    of the client use the primary. Without replicas, no cookie is set.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Initialize the ReadYourWritesMiddleware class.
+
+        Args:
+            app (ASGIApp): The wrapped ASGI application.
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Process a request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = ReadYourWrites()
+        cookie = dict(scope["headers"]).get(b"cookie")
+        if cookie is not None:
+            state.last_write = parse_last_write(cookie)
+        received = state.last_write
+
+        async def send_wrapper(message: Message) -> None:
+            if (
+                message["type"] == "http.response.start"
+                and state.last_write != received
+                and state.last_write is not None
+                and replicas_configured()
+            ):
+                value = (
+                    f"{LAST_WRITE_COOKIE}={state.last_write:.3f}; Max-Age={math.ceil(sticky_seconds())}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", value.encode("latin-1"))]
+            await send(message)
+
+        token = read_your_writes.set(state)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            read_your_writes.reset(token)
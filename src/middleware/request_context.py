@@ -0,0 +1,73 @@
+"""This module provides the middleware that identifies requests in the logs."""
+
+from __future__ import annotations
+
+import uuid
+from logging import INFO, getLogger
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from src.utils.log import request_id, request_start
+
+if TYPE_CHECKING:  # pragma: no cover
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# One record per request, with its status and latency; a replacement of the uvicorn access log in JSON logging
+access_logger = getLogger("uvicorn.api").getChild("access")
+
+REQUEST_ID_HEADER = b"x-request-id"
+# Longer client-provided request IDs are replaced, so that they can't flood the logs
+REQUEST_ID_MAX_LENGTH = 128
+
+
+class RequestContextMiddleware:
+    """Give every request an ID and log its completion.
+
+    The ID is taken from the X-Request-ID request header, or generated, and returned in the X-Request-ID
+    response header. It is stored with the start time of the request in the context variables of `src.utils.log`,
+    so that every record logged while processing the request carries them.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Initialize the RequestContextMiddleware class.
+
+        Args:
+            app (ASGIApp): The wrapped ASGI application.
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Process a request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"")
+        current_id = header.decode("latin-1") if 0 < len(header) <= REQUEST_ID_MAX_LENGTH else uuid.uuid4().hex
+        start = perf_counter()
+        id_token = request_id.set(current_id)
+        start_token = request_start.set(start)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, current_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if access_logger.isEnabledFor(INFO):
+                method, path = scope["method"], scope["path"]
+                latency_ms = round((perf_counter() - start) * 1000, 3)
+                access_logger.info(
+                    "%s %s %d",
+                    method,
+                    path,
+                    status,
+                    extra={"method": method, "path": path, "status": status, "latency_ms": latency_ms},
+                )
+            request_id.reset(id_token)
+            request_start.reset(start_token)
@@ -0,0 +1,34 @@
+"""This module exports the OpenAPI document of the application at build time.
+
+Run `python -m src.openapi openapi.json` (e.g. in the Docker build) and set the environment variable
+OPENAPI_FILE to the written file, so that workers load the document instead of generating it.
+"""
+
+import sys
+from pathlib import Path
+
+import orjson
+
+from src import app
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Write the OpenAPI document to the path given as argument, or to stdout.
+
+    Args:
+        argv (list[str] | None): The command line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: The exit code.
+    """
+    argv = argv if argv is not None else sys.argv[1:]
+    document = orjson.dumps(app.openapi())
+    if argv:
+        Path(argv[0]).write_bytes(document)
+    else:
+        sys.stdout.buffer.write(document)
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -1,6 +1,8 @@
-"""This module contains Pydantic models for user-related operations."""
+"""This module contains Pydantic models for user-related operations, and the UserRecord of the read paths."""
 
-from pydantic import BaseModel
+from dataclasses import dataclass
+
+from pydantic import BaseModel, ConfigDict, field_validator
 
 
 class UserCreate(BaseModel):
@@ -11,10 +13,85 @@ class UserCreate(BaseModel):
     nickname: str
 
 
+class UserUpdate(BaseModel):
+    """Schema for updating a user. Only the given fields are changed.
+
+    The fields can be omitted but not null: the columns are not nullable, so an explicit null is rejected
+    rather than ignored, which would answer 200 without clearing the field.
+    """
+
+    name: str | None = None
+    fullname: str | None = None
+    nickname: str | None = None
+
+    @field_validator("name", "fullname", "nickname")
+    @classmethod
+    def _reject_null(cls, value: str | None) -> str:
+        # the defaults are not validated, so only explicit nulls get here
+        if value is None:
+            msg = "can't be null, omit the field to keep its value"
+            raise ValueError(msg)
+        return value
+
+
 class UserResponse(BaseModel):
-    """Represents the response model for a user."""
+    """Represents the response model for a user.
+
+    It can be built directly from a User row with `UserResponse.model_validate(db_user)`.
+    `version` is incremented on every update; send it back in If-Match to update or delete
+    the user only if it has not changed since.
+    """
+
+    model_config = ConfigDict(from_attributes=True)
 
     id: int
     name: str
     fullname: str
     nickname: str
+    version: int = 1
+
+
+@dataclass(frozen=True, slots=True)
+class UserRecord:
+    """A user row read by the read paths, with the same JSON representation as UserResponse.
+
+    The read paths select the columns of the users table with Core `select()` and map each row to a
+    UserRecord, instead of loading a `User` instance (identity map, attribute instrumentation and expiry
+    state) and copying it into a UserResponse: one small immutable object per row, serialized natively by orjson.
+    The fields are in the order of the selected columns, so that `UserRecord(*row)` maps a row.
+    """
+
+    id: int
+    name: str
+    fullname: str
+    nickname: str
+    version: int = 1
+
+
+class UserBatchItemResult(BaseModel):
+    """Represents the result of one item of a batch request.
+
+    Exactly one of `user` and `error` is set.
+    """
+
+    index: int
+    user: UserResponse | None = None
+    error: str | None = None
+
+
+class UserBatchResponse(BaseModel):
+    """Represents the response model for a batch of created users, in request order."""
+
+    results: list[UserBatchItemResult]
+
+
+class UserListResponse(BaseModel):
+    """Represents the response model for a list of users.
+
+    `missing` contains the requested IDs that were not found.
+    `next_cursor` is the opaque cursor of the next page, or None on the last page.
+    """
+
+    users: list[UserResponse]
+    missing: list[int] = []
+    next_cursor: str | None = None
@@ -0,0 +1,102 @@
+"""This module is the production entry point of the FastAPI application.
+
+Run it with `python -m src.server`. Unlike the development server (`uvicorn src:app --reload`),
+it runs several worker processes without a file watcher, using uvloop and httptools when they are installed.
+
+The server is configured by the environment variables
+- HOST: The address to bind (default: 0.0.0.0)
+- PORT: The port to bind (default: 5000)
+- WEB_CONCURRENCY: The number of worker processes (default: the number of usable CPUs)
+- BACKLOG: The maximum number of pending connections (default: 2048)
+- KEEP_ALIVE_TIMEOUT: Seconds an idle keep-alive connection stays open (default: 75).
+  Keep it above the idle timeout of the load balancer in front of the server.
+- GRACEFUL_SHUTDOWN_TIMEOUT: Seconds in-flight requests are given to finish on shutdown (default: 30)
+- LIMIT_CONCURRENCY: The maximum number of concurrent connections per worker before answering 503 (default: none)
+- LIMIT_MAX_REQUESTS: Restart a worker after this number of requests (default: none)
+- ACCESS_LOG: Whether to write the access log (default: true)
+- LOG_CONFIG: The logging configuration file (default: log_config.yaml).
+
+With more than one worker, the state written by one worker must be seen by the others, so the server refuses to
+start with IDEMPOTENCY_BACKEND=memory (see `src.utils.idempotency`) or CACHE_BACKEND=memory, whose entries
+would not be invalidated by the writes of the other workers (see `src.utils.cache`). Without CACHE_BACKEND,
+the workers run without cache.
+
+On shutdown, each worker stops accepting connections, waits for in-flight requests and then
+runs the application lifespan, which disposes the database connection pools.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from importlib.util import find_spec
+from typing import Any
+
+
+def cpu_count() -> int:
+    """Return the number of CPUs usable by the process."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1  # pragma: no cover
+
+
+def _optional_int(name: str) -> int | None:
+    value = os.getenv(name, "")
+    return int(value) if value else None
+
+
+def server_options() -> dict[str, Any]:
+    """Build the keyword arguments of `uvicorn.run` from the environment variables.
+
+    Returns:
+        dict[str, Any]: The keyword arguments.
+    """
+    return {
+        "host": os.getenv("HOST", "0.0.0.0"),  # noqa: S104
+        "port": int(os.getenv("PORT", "5000")),
+        "workers": int(os.getenv("WEB_CONCURRENCY", "0")) or cpu_count(),
+        "loop": "uvloop" if find_spec("uvloop") else "asyncio",
+        "http": "httptools" if find_spec("httptools") else "h11",
+        "backlog": int(os.getenv("BACKLOG", "2048")),
+        "timeout_keep_alive": int(os.getenv("KEEP_ALIVE_TIMEOUT", "75")),
+        "timeout_graceful_shutdown": int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30")),
+        "limit_concurrency": _optional_int("LIMIT_CONCURRENCY"),
+        "limit_max_requests": _optional_int("LIMIT_MAX_REQUESTS"),
+        "access_log": os.getenv("ACCESS_LOG", "true").lower() == "true",
+        "log_config": os.getenv("LOG_CONFIG", "log_config.yaml"),
+        "lifespan": "on",
+        "server_header": False,
+    }
+
+
+def main() -> None:
+    """Start the production server.
+
+    Raises:
+        SystemExit: If several workers would each keep their own Idempotency-Keys or cache.
+    """
+    import uvicorn  # noqa: PLC0415
+
+    from src.utils.cache import cache_backend  # noqa: PLC0415
+    from src.utils.idempotency import idempotency_backend  # noqa: PLC0415
+
+    options = server_options()
+    if options["workers"] > 1:
+        if idempotency_backend() == "memory":
+            sys.exit(
+                "IDEMPOTENCY_BACKEND=memory keeps the Idempotency-Keys per worker: "
+                "use the database or redis backend, or set WEB_CONCURRENCY=1"
+            )
+        if "CACHE_BACKEND" not in os.environ:
+            # inherited by the workers
+            os.environ["CACHE_BACKEND"] = "none"
+        elif cache_backend() == "memory":
+            sys.exit(
+                "CACHE_BACKEND=memory keeps a cache per worker, which the writes of the other workers "
+                "do not invalidate: use the redis or none backend, or set WEB_CONCURRENCY=1"
+            )
+    uvicorn.run("src:app", **options)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
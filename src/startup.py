@@ -0,0 +1,227 @@
+"""This module contains the startup routine of the application.
+
+Run `python -m src.startup` before starting the server (start.sh does it): it waits until the database
+accepts connections, retrying with exponential backoff, and then applies the migrations with Alembic.
+
+Each worker then warms itself up in the background once it is started (see `warm_up`), and reports
+its progress on /readyz, so that traffic is only sent to workers that are actually ready.
+
+The startup is configured by the environment variables
+- STARTUP_DB_TIMEOUT: Seconds to wait for the database before giving up (default: 120)
+- STARTUP_BACKOFF_MAX: The maximum delay between two connection attempts, in seconds (default: 5)
+- WARMUP_CACHE_USERS: The number of recent users loaded into the cache by the warm-up (default: 100).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import NullPool, QueuePool
+
+from database.config import database_url
+from src.app_detail import APIDetail
+from src.endpoints.docs import build_docs
+from src.utils.async_database import AsyncDatabase
+from src.utils.database import Database
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterator
+
+    from fastapi import FastAPI
+
+logger = getLogger("uvicorn.api").getChild(__name__)
+
+ALEMBIC_CONFIG = Path(__file__).parent.parent / "alembic.ini"
+
+
+@dataclass
+class StartupState:
+    """The warm-up progress of the worker, reported on /readyz.
+
+    Attributes:
+        phase (str): The current phase: `starting`, one of the warm-up steps, `ready`, `failed` or `stopping`.
+        completed (list[str]): The warm-up steps already done.
+        error (str | None): The error that stopped the warm-up, if any.
+    """
+
+    phase: str = "starting"
+    completed: list[str] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def ready(self) -> bool:
+        """Return whether the worker can receive traffic."""
+        return self.phase == "ready"
+
+    def reset(self) -> None:
+        """Reset the state when the application starts."""
+        self.phase = "starting"
+        self.completed = []
+        self.error = None
+
+
+# The startup state of this worker process
+startup_state = StartupState()
+
+
+def backoff_delays(initial: float = 0.1, maximum: float | None = None) -> Iterator[float]:
+    """Yield exponentially increasing delays, capped at `maximum` (env STARTUP_BACKOFF_MAX).
+
+    Args:
+        initial (float): The first delay in seconds.
+        maximum (float | None): The maximum delay in seconds.
+
+    Yields:
+        float: The next delay in seconds.
+    """
+    maximum = maximum if maximum is not None else float(os.getenv("STARTUP_BACKOFF_MAX", "5"))
+    delay = initial
+    while True:
+        yield min(delay, maximum)
+        delay *= 2
+
+
+def wait_for_database(db_path: str, timeout: float | None = None) -> int:
+    """Wait until the database accepts connections, retrying with exponential backoff.
+
+    Args:
+        db_path (str): The database connection string.
+        timeout (float | None): Seconds to wait before giving up. Defaults to env STARTUP_DB_TIMEOUT.
+
+    Returns:
+        int: The number of attempts.
+
+    Raises:
+        TimeoutError: If the database is still unreachable after `timeout` seconds.
+    """
+    timeout = timeout if timeout is not None else float(os.getenv("STARTUP_DB_TIMEOUT", "120"))
+    deadline = time.monotonic() + timeout
+    engine = create_engine(db_path, poolclass=NullPool)
+
+    try:
+        for attempt, delay in enumerate(backoff_delays(), start=1):
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+            except SQLAlchemyError as e:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    msg = f"Database is unreachable after {attempt} attempts: {e}"
+                    raise TimeoutError(msg) from None
+                logger.info("Database is not reachable yet (attempt %d), retrying in %.1f s", attempt, delay)
+                time.sleep(min(delay, remaining))
+            else:
+                logger.info("Database is reachable (attempt %d)", attempt)
+                return attempt
+    finally:
+        engine.dispose()
+
+    raise AssertionError  # pragma: no cover
+
+
+def run_migrations() -> None:
+    """Apply the database migrations (`alembic upgrade head`)."""
+    from alembic import command  # noqa: PLC0415
+    from alembic.config import Config  # noqa: PLC0415
+
+    config = Config(str(ALEMBIC_CONFIG))
+    config.set_main_option("script_location", str(ALEMBIC_CONFIG.parent / "database"))
+    # keep the logging configuration of the caller
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+
+async def _warm_pools() -> None:
+    """Open the pooled connections of the sync and async engines, so that the first requests reuse them."""
+    engine = Database().connect().engine
+    if engine is not None:
+        size = engine.pool.size() if isinstance(engine.pool, QueuePool) else 1
+
+        def open_connections() -> None:
+            connections = [engine.connect() for _ in range(size)]
+            for connection in connections:
+                connection.close()
+
+        await asyncio.to_thread(open_connections)
+
+    async_engine = AsyncDatabase().connect().engine
+    if async_engine is not None:
+        size = async_engine.pool.size() if isinstance(async_engine.pool, QueuePool) else 1
+        connections = [await async_engine.connect() for _ in range(size)]
+        await asyncio.gather(*(connection.close() for connection in connections))
+
+
+async def warm_up(app: FastAPI, state: StartupState = startup_state) -> None:
+    """Warm up the worker and mark it ready.
+
+    The steps are
+    - `database`: open the pooled connections, retrying with backoff until the database is reachable
+    - `openapi`: build the OpenAPI document and the documentation pages, see `src.endpoints.docs`
+    - `cache`: load the most recent users into the cache (env WARMUP_CACHE_USERS).
+
+    Args:
+        app (FastAPI): The application.
+        state (StartupState): The state updated with the progress.
+    """
+    try:
+        state.phase = "database"
+        for delay in backoff_delays():
+            try:
+                await _warm_pools()
+                break
+            except (SQLAlchemyError, OSError) as e:
+                logger.warning("Database is not reachable yet, retrying in %.1f s: %s", delay, e)
+                await asyncio.sleep(delay)
+        state.completed.append("database")
+
+        state.phase = "openapi"
+        if APIDetail.DOCS_ENABLED:
+            build_docs(app)
+        state.completed.append("openapi")
+
+        state.phase = "cache"
+        # imported here, the endpoints import the application
+        from src.endpoints.v1.user import prime_user_cache  # noqa: PLC0415
+
+        count = await prime_user_cache(int(os.getenv("WARMUP_CACHE_USERS", "100")))
+        logger.debug("Loaded %d users into the cache", count)
+        state.completed.append("cache")
+    except Exception as e:
+        logger.exception("Warm-up failed in phase %s", state.phase)
+        state.error = f"{type(e).__name__}: {e}"
+        state.phase = "failed"
+        return
+
+    state.phase = "ready"
+    logger.info("Worker is ready")
+
+
+def main() -> int:
+    """Wait for the database and apply the migrations.
+
+    Returns:
+        int: The exit code.
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        wait_for_database(database_url())
+    except TimeoutError:
+        logger.exception("Database did not become reachable")
+        return 1
+
+    run_migrations()
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
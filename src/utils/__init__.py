@@ -1,3 +1,4 @@
 """This module provides utility functions and classes for the application."""
 
-from .database import Database  # noqa: F401
+from .async_database import AsyncDatabase, dispose_async_engines, get_async_session  # noqa: F401
+from .database import Database, dispose_engines, get_engine  # noqa: F401
@@ -0,0 +1,337 @@
+"""This module provides the AsyncDatabase class and the AsyncSession dependency for async endpoints."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import asynccontextmanager, nullcontext
+from logging import getLogger
+from typing import TYPE_CHECKING, Annotated
+
+from fastapi import Depends
+from sqlalchemy import make_url, text
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from database.config import engine_options
+from database.models import Base
+from src.utils.database import Database, instrument_engine
+from src.utils.query_profiler import profile_queries
+from src.utils.replicas import ReplicaSet, get_replica_set, replica_label
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import AsyncGenerator
+
+logger = getLogger("uvicorn.api").getChild(__name__)
+
+# Async drivers used for each backend.
+ASYNC_DRIVERS = {
+    "mysql": "aiomysql",
+    "sqlite": "aiosqlite",
+}
+
+# Async engines are shared by every AsyncDatabase instance of the worker process, keyed by the connection string.
+_async_engines: dict[str, AsyncEngine] = {}
+_tables_created: set[str] = set()
+
+
+def to_async_url(db_path: str) -> str:
+    """Convert a connection string to the same database using its async driver.
+
+    Example:
+        ```python
+        to_async_url("mysql://user:pass@db/app")  # "mysql+aiomysql://user:pass@db/app"
+        to_async_url("sqlite:///:memory:")  # "sqlite+aiosqlite:///:memory:"
+        ```
+
+    Args:
+        db_path (str): The (sync) database connection string.
+
+    Returns:
+        str: The connection string using the async driver.
+
+    Raises:
+        ValueError: If there is no async driver for the backend.
+    """
+    url = make_url(db_path)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        msg = f"No async driver for the database backend: {backend}"
+        raise ValueError(msg)
+
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def get_async_engine(db_path: str) -> AsyncEngine:
+    """Return the process-wide async engine for the given async connection string, creating it on first use.
+
+    Args:
+        db_path (str): The async database connection string.
+
+    Returns:
+        AsyncEngine: The shared SQLAlchemy async engine.
+    """
+    engine = _async_engines.get(db_path)
+    if engine is None:
+        # no lock needed, engines are only created from the event loop thread
+        engine = create_async_engine(db_path, **engine_options(db_path))
+        instrument_engine(engine.sync_engine)
+        _async_engines[db_path] = engine
+    return engine
+
+
+async def _create_tables(engine: AsyncEngine) -> None:
+    """Create all tables once per engine, in testing mode."""
+    key = engine.url.render_as_string(hide_password=False)
+    if key not in _tables_created:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        _tables_created.add(key)
+
+
+async def dispose_async_engines() -> None:
+    """Dispose every shared async engine and close their pooled connections.
+
+    This should be called once when the worker process shuts down.
+    """
+    engines = list(_async_engines.values())
+    _async_engines.clear()
+    _tables_created.clear()
+
+    await asyncio.gather(*(engine.dispose() for engine in engines))
+
+
+class AsyncDatabase:
+    """The `AsyncDatabase` class is the asyncio counterpart of `Database`.
+
+    It accepts the same parameters and environment variables as `Database` and connects to the
+    same database through an async driver (aiomysql for MySQL, aiosqlite for SQLite).
+
+    Attributes:
+        db_path (str): The async database connection string.
+        connection (bool): Indicates whether a connection to the database has been established.
+        pytest_enabled (bool): Indicates whether pytest is enabled. If env PYTEST is set to true, this will be True.
+        profile_enabled (bool): Indicates whether sessions are profiled. If env DB_PROFILE is set to true,
+            this will be True. See `src.utils.query_profiler` for the thresholds.
+        engine (AsyncEngine | None): The shared SQLAlchemy async engine for the database connection.
+        replica_paths (list[str]): The (sync) connection strings of the read replicas.
+        replicas (ReplicaSet | None): The replica set, shared with `Database`, if there are replicas.
+    """
+
+    db_path = ""
+    connection = False
+    engine: AsyncEngine | None = None
+    replicas: ReplicaSet | None = None
+    _session_local: async_sessionmaker[AsyncSession]
+
+    def __init__(  # noqa: PLR0913
+        self,
+        sqlite_path: str | None = None,
+        host: str | None = None,
+        db_name: str | None = None,
+        db_user: str | None = None,
+        db_pass: str | None = None,
+        *,
+        replica_paths: list[str] | None = None,
+    ) -> None:
+        """Initialize the AsyncDatabase class.
+
+        See `Database.__init__` for how the connection string is resolved.
+
+        Args:
+            sqlite_path (str | None): The path to the SQLite database.
+            host (str | None): The hostname of the database server.
+            db_name (str | None): The name of the database.
+            db_user (str | None): The username for the database connection.
+            db_pass (str | None): The password for the database connection.
+            replica_paths (list[str] | None): The connection strings of the read replicas.
+
+        Raises:
+            ValueError: If both sqlite_path and MySQL parameters are provided,
+            or if required MySQL parameters are missing.
+        """
+        database = Database(
+            sqlite_path=sqlite_path,
+            host=host,
+            db_name=db_name,
+            db_user=db_user,
+            db_pass=db_pass,
+            replica_paths=replica_paths,
+        )
+        self.pytest_enabled = database.pytest_enabled
+        self.profile_enabled = database.profile_enabled
+        self.db_path = to_async_url(database.db_path)
+        self.replica_paths = database.replica_paths
+
+    def connect(self) -> AsyncDatabase:
+        """Connect to the database.
+
+        The engine does not open a connection until the first session uses it.
+
+        Returns:
+            AsyncDatabase: The AsyncDatabase object itself.
+
+        Raises:
+            SQLAlchemyError: If there is an error creating the engine.
+        """
+        if self.connection:
+            return self
+
+        try:
+            self.engine = get_async_engine(self.db_path)
+        except SQLAlchemyError as e:
+            msg = f"Error connecting to the database: {e}"
+            raise SQLAlchemyError(msg) from None
+
+        self._session_local = async_sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        self.replicas = get_replica_set(self.replica_paths) if self.replica_paths else None
+        self.connection = True
+
+        return self
+
+    @asynccontextmanager
+    async def session(self, *, read_only: bool = False) -> AsyncGenerator[AsyncSession, None]:
+        """Create a new async session for the database connection.
+
+        The session is committed when the block exits without an exception.
+        If profiling is enabled, its statements are profiled like in `Database.session()`.
+        A read-only session runs on a replica, like in `Database.session()`.
+
+        Example:
+            ```python
+            db = AsyncDatabase().connect()
+            async with db.session() as session:
+                await session.execute(select(User))
+            ```
+
+        Args:
+            read_only (bool): Run the session on a replica, for sessions that only read.
+
+        Yields:
+            AsyncSession: The SQLAlchemy async session object.
+
+        Raises:
+            ValueError: If the database connection is not established.
+            SQLAlchemyError: If there is an error during the session.
+        """
+        if self.connection is False or self.engine is None:
+            msg = "Database connection is not established"
+            raise ValueError(msg)
+
+        replica = self.replicas.choose() if read_only and self.replicas is not None else None
+        engine = self.engine if replica is None else get_async_engine(to_async_url(replica))
+
+        # create all tables if pytest is enabled
+        if self.pytest_enabled:
+            try:
+                await _create_tables(engine)
+            except OperationalError as e:
+                if replica is not None:
+                    self._replica_failed(replica)
+                msg = f"Error connecting to the database: {e}"
+                raise SQLAlchemyError(msg) from None
+
+        session = self._session_local() if replica is None else self._session_local(bind=engine)
+
+        with (
+            profile_queries() if self.profile_enabled else nullcontext(),
+            self.replicas.track(replica) if self.replicas is not None else nullcontext(),
+        ):
+            try:
+                yield session
+                await session.commit()
+            except SQLAlchemyError as e:
+                await session.rollback()
+                if replica is not None and isinstance(e, OperationalError):
+                    self._replica_failed(replica)
+                msg = f"Error in session: {e}"
+                raise SQLAlchemyError(msg) from None
+            finally:
+                await session.close()
+
+    def _replica_failed(self, replica: str) -> None:
+        """Take a replica that could not serve a session out of rotation."""
+        if self.replicas is not None:
+            logger.warning("Replica %s failed, taking it out of rotation", replica_label(replica))
+            self.replicas.mark_down(replica)
+
+    async def check_replicas(self, check_timeout: float | None = None) -> dict[str, bool]:
+        """Check that each replica answers `SELECT 1`, and update which ones are in rotation.
+
+        Args:
+            check_timeout (float | None): Seconds to wait for each replica.
+                Defaults to env DB_REPLICA_CHECK_TIMEOUT (2).
+
+        Returns:
+            dict[str, bool]: Whether each replica, by connection string, is healthy.
+
+        Raises:
+            ValueError: If the database connection is not established.
+        """
+        if self.connection is False:
+            msg = "Database connection is not established"
+            raise ValueError(msg)
+        if self.replicas is None:
+            return {}
+
+        timeout = check_timeout if check_timeout is not None else float(os.getenv("DB_REPLICA_CHECK_TIMEOUT", "2"))
+        replicas = self.replicas
+
+        async def check(url: str) -> bool:
+            try:
+                async with asyncio.timeout(timeout), get_async_engine(to_async_url(url)).connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+            except (SQLAlchemyError, OSError, TimeoutError) as e:
+                logger.warning("Replica %s failed its health check: %s", replica_label(url), e)
+                replicas.mark_down(url)
+                return False
+            replicas.mark_up(url)
+            return True
+
+        results = await asyncio.gather(*(check(url) for url in replicas.urls))
+        return dict(zip(replicas.urls, results, strict=True))
+
+    def close(self) -> None:
+        """Close the database connection.
+
+        The shared engine and its pool stay open for other instances; use `dispose_async_engines` to close them.
+        """
+        self.engine = None
+        self.connection = False
+
+
+async def monitor_replicas(interval: float | None = None) -> None:
+    """Check the replicas periodically, until cancelled, see `AsyncDatabase.check_replicas`.
+
+    Args:
+        interval (float | None): Seconds between two checks. Defaults to env DB_REPLICA_CHECK_INTERVAL (10).
+    """
+    interval = interval if interval is not None else float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "10"))
+    database = AsyncDatabase().connect()
+    while True:
+        await database.check_replicas()
+        await asyncio.sleep(interval)
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """FastAPI dependency that provides an `AsyncSession` committed after the endpoint returns.
+
+    Yields:
+        AsyncSession: The SQLAlchemy async session object.
+    """
+    async with AsyncDatabase().connect().session() as session:
+        yield session
+
+
+async def get_async_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """FastAPI dependency that provides a read-only `AsyncSession`, on a replica if there are replicas.
+
+    Yields:
+        AsyncSession: The SQLAlchemy async session object.
+    """
+    async with AsyncDatabase().connect().session(read_only=True) as session:
+        yield session
+
+
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+AsyncReadSessionDep = Annotated[AsyncSession, Depends(get_async_read_session)]
@@ -0,0 +1,327 @@
+"""This module provides the cache backends used in front of database lookups."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from src.utils.metrics import Counter
+
+CACHE_HITS = Counter("cache_hits_total", "Number of cache lookups that found a value.", ["cache"])
+CACHE_MISSES = Counter("cache_misses_total", "Number of cache lookups that found nothing.", ["cache"])
+CACHE_EVICTIONS = Counter("cache_evictions_total", "Number of entries evicted from the cache.", ["cache"])
+
+
+@dataclass
+class CacheStats:
+    """Counters of a cache.
+
+    Attributes:
+        hits (int): The number of lookups that found a value.
+        misses (int): The number of lookups that found nothing.
+        evictions (int): The number of entries removed because the cache was full or the entry expired.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class Cache(ABC):
+    """The `Cache` class is the interface of the cache backends.
+
+    Values must be JSON-serializable, so that every backend can store them.
+
+    Attributes:
+        stats (CacheStats): The hit/miss/eviction counters of the cache.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the Cache class."""
+        self.stats = CacheStats()
+
+    @abstractmethod
+    async def get(self, key: str) -> Any | None:  # noqa: ANN401
+        """Return the value stored for the key, or None."""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Store the value for the key."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove the value stored for the key, if any."""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Remove every value of the cache."""
+
+
+class NullCache(Cache):
+    """A cache that stores nothing, used when caching is disabled."""
+
+    async def get(self, key: str) -> Any | None:  # noqa: ANN401, ARG002
+        """Return None."""
+        self.stats.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Do nothing."""
+
+    async def delete(self, key: str) -> None:
+        """Do nothing."""
+
+    async def clear(self) -> None:
+        """Do nothing."""
+
+
+class LRUCache(Cache):
+    """An in-process cache bounded by size and time to live.
+
+    When the cache is full, the least recently used entry is evicted.
+    The cache is local to the worker process and is not shared between workers.
+
+    Attributes:
+        max_size (int): The maximum number of entries.
+        ttl (float): The number of seconds an entry stays valid.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0) -> None:
+        """Initialize the LRUCache class.
+
+        Args:
+            max_size (int): The maximum number of entries.
+            ttl (float): The number of seconds an entry stays valid.
+        """
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Any | None:  # noqa: ANN401
+        """Return the value stored for the key, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.stats.evictions += 1
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Store the value for the key, evicting the least recently used entry if the cache is full."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        """Remove the value stored for the key, if any."""
+        self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        """Remove every value of the cache."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        """Return the number of entries, including expired ones not yet removed."""
+        return len(self._entries)
+
+
+class RedisClient(Protocol):
+    """The subset of the `redis.asyncio.Redis` interface used by `RedisCache`."""
+
+    async def get(self, name: str) -> bytes | str | None:
+        """Return the value of the key."""
+
+    async def set(self, name: str, value: str, ex: int | None = None) -> Any:  # noqa: ANN401
+        """Set the value of the key, expiring after `ex` seconds."""
+
+    async def delete(self, *names: str) -> Any:  # noqa: ANN401
+        """Delete the keys."""
+
+    def scan_iter(self, match: str | None = None) -> Any:  # noqa: ANN401
+        """Iterate over the keys matching the pattern."""
+
+
+class RedisCache(Cache):
+    """A cache stored in Redis (or any server speaking its protocol), shared between workers.
+
+    Values are stored as JSON under `<prefix>:<key>` and expire after `ttl` seconds.
+    Evictions are done by the server and are not counted.
+
+    Attributes:
+        client (RedisClient): The async Redis client.
+        prefix (str): The prefix of every key of this cache.
+        ttl (int): The number of seconds an entry stays valid.
+    """
+
+    def __init__(self, client: RedisClient, prefix: str = "cache", ttl: int = 60) -> None:
+        """Initialize the RedisCache class.
+
+        Args:
+            client (RedisClient): The async Redis client, e.g. `redis.asyncio.Redis`.
+            prefix (str): The prefix of every key of this cache.
+            ttl (int): The number of seconds an entry stays valid.
+        """
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "cache", ttl: int = 60) -> RedisCache:
+        """Create a RedisCache connected to the given URL.
+
+        This requires the optional `redis` package.
+
+        Args:
+            url (str): The Redis URL, e.g. `redis://localhost:6379/0`.
+            prefix (str): The prefix of every key of this cache.
+            ttl (int): The number of seconds an entry stays valid.
+
+        Returns:
+            RedisCache: The cache.
+        """
+        from redis.asyncio import Redis  # noqa: PLC0415
+
+        return cls(Redis.from_url(url), prefix=prefix, ttl=ttl)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def get(self, key: str) -> Any | None:  # noqa: ANN401
+        """Return the value stored for the key, or None."""
+        raw = await self.client.get(self._key(key))
+        if raw is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Store the value for the key."""
+        await self.client.set(self._key(key), json.dumps(value), ex=self.ttl)
+
+    async def delete(self, key: str) -> None:
+        """Remove the value stored for the key, if any."""
+        await self.client.delete(self._key(key))
+
+    async def clear(self) -> None:
+        """Remove every value of this cache (keys with its prefix)."""
+        keys = [key async for key in self.client.scan_iter(match=f"{self.prefix}:*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+class CacheGenerations:
+    """Per-key generation counters, which keep read-through fills from overwriting invalidations.
+
+    A fill reads the database, then stores the row. If a write commits and invalidates the key in between,
+    storing the row read before the write would bring the stale value back until it expires. The fill takes
+    the generation of the key before reading, and only stores the row if no invalidation bumped it since:
+
+        ```python
+        generation = generations.begin(key)
+        try:
+            value = await read()
+            if not generations.changed(key, generation):
+                await cache.set(key, value)
+        finally:
+            generations.end(key)
+        ```
+
+    Only the keys with a fill in progress are tracked, so the counters do not grow with the keys invalidated.
+    The counters are local to the worker: they only guard the fills of the worker that invalidates the key.
+    With a shared backend (redis), a fill in another worker that read the row before the write can still
+    store it after the invalidation, and the stale value is served until it expires (CACHE_TTL).
+    """
+
+    def __init__(self) -> None:
+        """Initialize the CacheGenerations class."""
+        self._generations: dict[str, int] = {}
+        self._fills: dict[str, int] = {}
+
+    def begin(self, key: str) -> int:
+        """Start a fill of the key, and return its current generation."""
+        self._fills[key] = self._fills.get(key, 0) + 1
+        return self._generations.setdefault(key, 0)
+
+    def changed(self, key: str, generation: int) -> bool:
+        """Return whether the key was invalidated since the fill started at the given generation."""
+        return self._generations.get(key, 0) != generation
+
+    def end(self, key: str) -> None:
+        """End a fill of the key, and forget the key once no fill is in progress."""
+        self._fills[key] -= 1
+        if not self._fills[key]:
+            del self._fills[key]
+            del self._generations[key]
+
+    def bump(self, key: str) -> None:
+        """Invalidate the key: the fills in progress must not store what they read."""
+        if key in self._generations:
+            self._generations[key] += 1
+
+
+def cache_backend() -> str:
+    """Return the configured cache backend (env CACHE_BACKEND)."""
+    return os.getenv("CACHE_BACKEND", "memory").lower()
+
+
+def create_cache(prefix: str, ttl: int | None = None) -> Cache:
+    """Create a cache configured from the environment variables.
+
+    The counters of the cache are exposed on /metrics with the label `cache=<prefix>`.
+
+    - CACHE_BACKEND: `memory` (default), `redis` or `none`.
+      `memory` is local to the worker process: the writes handled by other workers do not invalidate it, so
+      `src.server` runs more than one worker without cache unless the backend is set, and refuses `memory`.
+    - CACHE_MAX_SIZE: The maximum number of entries of the memory backend (default: 10000)
+    - CACHE_TTL: The number of seconds an entry stays valid (default: 60)
+    - REDIS_URL: The URL of the redis backend (default: redis://localhost:6379/0)
+
+    Args:
+        prefix (str): The name of the cache, used as key prefix by the redis backend.
+        ttl (int | None): The number of seconds an entry stays valid. Defaults to env CACHE_TTL.
+
+    Returns:
+        Cache: The cache.
+
+    Raises:
+        ValueError: If CACHE_BACKEND is unknown.
+    """
+    backend = cache_backend()
+    ttl = ttl if ttl is not None else int(os.getenv("CACHE_TTL", "60"))
+
+    cache: Cache
+    if backend == "memory":
+        cache = LRUCache(max_size=int(os.getenv("CACHE_MAX_SIZE", "10000")), ttl=ttl)
+    elif backend == "redis":
+        cache = RedisCache.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), prefix=prefix, ttl=ttl)
+    elif backend == "none":
+        cache = NullCache()
+    else:
+        msg = f"Unknown cache backend: {backend}"
+        raise ValueError(msg)
+
+    stats = cache.stats
+    CACHE_HITS.labels(prefix).set_function(lambda: stats.hits)
+    CACHE_MISSES.labels(prefix).set_function(lambda: stats.misses)
+    CACHE_EVICTIONS.labels(prefix).set_function(lambda: stats.evictions)
+    return cache
@@ -0,0 +1,142 @@
+"""This module provides the content encodings (gzip, and brotli when installed) used for responses.
+
+Brotli requires the optional `brotli` package; without it, only gzip is offered.
+"""
+
+from __future__ import annotations
+
+import gzip
+import zlib
+from importlib.util import find_spec
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterable
+
+# The encodings offered to clients, in order of preference
+ENCODINGS: tuple[str, ...] = ("br", "gzip") if find_spec("brotli") else ("gzip",)
+
+# The levels of the bodies compressed per request, which trade some ratio for speed on the event loop
+DYNAMIC_LEVELS: dict[str, int] = {"gzip": 6, "br": 4}
+# The levels of the bodies compressed once and served many times, e.g. `src.utils.responses.PrecomputedResponse`
+STATIC_LEVELS: dict[str, int] = {"gzip": 9, "br": 11}
+
+
+def compress(body: bytes, encoding: str, level: int | None = None) -> bytes:
+    """Compress a body with the given content encoding.
+
+    Args:
+        body (bytes): The body to compress.
+        encoding (str): `gzip` or `br`.
+        level (int | None): The compression level (gzip: 1-9, brotli: 0-11). Defaults to `DYNAMIC_LEVELS`;
+            pass `STATIC_LEVELS` for bodies compressed once and served many times.
+
+    Returns:
+        bytes: The compressed body.
+
+    Raises:
+        ValueError: If the encoding is not supported.
+    """
+    if encoding == "gzip":
+        # mtime=0 makes the output deterministic, so that it can be cached and compared
+        return gzip.compress(body, compresslevel=level if level is not None else DYNAMIC_LEVELS["gzip"], mtime=0)
+    if encoding == "br" and "br" in ENCODINGS:
+        import brotli  # noqa: PLC0415
+
+        return bytes(brotli.compress(body, quality=level if level is not None else DYNAMIC_LEVELS["br"]))
+
+    msg = f"Unsupported content encoding: {encoding}"
+    raise ValueError(msg)
+
+
+class StreamCompressor:
+    """Compress a body sent in several chunks, e.g. a streaming response.
+
+    Each chunk is flushed, so that the client can decode what it has received so far.
+
+    Example:
+        ```python
+        compressor = StreamCompressor("gzip")
+        parts = [compressor.compress(b"line 1"), compressor.compress(b"line 2"), compressor.finish()]
+        ```
+    """
+
+    def __init__(self, encoding: str, level: int | None = None) -> None:
+        """Initialize the StreamCompressor class.
+
+        Args:
+            encoding (str): `gzip` or `br`.
+            level (int | None): The compression level. Defaults to `DYNAMIC_LEVELS`.
+
+        Raises:
+            ValueError: If the encoding is not supported.
+        """
+        if encoding == "gzip":
+            # wbits=31 writes the gzip header and trailer
+            gzip_compressor = zlib.compressobj(
+                level if level is not None else DYNAMIC_LEVELS["gzip"], zlib.DEFLATED, 31
+            )
+            self._compress = gzip_compressor.compress
+            self._flush = lambda: gzip_compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = gzip_compressor.flush
+        elif encoding == "br" and "br" in ENCODINGS:
+            import brotli  # noqa: PLC0415
+
+            brotli_compressor = brotli.Compressor(quality=level if level is not None else DYNAMIC_LEVELS["br"])
+            self._compress = brotli_compressor.process
+            self._flush = brotli_compressor.flush
+            self._finish = brotli_compressor.finish
+        else:
+            msg = f"Unsupported content encoding: {encoding}"
+            raise ValueError(msg)
+
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress a chunk and flush it."""
+        return bytes(self._compress(chunk)) + bytes(self._flush())
+
+    def finish(self) -> bytes:
+        """Return the end of the compressed body."""
+        return bytes(self._finish())
+
+
+def negotiate_encoding(accept_encoding: str, available: Iterable[str] = ENCODINGS) -> str | None:
+    """Choose the content encoding of a response from the Accept-Encoding request header.
+
+    The encoding with the highest quality value wins; on a tie, the first of `available`.
+    Encodings with `q=0` are refused, and `*` matches any encoding not listed.
+
+    Example:
+        ```python
+        negotiate_encoding("gzip, br;q=0.5", ("br", "gzip"))  # "gzip"
+        negotiate_encoding("identity", ("br", "gzip"))  # None
+        ```
+
+    Args:
+        accept_encoding (str): The value of the Accept-Encoding header.
+        available (Iterable[str]): The encodings the server can produce, in order of preference.
+
+    Returns:
+        str | None: The chosen encoding, or None to send the body unencoded.
+    """
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        key, _, value = params.strip().partition("=")
+        if key.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        qualities[name] = quality
+
+    best: str | None = None
+    best_quality = 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
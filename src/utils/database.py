@@ -3,19 +3,177 @@
 from __future__ import annotations
 
 import os
-from contextlib import contextmanager, suppress
-from typing import TYPE_CHECKING
-
-from sqlalchemy import Engine, create_engine
-from sqlalchemy.exc import SQLAlchemyError
+import threading
+from contextlib import contextmanager, nullcontext, suppress
+from logging import getLogger
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.orm.exc import DetachedInstanceError
+from sqlalchemy.pool import ConnectionPoolEntry, PoolProxiedConnection, QueuePool
 
+from database.config import database_url, engine_options, pytest_enabled, replica_urls
 from database.models import Base
+from src.utils.metrics import DecayingAverage, Gauge, Histogram
+from src.utils.query_profiler import profile_queries, record_statement
+from src.utils.replicas import ReplicaSet, get_replica_set, mark_write, replica_label
 
 if TYPE_CHECKING:  # pragma: no cover
     from collections.abc import Generator
 
+    from sqlalchemy.engine import Connection, ExecutionContext
+    from sqlalchemy.engine.interfaces import DBAPICursor
+
+logger = getLogger("uvicorn.api").getChild(__name__)
+
+# Engines are shared by every Database instance of the worker process, keyed by the connection string.
+_engines: dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "Duration of database statements in seconds.", ["pool", "operation"]
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection in seconds.", ["pool"]
+)
+# The recent pool checkout wait of every pool, in seconds, see src.middleware.load_shedding
+DB_POOL_RECENT_WAIT = DecayingAverage()
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out_connections", "Number of checked out pooled connections.", ["pool"])
+DB_POOL_SATURATION = Gauge(
+    "db_pool_saturation", "Ratio of checked out connections to the pool size including overflow.", ["pool"]
+)
+
+# Statement operations recorded as a label, anything else is recorded as OTHER
+_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE"})
+# Operations after which the reads of the client stay on the primary, see src.utils.replicas
+_WRITE_OPERATIONS = frozenset({"INSERT", "UPDATE", "DELETE"})
+
+
+def _pool_name(engine: Engine) -> str:
+    """Return the label of the engine's pool in the metrics, without credentials.
+
+    The label includes the host, so that the primary and each replica of the same database get their own series.
+    """
+    return f"{engine.url.drivername}/{replica_label(engine.url)}"
+
+
+def _before_cursor_execute(  # noqa: PLR0913, PLR0917
+    conn: Connection,
+    cursor: DBAPICursor,  # noqa: ARG001
+    statement: str,  # noqa: ARG001
+    parameters: Any,  # noqa: ANN401, ARG001
+    context: ExecutionContext | None,  # noqa: ARG001
+    executemany: bool,  # noqa: ARG001, FBT001
+) -> None:
+    conn.info.setdefault("statement_start_time", []).append(perf_counter())
+
+
+def _after_cursor_execute(  # noqa: PLR0913, PLR0917
+    conn: Connection,
+    cursor: DBAPICursor,  # noqa: ARG001
+    statement: str,
+    parameters: Any,  # noqa: ANN401
+    context: ExecutionContext | None,  # noqa: ARG001
+    executemany: bool,  # noqa: ARG001, FBT001
+) -> None:
+    elapsed = perf_counter() - conn.info["statement_start_time"].pop()
+    operation = statement.lstrip()[:6].upper()
+    if operation not in _OPERATIONS:
+        operation = "OTHER"
+    elif operation in _WRITE_OPERATIONS:
+        mark_write()
+    DB_STATEMENT_DURATION.labels(_pool_name(conn.engine), operation).observe(elapsed)
+    record_statement(statement, parameters, elapsed)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Record statement durations, pool checkout wait time and pool saturation of the engine.
+
+    The metrics are labeled by pool (`<driver>/<database>`) and exposed on /metrics.
+    Statements are also passed to the query profiler of the current context, if any.
+    For an `AsyncEngine`, pass its `sync_engine`.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine to instrument.
+    """
+    name = _pool_name(engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    # The pool has no event before a checkout starts, so the method waiting for a connection is timed.
+    pool = engine.pool
+    do_get = pool._do_get  # noqa: SLF001
+    wait = DB_POOL_CHECKOUT_WAIT.labels(name)
+
+    def timed_do_get() -> ConnectionPoolEntry:
+        start = perf_counter()
+        try:
+            return do_get()
+        finally:
+            elapsed = perf_counter() - start
+            wait.observe(elapsed)
+            DB_POOL_RECENT_WAIT.observe(elapsed)
+
+    pool._do_get = timed_do_get  # type: ignore[method-assign]  # noqa: SLF001
+
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)  # noqa: SLF001
+        DB_POOL_CHECKED_OUT.labels(name).set_function(pool.checkedout)
+        DB_POOL_SATURATION.labels(name).set_function(lambda: pool.checkedout() / capacity)
+    else:
+        checked_out = DB_POOL_CHECKED_OUT.labels(name)
+
+        def on_checkout(*_: ConnectionPoolEntry | PoolProxiedConnection | Any) -> None:  # noqa: ANN401
+            checked_out.inc()
+
+        def on_checkin(*_: ConnectionPoolEntry | PoolProxiedConnection | Any) -> None:  # noqa: ANN401
+            checked_out.dec()
+
+        event.listen(pool, "checkout", on_checkout)
+        event.listen(pool, "checkin", on_checkin)
+
+
+def get_engine(db_path: str, *, create_tables: bool = False) -> Engine:
+    """Return the process-wide engine for the given connection string, creating it on first use.
+
+    Args:
+        db_path (str): The database connection string.
+        create_tables (bool): Create all tables when the engine is created. Used in testing mode.
+
+    Returns:
+        Engine: The shared SQLAlchemy engine.
+    """
+    engine = _engines.get(db_path)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(db_path)
+        if engine is None:
+            engine = create_engine(db_path, **engine_options(db_path))
+            instrument_engine(engine)
+            if create_tables:
+                Base.metadata.create_all(engine)
+            _engines[db_path] = engine
+
+    return engine
+
+
+def dispose_engines() -> None:
+    """Dispose every shared engine and close their pooled connections.
+
+    This should be called once when the worker process shuts down.
+    """
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+
+    for engine in engines:
+        engine.dispose()
+
 
 class Database:
     """The `Database` class provides an interface for connecting to and interacting with a database.
@@ -24,43 +182,54 @@ class Database:
     direct parameters or environment variables. The class also supports a testing mode using pytest,
     enabling the use of an in-memory SQLite database.
 
+    The underlying engine and its connection pool are shared by all instances that use the same
+    connection string, so creating a `Database` per request does not open a new connection.
+
     Attributes:
         db_path (str): The database connection string.
         connection (bool): Indicates whether a connection to the database has been established.
         pytest_enabled (bool): Indicates whether pytest is enabled. If env PYTEST is set to true, this will be True.
+        profile_enabled (bool): Indicates whether sessions are profiled. If env DB_PROFILE is set to true,
+            this will be True. See `src.utils.query_profiler` for the thresholds.
         engine (Engine | None): The SQLAlchemy engine object for the database connection.
+        replica_paths (list[str]): The connection strings of the read replicas.
+        replicas (ReplicaSet | None): The shared replica set, if there are replicas.
 
     Methods:
         __init__(
             sqlite_path: str | None = None, host: str | None = None, db_name: str | None = None,
-            db_user: str | None = None, db_pass: str | None = None
+            db_user: str | None = None, db_pass: str | None = None, *, replica_paths: list[str] | None = None
         ) -> None:
             Initializes the Database class.
 
         connect() -> Database:
             Establishes a connection to the database.
 
-        session() -> Generator[Session, None, None]:
-            Provides a context manager for database sessions.
+        session(read_only: bool = False) -> Generator[Session, None, None]:
+            Provides a context manager for database sessions, on a replica if read_only.
 
         close() -> None:
-            Closes the database connection.
+            Releases the shared engine from this instance.
 
         __del__() -> None:
-            Closes the database connection when the object is deleted.
+            Releases the shared engine when the object is deleted.
     """
 
     db_path = ""
     connection = False
     engine: Engine | None = None
+    replicas: ReplicaSet | None = None
+    _session_local: sessionmaker[Session]
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         sqlite_path: str | None = None,
         host: str | None = None,
         db_name: str | None = None,
         db_user: str | None = None,
         db_pass: str | None = None,
+        *,
+        replica_paths: list[str] | None = None,
     ) -> None:
         """Initialize the Database class.
 
@@ -73,63 +242,40 @@ class Database:
         - MYSQL_PASSWORD
         - MYSQL_USER.
 
+        The connection string is resolved by `database.config.database_url`, which Alembic uses as well.
+        Unless replica_paths or the connection parameters are provided, the read replicas are read from
+        the environment by `database.config.replica_urls`.
+
         Args:
             sqlite_path (str | None): The path to the SQLite database.
             host (str | None): The hostname of the database server.
             db_name (str | None): The name of the database.
             db_user (str | None): The username for the database connection.
             db_pass (str | None): The password for the database connection.
+            replica_paths (list[str] | None): The connection strings of the read replicas.
 
         Raises:
             ValueError: If both sqlite_path and MySQL parameters are provided,
             or if required MySQL parameters are missing.
         """
-        self.pytest_enabled = os.getenv("PYTEST", "false").lower() == "true"
-        pytest_path = os.getenv("PYTEST_DB", "")
-
-        # if pytest is enabled, set the db path to the pytest_path
-        # if not provided pytest_path, set it to in-memory sqlite
-        if self.pytest_enabled:
-            if not pytest_path:
-                pytest_path = "sqlite:///:memory:"
-            self.db_path = pytest_path
-
-        # you can't provide both sqlite_path and host, db_name, db_user, db_pass
-        elif sqlite_path and (host or db_name or db_user or db_pass):
-            msg = "You can't provide both sqlite_path and host, db_name, db_user, db_pass"
-            raise ValueError(msg)
-
-        # if sqlite_path provided, set the db_path to sqlite_path
-        elif sqlite_path:
-            self.db_path = sqlite_path
-
-        # if host, db_name, db_user, db_pass provided, set the db_path to mysql
-        elif host or db_name or db_user or db_pass:
-            # check all the required fields are provided
-            if not all([host, db_name, db_user, db_pass]):
-                msg = "You must provide host, db_name, db_user, db_pass"
-                raise ValueError(msg)
-
-            self.db_path = f"mysql://{db_user}:{db_pass}@{host}/{db_name}"
-
-        # if nothing provided, read value from env
+        self.pytest_enabled = pytest_enabled()
+        self.profile_enabled = os.getenv("DB_PROFILE", "false").lower() == "true"
+        self.db_path = database_url(
+            sqlite_path=sqlite_path, host=host, db_name=db_name, db_user=db_user, db_pass=db_pass
+        )
+        if replica_paths is not None:
+            self.replica_paths = replica_paths
+        elif sqlite_path or host or db_name or db_user or db_pass:
+            # the replicas of the environment belong to the primary of the environment
+            self.replica_paths = []
         else:
-            db_name = os.getenv("MYSQL_DATABASE", "")
-            db_pass = os.getenv("MYSQL_PASSWORD", "")
-            db_user = os.getenv("MYSQL_USER", "")
-            db_host = os.getenv("MYSQL_HOST", "db")
-
-            if db_name and db_pass and db_user:
-                self.db_path = f"mysql://{db_user}:{db_pass}@{db_host}/{db_name}"
-            else:
-                msg = "You must provide env variables MYSQL_DATABASE, MYSQL_PASSWORD, MYSQL_USER"
-                raise ValueError(msg)
+            self.replica_paths = replica_urls()
 
     def connect(self) -> Database:
         """Connect to the database.
 
         This function generates
-            - engine: The SQLAlchemy engine object for the database connection.
+            - engine: The shared SQLAlchemy engine object for the database connection.
 
         Returns:
             Database: The Database object itself.
@@ -141,27 +287,32 @@ class Database:
             return self
 
         try:
-            self.engine = create_engine(self.db_path)
-
             # create all tables if pytest is enabled
-            if self.pytest_enabled:
-                Base.metadata.create_all(self.engine)
+            self.engine = get_engine(self.db_path, create_tables=self.pytest_enabled)
 
         except SQLAlchemyError as e:
             msg = f"Error connecting to the database: {e}"
             raise SQLAlchemyError(msg) from None
 
+        self._session_local = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, expire_on_commit=False)
+        self.replicas = get_replica_set(self.replica_paths) if self.replica_paths else None
         self.connection = True
 
         return self
 
     @contextmanager
-    def session(self) -> Generator[Session, None, None]:
+    def session(self, *, read_only: bool = False) -> Generator[Session, None, None]:
         """Create a new session for the database connection.
 
         This function generate
             - session: The SQLAlchemy session object for the database connection.
 
+        A read-only session runs on a replica chosen by `replicas`, if any, see `src.utils.replicas`.
+        A replica that cannot be reached is taken out of rotation.
+
+        If profiling is enabled, the statements of the session are counted, slow statements are logged
+        and statements repeated in the session (N+1 patterns) are reported when the session ends.
+
         Example:
             ```python
             db = Database().connect()
@@ -169,6 +320,9 @@ class Database:
                 session.query(User).all()
             ```
 
+        Args:
+            read_only (bool): Run the session on a replica, for sessions that only read.
+
         Yields:
             Session: The SQLAlchemy session object.
 
@@ -180,31 +334,52 @@ class Database:
             msg = "Database connection is not established"
             raise ValueError(msg)
 
-        session_local = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, expire_on_commit=False)
-        session = session_local()
-
-        try:
-            yield session
-            session.commit()
-        except SQLAlchemyError as e:
-            session.rollback()
-            msg = f"Error in session: {e}"
-            raise SQLAlchemyError(msg) from None
-        finally:
-            with suppress(DetachedInstanceError):
-                session.close()
+        replica = self.replicas.choose() if read_only and self.replicas is not None else None
+        if replica is None:
+            session = self._session_local()
+        else:
+            try:
+                session = self._session_local(bind=get_engine(replica, create_tables=self.pytest_enabled))
+            except OperationalError as e:
+                self._replica_failed(replica)
+                msg = f"Error connecting to the replica: {e}"
+                raise SQLAlchemyError(msg) from None
+
+        with (
+            profile_queries() if self.profile_enabled else nullcontext(),
+            self.replicas.track(replica) if self.replicas is not None else nullcontext(),
+        ):
+            try:
+                yield session
+                session.commit()
+            except SQLAlchemyError as e:
+                session.rollback()
+                if replica is not None and isinstance(e, OperationalError):
+                    self._replica_failed(replica)
+                msg = f"Error in session: {e}"
+                raise SQLAlchemyError(msg) from None
+            finally:
+                with suppress(DetachedInstanceError):
+                    session.close()
+
+    def _replica_failed(self, replica: str) -> None:
+        """Take a replica that could not serve a session out of rotation."""
+        if self.replicas is not None:
+            logger.warning("Replica %s failed, taking it out of rotation", replica_label(replica))
+            self.replicas.mark_down(replica)
 
     def __del__(self) -> None:
         """Close the database connection.
 
-        This method disposes of the SQLAlchemy engine, effectively closing the connection to the database.
+        This method releases the shared SQLAlchemy engine from this instance.
         It also sets the `connection` attribute to `False` to indicate that the connection is no longer active.
         """
         self.close()
 
     def close(self) -> None:
-        """Close the database connection."""
-        if self.engine:
-            self.engine.dispose()
+        """Close the database connection.
+
+        The shared engine and its pool stay open for other instances; use `dispose_engines` to close them.
+        """
         self.engine = None
         self.connection = False
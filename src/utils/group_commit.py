@@ -0,0 +1,172 @@
+"""This module provides group commit: concurrent writes collected and executed as one transaction.
+
+Under a burst of inserts, committing every request on its own makes the database flush its log once per row,
+which caps the throughput. A `GroupCommit` collects the items submitted within a small window (or until the batch
+is full), writes them with one call, e.g. one multi-row INSERT and one commit, and returns each caller its result.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from src.utils.metrics import Counter
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Awaitable, Callable
+
+GROUP_COMMIT_BATCHES = Counter("group_commit_batches_total", "Number of batches written.", ["group"])
+GROUP_COMMIT_ITEMS = Counter("group_commit_items_total", "Number of items written in batches.", ["group"])
+
+
+@dataclass
+class GroupCommitStats:
+    """Counters of a group commit.
+
+    Attributes:
+        batches (int): The number of batches written.
+        items (int): The number of items submitted and written.
+        retried (int): The number of items written again on their own after their batch failed.
+    """
+
+    batches: int = 0
+    items: int = 0
+    retried: int = 0
+
+
+@dataclass
+class _Pending[T, R]:
+    """An item waiting for the next batch."""
+
+    item: T
+    future: asyncio.Future[R]
+    submitted: float
+
+
+class GroupCommit[T, R]:
+    """Collect concurrent writes of a worker and execute them in batches.
+
+    A background task writes a batch when its first item has waited `window` seconds, or as soon as
+    `max_size` items are pending, so each write waits at most `window` plus the time of the batches before it.
+    Batches are written one at a time.
+
+    If a batch fails, its items are written again one by one, so that an invalid item only fails its own caller.
+
+    Example:
+        ```python
+        async def insert_users(users: list[UserCreate]) -> list[int]: ...
+
+        user_creates: GroupCommit[UserCreate, int] = GroupCommit("user_create", insert_users)
+        user_id = await user_creates.submit(user)
+        ```
+
+    Attributes:
+        window (float): The maximum time, in seconds, an item waits for others before its batch is written.
+        max_size (int): The maximum number of items of a batch.
+        stats (GroupCommitStats): The counters, exposed on /metrics with the label `group=<name>`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        write: Callable[[list[T]], Awaitable[list[R]]],
+        window: float | None = None,
+        max_size: int | None = None,
+    ) -> None:
+        """Initialize the GroupCommit class.
+
+        Args:
+            name (str): The name of the group, used as metrics label.
+            write (Callable[[list[T]], Awaitable[list[R]]]): Writes the items in one transaction
+                and returns their results in the same order.
+            window (float | None): Defaults to env GROUP_COMMIT_WINDOW_MS (milliseconds, default: 2).
+            max_size (int | None): Defaults to env GROUP_COMMIT_MAX_SIZE (default: 100).
+        """
+        self.window = window if window is not None else float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2")) / 1000
+        self.max_size = max_size if max_size is not None else int(os.getenv("GROUP_COMMIT_MAX_SIZE", "100"))
+        self.stats = GroupCommitStats()
+        self._write = write
+        self._pending: list[_Pending[T, R]] = []
+        self._task: asyncio.Task[None] | None = None
+        self._full: asyncio.Event | None = None
+
+        stats = self.stats
+        GROUP_COMMIT_BATCHES.labels(name).set_function(lambda: stats.batches)
+        GROUP_COMMIT_ITEMS.labels(name).set_function(lambda: stats.items)
+
+    async def submit(self, item: T) -> R:
+        """Add an item to the next batch and wait until it is written.
+
+        Args:
+            item (T): The item to write.
+
+        Returns:
+            R: The result of the item.
+
+        Raises:
+            Exception: The error raised by the write of the item.
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[R] = loop.create_future()
+        self._pending.append(_Pending(item, future, time.monotonic()))
+
+        # the writer task is started on demand and stops when nothing is pending
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._full = asyncio.Event()
+            self._task = loop.create_task(self._run(self._full))
+        elif len(self._pending) >= self.max_size and self._full is not None:
+            self._full.set()
+
+        return await future
+
+    async def _run(self, full: asyncio.Event) -> None:
+        """Write the pending items in batches until there are none left."""
+        while self._pending:
+            delay = self._pending[0].submitted + self.window - time.monotonic()
+            if len(self._pending) < self.max_size and delay > 0:
+                full.clear()
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(full.wait(), delay)
+
+            batch, self._pending = self._pending[: self.max_size], self._pending[self.max_size :]
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[_Pending[T, R]]) -> None:
+        """Write a batch and resolve the futures of its items."""
+        self.stats.batches += 1
+        self.stats.items += len(batch)
+        try:
+            results = await self._write([pending.item for pending in batch])
+        except Exception as e:  # noqa: BLE001 (raised to the callers)
+            if len(batch) == 1:
+                _fail(batch[0].future, e)
+                return
+            # isolate the failing items: write each one in its own transaction
+            self.stats.retried += len(batch)
+            for pending in batch:
+                try:
+                    (result,) = await self._write([pending.item])
+                except Exception as item_error:  # noqa: BLE001 (raised to the caller)
+                    _fail(pending.future, item_error)
+                else:
+                    _resolve(pending.future, result)
+            return
+
+        for pending, result in zip(batch, results, strict=True):
+            _resolve(pending.future, result)
+
+
+def _resolve(future: asyncio.Future[Any], result: object) -> None:
+    """Set the result of a future, unless its caller was cancelled."""
+    if not future.done():
+        future.set_result(result)
+
+
+def _fail(future: asyncio.Future[Any], error: BaseException) -> None:
+    """Set the error of a future, unless its caller was cancelled."""
+    if not future.done():
+        future.set_exception(error)
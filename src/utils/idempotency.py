@@ -0,0 +1,359 @@
+"""This module provides the stores of the Idempotency-Key responses of `POST /v1/users`.
+
+A request with a new key reserves it atomically before inserting, so that its retries, on any worker or instance
+sharing the store, wait for its response instead of inserting again. The store is configured by
+- IDEMPOTENCY_BACKEND: `database` (default), `redis` or `memory`.
+  `database` and `redis` are shared by every worker and instance. `memory` is local to the worker process,
+  so it only deduplicates the retries that reach the same worker, and `src.server` refuses to run it with
+  more than one worker.
+- IDEMPOTENCY_TTL: The number of seconds a response is replayed (default: 86400).
+- IDEMPOTENCY_PENDING_TTL: The number of seconds a reservation is held without a response (default: 30).
+  If the request holding it does not finish in time, e.g. because its worker died, a retry takes the key over.
+- IDEMPOTENCY_MAX_SIZE: The maximum number of keys of the memory backend (default: 10000).
+- REDIS_URL: The URL of the redis backend (default: redis://localhost:6379/0).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Protocol
+
+import orjson
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database.models import IdempotencyKey
+from src.utils.async_database import AsyncDatabase
+
+# The value of a reserved key without a response in the redis backend
+_PENDING = "pending"
+
+
+def idempotency_backend() -> str:
+    """Return the configured backend (env IDEMPOTENCY_BACKEND)."""
+    return os.getenv("IDEMPOTENCY_BACKEND", "database").lower()
+
+
+class IdempotencyStore(ABC):
+    """The interface of the Idempotency-Key stores.
+
+    Attributes:
+        ttl (float): The number of seconds a response is kept.
+        pending_ttl (float): The number of seconds a reservation is held without a response.
+        poll_interval (float): The number of seconds between two checks while waiting for another request.
+    """
+
+    def __init__(self, ttl: float = 86400, pending_ttl: float = 30, poll_interval: float = 0.05) -> None:
+        """Initialize the IdempotencyStore class.
+
+        Args:
+            ttl (float): The number of seconds a response is kept.
+            pending_ttl (float): The number of seconds a reservation is held without a response.
+            poll_interval (float): The number of seconds between two checks while waiting for another request.
+        """
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.poll_interval = poll_interval
+
+    @abstractmethod
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """Return the response stored for the key, or None if the key is unknown, expired or in progress."""
+
+    @abstractmethod
+    async def reserve(self, key: str) -> bool:
+        """Reserve the key for `pending_ttl` seconds, atomically.
+
+        Returns:
+            bool: True if the key was reserved, False if another request holds it or its response is stored.
+        """
+
+    @abstractmethod
+    async def complete(self, key: str, response: dict[str, Any]) -> None:
+        """Store the response of a reserved key for `ttl` seconds."""
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        """Drop the reservation of a key whose request failed, so that a retry can take it."""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Remove every key."""
+
+    async def acquire(self, key: str) -> dict[str, Any] | None:
+        """Return the response stored for the key, or reserve the key and return None.
+
+        While another request holds the key, possibly on another worker, wait for its response.
+        The caller of a reserved key must `complete` or `release` it.
+
+        Args:
+            key (str): The Idempotency-Key.
+
+        Returns:
+            dict[str, Any] | None: The stored response, or None if the key is now reserved by the caller.
+        """
+        while True:
+            stored = await self.get(key)
+            if stored is not None:
+                return stored
+            if await self.reserve(key):
+                return None
+            await asyncio.sleep(self.poll_interval)
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """Idempotency-Keys stored in the worker process, the least recently used dropped beyond `max_size`.
+
+    Attributes:
+        max_size (int): The maximum number of keys.
+    """
+
+    def __init__(self, max_size: int = 10000, **options: float) -> None:
+        """Initialize the MemoryIdempotencyStore class.
+
+        Args:
+            max_size (int): The maximum number of keys.
+            **options (float): `ttl`, `pending_ttl` and `poll_interval`, see `IdempotencyStore`.
+        """
+        super().__init__(**options)
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[dict[str, Any] | None, float]] = OrderedDict()
+
+    def _entry(self, key: str) -> tuple[dict[str, Any] | None, float] | None:
+        """Return the response (None while in progress) and expiry of the key, dropping it once expired."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def _set(self, key: str, response: dict[str, Any] | None, ttl: float) -> None:
+        self._entries[key] = (response, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """Return the response stored for the key, see `IdempotencyStore.get`."""
+        entry = self._entry(key)
+        return entry[0] if entry is not None else None
+
+    async def reserve(self, key: str) -> bool:
+        """Reserve the key, see `IdempotencyStore.reserve`."""
+        if self._entry(key) is not None:
+            return False
+        self._set(key, None, self.pending_ttl)
+        return True
+
+    async def complete(self, key: str, response: dict[str, Any]) -> None:
+        """Store the response of the key, see `IdempotencyStore.complete`."""
+        self._set(key, response, self.ttl)
+
+    async def release(self, key: str) -> None:
+        """Drop the reservation of the key, see `IdempotencyStore.release`."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is None:
+            del self._entries[key]
+
+    async def clear(self) -> None:
+        """Remove every key."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        """Return the number of keys, including the expired ones not yet dropped."""
+        return len(self._entries)
+
+
+class RedisIdempotencyClient(Protocol):
+    """The subset of the `redis.asyncio.Redis` interface used by `RedisIdempotencyStore`."""
+
+    async def get(self, name: str) -> bytes | str | None:
+        """Return the value of the key."""
+
+    async def set(self, name: str, value: str, ex: int | None = None, nx: bool = False) -> Any:  # noqa: ANN401, FBT001, FBT002
+        """Set the value of the key, only if it does not exist with `nx`."""
+
+    async def delete(self, *names: str) -> Any:  # noqa: ANN401
+        """Delete the keys."""
+
+    def scan_iter(self, match: str | None = None) -> Any:  # noqa: ANN401
+        """Iterate over the keys matching the pattern."""
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Idempotency-Keys stored in Redis, reserved with `SET NX` and shared by every worker and instance.
+
+    Attributes:
+        client (RedisIdempotencyClient): The async Redis client.
+        prefix (str): The prefix of every key of the store.
+    """
+
+    def __init__(self, client: RedisIdempotencyClient, prefix: str = "idempotency", **options: float) -> None:
+        """Initialize the RedisIdempotencyStore class.
+
+        Args:
+            client (RedisIdempotencyClient): The async Redis client, e.g. `redis.asyncio.Redis`.
+            prefix (str): The prefix of every key of the store.
+            **options (float): `ttl`, `pending_ttl` and `poll_interval`, see `IdempotencyStore`.
+        """
+        super().__init__(**options)
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "idempotency", **options: float) -> RedisIdempotencyStore:
+        """Create a RedisIdempotencyStore connected to the given URL.
+
+        This requires the optional `redis` package.
+
+        Args:
+            url (str): The Redis URL, e.g. `redis://localhost:6379/0`.
+            prefix (str): The prefix of every key of the store.
+            **options (float): `ttl`, `pending_ttl` and `poll_interval`, see `IdempotencyStore`.
+
+        Returns:
+            RedisIdempotencyStore: The store.
+        """
+        from redis.asyncio import Redis  # noqa: PLC0415
+
+        return cls(Redis.from_url(url), prefix=prefix, **options)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """Return the response stored for the key, see `IdempotencyStore.get`."""
+        raw = await self.client.get(self._key(key))
+        if raw is None:
+            return None
+        value = raw.decode() if isinstance(raw, bytes) else raw
+        return None if value == _PENDING else orjson.loads(value)
+
+    async def reserve(self, key: str) -> bool:
+        """Reserve the key with `SET NX`, see `IdempotencyStore.reserve`."""
+        return bool(await self.client.set(self._key(key), _PENDING, ex=max(1, round(self.pending_ttl)), nx=True))
+
+    async def complete(self, key: str, response: dict[str, Any]) -> None:
+        """Store the response of the key, see `IdempotencyStore.complete`."""
+        await self.client.set(self._key(key), orjson.dumps(response).decode(), ex=max(1, round(self.ttl)))
+
+    async def release(self, key: str) -> None:
+        """Drop the reservation of the key, see `IdempotencyStore.release`."""
+        # only the request holding the reservation releases it, so the value is its pending marker or a response
+        if await self.client.get(self._key(key)) in {_PENDING, _PENDING.encode()}:
+            await self.client.delete(self._key(key))
+
+    async def clear(self) -> None:
+        """Remove every key of this store (keys with its prefix)."""
+        keys = [key async for key in self.client.scan_iter(match=f"{self.prefix}:*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+class DatabaseIdempotencyStore(IdempotencyStore):
+    """Idempotency-Keys stored in the `idempotency_keys` table, reserved by inserting their primary key.
+
+    The table is shared by every worker and instance using the database, so no other service is needed.
+    Expired keys are deleted when they are reserved again, and every other expired key at most once per
+    `purge_interval` seconds per worker.
+
+    Attributes:
+        purge_interval (float): The number of seconds between two deletions of the expired keys.
+    """
+
+    def __init__(self, purge_interval: float = 300, **options: float) -> None:
+        """Initialize the DatabaseIdempotencyStore class.
+
+        Args:
+            purge_interval (float): The number of seconds between two deletions of the expired keys.
+            **options (float): `ttl`, `pending_ttl` and `poll_interval`, see `IdempotencyStore`.
+        """
+        super().__init__(**options)
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """Return the response stored for the key, see `IdempotencyStore.get`."""
+        async with AsyncDatabase().connect().session() as session:
+            response = await session.scalar(
+                select(IdempotencyKey.response).filter(
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.expires_at > time.time(),
+                    IdempotencyKey.response.is_not(None),
+                )
+            )
+        return orjson.loads(response) if response is not None else None
+
+    async def _purge_expired(self, now: float) -> None:
+        """Delete every expired key, in its own transaction so that a failed reservation does not undo it."""
+        async with AsyncDatabase().connect().session() as session:
+            await session.execute(delete(IdempotencyKey).filter(IdempotencyKey.expires_at <= now))
+
+    async def reserve(self, key: str) -> bool:
+        """Reserve the key by inserting it, see `IdempotencyStore.reserve`."""
+        now = time.time()
+        if time.monotonic() >= self._next_purge:
+            self._next_purge = time.monotonic() + self.purge_interval
+            await self._purge_expired(now)
+
+        async with AsyncDatabase().connect().session() as session:
+            # an expired row of the key would make the insert fail
+            await session.execute(
+                delete(IdempotencyKey).filter(IdempotencyKey.key == key, IdempotencyKey.expires_at <= now)
+            )
+            try:
+                await session.execute(insert(IdempotencyKey).values(key=key, expires_at=now + self.pending_ttl))
+            except IntegrityError:
+                # held by another request, or already answered
+                await session.rollback()
+                return False
+        return True
+
+    async def complete(self, key: str, response: dict[str, Any]) -> None:
+        """Store the response of the key, see `IdempotencyStore.complete`."""
+        async with AsyncDatabase().connect().session() as session:
+            await session.execute(
+                update(IdempotencyKey)
+                .filter(IdempotencyKey.key == key)
+                .values(response=orjson.dumps(response).decode(), expires_at=time.time() + self.ttl)
+            )
+
+    async def release(self, key: str) -> None:
+        """Drop the reservation of the key, see `IdempotencyStore.release`."""
+        async with AsyncDatabase().connect().session() as session:
+            await session.execute(
+                delete(IdempotencyKey).filter(IdempotencyKey.key == key, IdempotencyKey.response.is_(None))
+            )
+
+    async def clear(self) -> None:
+        """Remove every key."""
+        async with AsyncDatabase().connect().session() as session:
+            await session.execute(delete(IdempotencyKey))
+
+
+def create_idempotency_store() -> IdempotencyStore:
+    """Create the Idempotency-Key store configured from the environment variables, see the module docstring.
+
+    Returns:
+        IdempotencyStore: The store.
+
+    Raises:
+        ValueError: If IDEMPOTENCY_BACKEND is unknown.
+    """
+    backend = idempotency_backend()
+    ttl = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+    pending_ttl = float(os.getenv("IDEMPOTENCY_PENDING_TTL", "30"))
+    if backend == "database":
+        return DatabaseIdempotencyStore(ttl=ttl, pending_ttl=pending_ttl)
+    if backend == "redis":
+        url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        return RedisIdempotencyStore.from_url(url, ttl=ttl, pending_ttl=pending_ttl)
+    if backend == "memory":
+        max_size = int(os.getenv("IDEMPOTENCY_MAX_SIZE", "10000"))
+        return MemoryIdempotencyStore(max_size=max_size, ttl=ttl, pending_ttl=pending_ttl)
+
+    msg = f"Unknown idempotency backend: {backend}"
+    raise ValueError(msg)
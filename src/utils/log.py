@@ -0,0 +1,147 @@
+"""This module provides the structured, non-blocking logging pipeline (log_config_json.yaml).
+
+Records are put on a queue by a `QueueHandler` and formatted as JSON lines and written by a `QueueListener`
+on a background thread, so that the event loop never blocks on stderr. Each record carries the ID of the request
+it was logged in and the time elapsed since the request started, set by
+`src.middleware.request_context.RequestContextMiddleware`.
+
+The pipeline is configured by the environment variables
+- LOG_SAMPLE_RATE: The fraction of INFO and DEBUG records kept, between 0 and 1 (default: 1).
+  Warnings and errors are always kept.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from time import perf_counter
+from typing import IO, Any
+
+import orjson
+
+# The ID of the request being processed, and the perf_counter() value at which it started
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+request_start: ContextVar[float | None] = ContextVar("request_start", default=None)
+
+# The attributes of every LogRecord, the other ones were passed with `extra=` and are written as fields
+_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
+
+
+class RequestContextFilter(logging.Filter):
+    """Add the `request_id` and `latency_ms` of the current request to the records.
+
+    It must run in the thread that logs the record, the context variables are not visible from the listener thread.
+    A `latency_ms` passed with `extra=` is kept.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Add the request fields to the record."""
+        record.request_id = request_id.get()
+        if not hasattr(record, "latency_ms"):
+            start = request_start.get()
+            record.latency_ms = round((perf_counter() - start) * 1000, 3) if start is not None else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of the INFO and DEBUG records, and every warning and error."""
+
+    def __init__(self, rate: float | None = None) -> None:
+        """Initialize the SamplingFilter class.
+
+        Args:
+            rate (float | None): The fraction of records kept, between 0 and 1. Defaults to env LOG_SAMPLE_RATE.
+        """
+        super().__init__()
+        self.rate = rate if rate is not None else float(os.getenv("LOG_SAMPLE_RATE", "1"))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Return whether the record is kept."""
+        return record.levelno > logging.INFO or self.rate >= 1 or random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    """Format the records as JSON lines.
+
+    Example:
+        ```json
+        {"time":"2024-07-29T12:00:00.000000+00:00","level":"INFO","logger":"uvicorn.api.access",
+         "message":"GET /v1/ 200","request_id":"4f1c...","latency_ms":0.41,"method":"GET","status":200}
+        ```
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format the record as a JSON object on one line."""
+        entry: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, tz=UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((name, value) for name, value in record.__dict__.items() if name not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """A QueueHandler whose records are formatted and written by a QueueListener thread.
+
+    Closing the handler, which `logging.shutdown()` does at exit, stops the listener
+    once the queued records are written.
+
+    Attributes:
+        listener (QueueListener): The listener writing the records.
+    """
+
+    listener: QueueListener
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge the arguments into the message, and leave the formatting to the listener thread."""
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # the traceback references the frames of this thread, keep only its text
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self) -> None:
+        """Stop the listener and close the handler."""
+        if self.listener._thread is not None:  # noqa: SLF001
+            self.listener.stop()
+        super().close()
+
+
+def queue_handler(stream: IO[str] | None = None, sample_rate: float | None = None) -> BackgroundQueueHandler:
+    """Create the handler of the JSON logging pipeline, used as a handler factory in log_config_json.yaml.
+
+    Args:
+        stream (IO[str] | None): The stream written by the listener. Defaults to stderr.
+        sample_rate (float | None): The fraction of INFO and DEBUG records kept. Defaults to env LOG_SAMPLE_RATE.
+
+    Returns:
+        BackgroundQueueHandler: The handler to attach to the loggers, its listener is started.
+    """
+    output = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    output.setFormatter(JSONFormatter())
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = BackgroundQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rate))
+    handler.addFilter(RequestContextFilter())
+
+    handler.listener = QueueListener(log_queue, output, respect_handler_level=True)
+    handler.listener.start()
+    return handler
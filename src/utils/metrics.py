@@ -0,0 +1,345 @@
+"""This module provides a minimal Prometheus metrics registry.
+
+Only what the application needs is implemented: counters, gauges and histograms with labels,
+and rendering in the Prometheus text exposition format. Recording a sample is a dictionary
+lookup and a few arithmetic operations under an uncontended lock.
+
+The metrics live in the memory of each worker process, so /metrics exposes the numbers of the worker that
+answers the scrape, not totals of the service. `REGISTRY` labels every sample with `worker=<pid>`, so that
+the series of different workers are never mixed up: sum them by the other labels for the service totals.
+
+Example:
+    ```python
+    REQUESTS = Counter("app_requests_total", "Number of requests.", ["route"])
+    REQUESTS.labels("/v1/").inc()
+    print(REGISTRY.render())
+    ```
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable, Iterator, Mapping, Sequence
+
+# Default buckets of latency histograms, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped, strict=True)) + "}"
+
+
+def _series_labels(names: Sequence[str], values: Sequence[str], const_labels: Mapping[str, str]) -> str:
+    """Format the labels of a series, followed by the constant labels of the registry."""
+    return _format_labels((*names, *const_labels), (*values, *const_labels.values()))
+
+
+class _ValueChild:
+    """A single counter or gauge time series."""
+
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._function: Callable[[], float] | None = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from the function when the metrics are rendered."""
+        self._function = function
+
+    def get(self) -> float:
+        return self._function() if self._function is not None else self._value
+
+
+class _GaugeChild(_ValueChild):
+    """A single gauge time series."""
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+
+class _HistogramChild:
+    """A single histogram time series."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> tuple[list[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Metric:
+    """The base class of the metrics, holding one child time series per label values.
+
+    Attributes:
+        name (str): The metric name.
+        documentation (str): The help text of the metric.
+        labelnames (tuple[str, ...]): The label names of the metric.
+    """
+
+    type_name = ""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Registry | None = None
+    ) -> None:
+        """Initialize the metric and register it.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text of the metric.
+            labelnames (Sequence[str]): The label names of the metric.
+            registry (Registry | None): The registry to register the metric in. Defaults to `REGISTRY`.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self) -> Any:  # noqa: ANN401
+        raise NotImplementedError
+
+    def _child(self, values: tuple[str, ...]) -> Any:  # noqa: ANN401
+        """Return the time series of the given label values, creating it on first use.
+
+        Raises:
+            ValueError: If the number of values does not match the label names.
+        """
+        child = self._children.get(values)
+        if child is not None:
+            return child
+
+        if len(values) != len(self.labelnames):
+            msg = f"{self.name} expects labels {self.labelnames}, got {values}"
+            raise ValueError(msg)
+
+        with self._lock:
+            return self._children.setdefault(values, self._new_child())
+
+    def samples(self, const_labels: Mapping[str, str]) -> Iterator[str]:
+        """Yield the sample lines of the metric in the text exposition format, with the given constant labels."""
+        raise NotImplementedError
+
+    def render(self, const_labels: Mapping[str, str] | None = None) -> str:
+        """Render the metric in the text exposition format, adding the constant labels to every sample."""
+        samples = self.samples(const_labels or {})
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}", *samples]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """A value that only goes up, e.g. a number of requests."""
+
+    type_name = "counter"
+
+    def labels(self, *values: str) -> _ValueChild:
+        """Return the time series of the given label values, creating it on first use."""
+        return self._child(values)
+
+    def _new_child(self) -> _ValueChild:
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the counter without labels."""
+        self.labels().inc(amount)
+
+    def samples(self, const_labels: Mapping[str, str]) -> Iterator[str]:
+        """Yield the sample lines of the metric in the text exposition format, with the given constant labels."""
+        for values, child in list(self._children.items()):
+            labels = _series_labels(self.labelnames, values, const_labels)
+            yield f"{self.name}{labels} {_format_value(child.get())}"
+
+
+class Gauge(Metric):
+    """A value that goes up and down, e.g. a number of requests in progress."""
+
+    type_name = "gauge"
+
+    def labels(self, *values: str) -> _GaugeChild:
+        """Return the time series of the given label values, creating it on first use."""
+        return self._child(values)
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the gauge without labels."""
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrement the gauge without labels."""
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        """Set the gauge without labels."""
+        self.labels().set(value)
+
+    def samples(self, const_labels: Mapping[str, str]) -> Iterator[str]:
+        """Yield the sample lines of the metric in the text exposition format, with the given constant labels."""
+        for values, child in list(self._children.items()):
+            labels = _series_labels(self.labelnames, values, const_labels)
+            yield f"{self.name}{labels} {_format_value(child.get())}"
+
+
+class Histogram(Metric):
+    """A distribution of observed values in cumulative buckets, e.g. request latencies."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: Registry | None = None,
+    ) -> None:
+        """Initialize the histogram and register it.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text of the metric.
+            labelnames (Sequence[str]): The label names of the metric.
+            buckets (Sequence[float]): The upper bounds of the buckets, in increasing order.
+            registry (Registry | None): The registry to register the metric in. Defaults to `REGISTRY`.
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def labels(self, *values: str) -> _HistogramChild:
+        """Return the time series of the given label values, creating it on first use."""
+        return self._child(values)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Observe a value without labels."""
+        self.labels().observe(value)
+
+    def samples(self, const_labels: Mapping[str, str]) -> Iterator[str]:
+        """Yield the sample lines of the metric in the text exposition format, with the given constant labels."""
+        names = (*self.labelnames, "le")
+        for values, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                bucket = _series_labels(names, (*values, _format_value(bound)), const_labels)
+                yield f"{self.name}_bucket{bucket} {cumulative}"
+            labels = _series_labels(self.labelnames, values, const_labels)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class DecayingAverage:
+    """An average of the recent observations, which decays towards 0 when nothing is observed.
+
+    Unlike a histogram, it answers "how is it going right now", e.g. for load shedding decisions.
+    Each observation moves the average by `weight` towards its value, and the average halves every
+    `half_life` seconds, so a past spike is forgotten even if no new observation comes.
+    """
+
+    def __init__(self, half_life: float = 1.0, weight: float = 0.3) -> None:
+        """Initialize the DecayingAverage class.
+
+        Args:
+            half_life (float): The number of seconds after which the average is halved.
+            weight (float): The weight of a new observation, between 0 and 1.
+        """
+        self.half_life = half_life
+        self.weight = weight
+        self._value = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _decayed(self, now: float) -> float:
+        return self._value * 0.5 ** ((now - self._updated) / self.half_life)
+
+    def observe(self, value: float) -> None:
+        """Add an observation."""
+        now = time.monotonic()
+        with self._lock:
+            decayed = self._decayed(now)
+            self._value = decayed + (value - decayed) * self.weight
+            self._updated = now
+
+    def get(self) -> float:
+        """Return the current average."""
+        return self._decayed(time.monotonic())
+
+
+class Registry:
+    """A collection of metrics rendered together.
+
+    Attributes:
+        worker_label (str | None): The name of the label holding the process ID, added to every sample.
+    """
+
+    def __init__(self, worker_label: str | None = None) -> None:
+        """Initialize the Registry class.
+
+        Args:
+            worker_label (str | None): The name of the label holding the process ID, added to every sample
+                so that the series of the worker processes are told apart. None to add no label.
+        """
+        self.worker_label = worker_label
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        """Register a metric.
+
+        Raises:
+            ValueError: If a metric with the same name is already registered.
+        """
+        if metric.name in self._metrics:
+            msg = f"Metric already registered: {metric.name}"
+            raise ValueError(msg)
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        # read at render time, so that a worker forked after the import gets its own ID
+        const_labels = {self.worker_label: str(os.getpid())} if self.worker_label is not None else {}
+        return "".join(metric.render(const_labels) + "\n" for metric in self._metrics.values())
+
+
+# The registry exposed on /metrics, holding the metrics of this worker process
+REGISTRY = Registry(worker_label="worker")
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
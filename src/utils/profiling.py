@@ -0,0 +1,319 @@
+"""This module provides the CPU and allocation profilers of the admin endpoints, see `src.endpoints.admin`.
+
+Profiling is opt-in: the admin endpoints and `src.middleware.profiling.ProfilingMiddleware` are only registered
+when the environment variable PROFILING_ENABLED is set to true and ADMIN_TOKEN is set, so a disabled worker
+pays nothing for them. The profilers are configured by
+- PROFILING_MAX_SECONDS: The maximum duration of a CPU profile (default: 60).
+- PROFILING_MAX_REQUEST_PROFILES: The number of request profiles kept (default: 20).
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    import cProfile
+    from types import FrameType
+
+logger = getLogger("uvicorn.api").getChild(__name__)
+
+# Allocations made by the profiler itself and by imports are not allocation sites of the application
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(inclusive=False, filename_pattern=tracemalloc.__file__),
+    tracemalloc.Filter(inclusive=False, filename_pattern="<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(inclusive=False, filename_pattern="<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(inclusive=False, filename_pattern="<unknown>"),
+)
+
+
+def admin_token() -> str:
+    """Return the token of the admin endpoints (env ADMIN_TOKEN), empty if unset."""
+    return os.getenv("ADMIN_TOKEN", "")
+
+
+def profiling_enabled() -> bool:
+    """Return whether the profiling endpoints and middleware are registered.
+
+    Profiling requires PROFILING_ENABLED=true and an ADMIN_TOKEN, so that it is never exposed without a token.
+    """
+    if os.getenv("PROFILING_ENABLED", "false").lower() != "true":
+        return False
+    if not admin_token():
+        logger.warning("PROFILING_ENABLED is set without ADMIN_TOKEN, profiling is disabled")
+        return False
+    return True
+
+
+def max_profile_seconds() -> float:
+    """Return the maximum duration of a CPU profile in seconds (env PROFILING_MAX_SECONDS)."""
+    return float(os.getenv("PROFILING_MAX_SECONDS", "60"))
+
+
+def _frame_name(frame: FrameType) -> str:
+    """Return the name of a frame in a collapsed stack, e.g. `get_user (user.py:180)`."""
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})".replace(";", ",")
+
+
+def collapse_stack(frame: FrameType | None) -> str:
+    """Return the stack ending at the frame in the collapsed format, outermost frame first.
+
+    Args:
+        frame (FrameType | None): The innermost frame.
+
+    Returns:
+        str: The frame names separated by `;`.
+    """
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Sample the stacks of every thread of the worker at a fixed interval.
+
+    Sampling reads the current frames from another thread, so the profiled code is neither instrumented
+    nor slowed down, and the event loop keeps serving requests while it runs. The result is in the collapsed
+    stack format read by flamegraph.pl, speedscope and most flamegraph viewers:
+
+        MainThread;run (runners.py:86);...;get_user (user.py:180) 42
+
+    Attributes:
+        interval (float): The time between two samples, in seconds.
+        stacks (Counter[str]): The number of samples of each collapsed stack.
+        samples (int): The number of samples taken.
+    """
+
+    # Only one CPU profile runs at a time, concurrent profiles would slow the worker down for nothing
+    lock = threading.Lock()
+
+    def __init__(self, interval: float = 0.005) -> None:
+        """Initialize the SamplingProfiler class.
+
+        Args:
+            interval (float): The time between two samples, in seconds.
+        """
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+
+    def sample(self) -> None:
+        """Record the current stack of every thread but the calling one."""
+        current = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():  # noqa: SLF001
+            if thread_id != current:
+                self.stacks[f"{names.get(thread_id, thread_id)};{collapse_stack(frame)}"] += 1
+        self.samples += 1
+
+    def run(self, seconds: float) -> str:
+        """Sample the threads for the given duration, blocking the calling thread.
+
+        Args:
+            seconds (float): The duration of the profile.
+
+        Returns:
+            str: The collapsed stacks.
+        """
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self.sample()
+            time.sleep(self.interval)
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        """Return the collapsed stacks, one `<stack> <samples>` line per stack, the most sampled first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+@dataclass(frozen=True)
+class AllocationSite:
+    """The memory allocated by a source line and still alive, or its change since the previous snapshot.
+
+    Attributes:
+        location (str): The allocating line, e.g. `src/endpoints/v1/user.py:180`.
+        size (int): The allocated size in bytes.
+        count (int): The number of allocated blocks.
+        size_diff (int | None): The change of size since the previous snapshot.
+        count_diff (int | None): The change of count since the previous snapshot.
+    """
+
+    location: str
+    size: int
+    count: int
+    size_diff: int | None = None
+    count_diff: int | None = None
+
+
+@dataclass(frozen=True)
+class MemoryReport:
+    """The top allocation sites of a tracemalloc snapshot.
+
+    Attributes:
+        traced (int): The size of the memory blocks traced by tracemalloc, in bytes.
+        peak (int): The peak size of the traced memory blocks since tracing started, in bytes.
+        top (list[AllocationSite]): The allocation sites holding the most memory.
+        diff (list[AllocationSite] | None): The allocation sites that grew the most since the previous
+            snapshot, None for the first snapshot.
+    """
+
+    traced: int
+    peak: int
+    top: list[AllocationSite]
+    diff: list[AllocationSite] | None
+
+
+def _location(trace: tracemalloc.Statistic | tracemalloc.StatisticDiff) -> str:
+    """Return the allocating line of a statistic."""
+    frame = trace.traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+class MemoryProfiler:
+    """Trace the allocations with tracemalloc, and compare successive snapshots.
+
+    Tracing slows the allocations down, so it only runs between `start()` and `stop()`.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the MemoryProfiler class."""
+        self._previous: tracemalloc.Snapshot | None = None
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 1) -> None:
+        """Start tracing the allocations, and forget the previous snapshot.
+
+        Args:
+            frames (int): The number of frames kept per allocation.
+        """
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            tracemalloc.start(frames)
+            self._previous = None
+
+    def stop(self) -> None:
+        """Stop tracing the allocations, and free the traces."""
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+
+    def snapshot(self, limit: int = 20) -> MemoryReport:
+        """Take a snapshot, and compare it to the previous one.
+
+        Args:
+            limit (int): The number of allocation sites returned.
+
+        Returns:
+            MemoryReport: The top allocation sites, and the largest changes since the previous snapshot.
+
+        Raises:
+            RuntimeError: If the allocations are not traced.
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                msg = "The allocations are not traced, start tracing first"
+                raise RuntimeError(msg)
+            snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            traced, peak = tracemalloc.get_traced_memory()
+            previous, self._previous = self._previous, snapshot
+
+        top = [AllocationSite(_location(stat), stat.size, stat.count) for stat in snapshot.statistics("lineno")[:limit]]
+        diff = None
+        if previous is not None:
+            diff = [
+                AllocationSite(_location(stat), stat.size, stat.count, stat.size_diff, stat.count_diff)
+                for stat in snapshot.compare_to(previous, "lineno")[:limit]
+            ]
+        return MemoryReport(traced=traced, peak=peak, top=top, diff=diff)
+
+
+memory_profiler = MemoryProfiler()
+
+
+@dataclass(frozen=True)
+class RequestProfile:
+    """The deterministic profile of one request.
+
+    Attributes:
+        id (str): The ID of the profile, the request ID.
+        method (str): The method of the request.
+        path (str): The path of the request.
+        status (int): The status code of the response.
+        duration_ms (float): The duration of the request in milliseconds.
+        started (float): The time the request started, in seconds since the epoch.
+        stats (str): The pstats report, sorted by cumulative time.
+    """
+
+    id: str
+    method: str
+    path: str
+    status: int
+    duration_ms: float
+    started: float
+    stats: str
+
+
+def format_stats(profile: cProfile.Profile, limit: int = 50) -> str:
+    """Return the pstats report of a profile, sorted by cumulative time.
+
+    Args:
+        profile (cProfile.Profile): The profile.
+        limit (int): The number of functions reported.
+
+    Returns:
+        str: The report.
+    """
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return stream.getvalue()
+
+
+class RequestProfiles:
+    """The most recent request profiles.
+
+    Attributes:
+        max_size (int): The number of profiles kept.
+    """
+
+    # cProfile profiles a whole thread, so only one request is profiled at a time
+    lock = threading.Lock()
+
+    def __init__(self, max_size: int | None = None) -> None:
+        """Initialize the RequestProfiles class.
+
+        Args:
+            max_size (int | None): Defaults to env PROFILING_MAX_REQUEST_PROFILES (default: 20).
+        """
+        self.max_size = max_size if max_size is not None else int(os.getenv("PROFILING_MAX_REQUEST_PROFILES", "20"))
+        self._profiles: OrderedDict[str, RequestProfile] = OrderedDict()
+
+    def add(self, profile: RequestProfile) -> None:
+        """Keep a profile, dropping the oldest beyond `max_size`."""
+        self._profiles[profile.id] = profile
+        while len(self._profiles) > self.max_size:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> RequestProfile | None:
+        """Return the profile of the given ID, if it is still kept."""
+        return self._profiles.get(profile_id)
+
+    def list(self) -> list[RequestProfile]:
+        """Return the profiles kept, the most recent first."""
+        return list(reversed(self._profiles.values()))
+
+
+request_profiles = RequestProfiles()
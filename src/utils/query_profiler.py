@@ -0,0 +1,248 @@
+"""This module provides the query profiler detecting slow queries and N+1 patterns in database sessions.
+
+Profiling is opt-in: `Database.session()` and `AsyncDatabase.session()` profile their statements when
+the environment variable DB_PROFILE is set to true. The thresholds are read from
+- DB_SLOW_QUERY_MS: statements slower than this are logged (default: 100)
+- DB_REPEATED_QUERY_THRESHOLD: statements of the same shape executed this many times in one session
+  are logged as a possible N+1 pattern (default: 5, at least 2).
+- DB_LOG_QUERY_PARAMETERS: whether slow queries are logged with their parameters, which may hold personal
+  data or secrets (default: false).
+
+When no profiler is active, the cost per statement is a single context variable lookup.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import traceback
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Generator
+
+logger = getLogger("uvicorn.api").getChild(__name__)
+
+_current_profiler: ContextVar[QueryProfiler | None] = ContextVar("current_profiler", default=None)
+
+# Frames from these directories are skipped when looking for the call site of a statement
+_LIBRARY_PATHS = (str(Path(__file__).parent), str(Path(traceback.__file__).parent))
+
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Return the shape of a statement, so that the same query with other parameters has the same shape.
+
+    Lists of placeholders, e.g. the expanded parameters of an IN clause, are collapsed into one.
+
+    Args:
+        statement (str): The SQL statement sent to the database.
+
+    Returns:
+        str: The normalized statement.
+    """
+    return _PLACEHOLDER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement.strip()))
+
+
+def _stack() -> traceback.StackSummary:
+    """Return the current stack, innermost frame last.
+
+    Statements of async sessions run in a greenlet whose stack stops at SQLAlchemy, so the stacks
+    of the parent greenlets (where the application awaited the statement) are prepended.
+    """
+    stack = traceback.extract_stack()
+    with suppress(ImportError):
+        from greenlet import getcurrent  # noqa: PLC0415
+
+        parent = getcurrent().parent
+        while parent is not None:
+            if parent.gr_frame is not None:
+                stack = traceback.StackSummary.from_list([*traceback.extract_stack(parent.gr_frame), *stack])
+            parent = parent.parent
+    return stack
+
+
+def call_site() -> str:
+    """Return the innermost frame of the current stack that belongs to the application, as `file:line in func`."""
+    for frame in reversed(_stack()):
+        if not frame.filename.startswith(_LIBRARY_PATHS) and "site-packages" not in frame.filename:
+            return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return "<unknown>"
+
+
+@dataclass
+class QueryRecord:
+    """A statement executed while a profiler was active.
+
+    Attributes:
+        statement (str): The compiled SQL statement.
+        parameters (Any): The parameters of the statement.
+        duration (float): The execution time in seconds.
+    """
+
+    statement: str
+    parameters: Any
+    duration: float
+
+
+@dataclass
+class QueryProfiler:
+    """Collects the statements executed in a session.
+
+    Attributes:
+        slow_threshold (float): Statements slower than this number of seconds are logged.
+        repeat_threshold (int): Statements of the same shape executed this many times are reported as N+1,
+            at least 2.
+        log_parameters (bool): Whether slow statements are logged with their parameters.
+        queries (list[QueryRecord]): The executed statements.
+        shapes (dict[str, int]): The number of executions per statement shape.
+        call_sites (dict[str, str]): The call site of the first repeated execution per statement shape.
+        parent (QueryProfiler | None): The enclosing profiler, which records the same statements.
+    """
+
+    slow_threshold: float = 0.1
+    repeat_threshold: int = 5
+    log_parameters: bool = False
+    queries: list[QueryRecord] = field(default_factory=list)
+    shapes: dict[str, int] = field(default_factory=dict)
+    call_sites: dict[str, str] = field(default_factory=dict)
+    parent: QueryProfiler | None = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        """Check the thresholds.
+
+        Raises:
+            ValueError: If `repeat_threshold` is less than 2, as every statement would be reported as N+1.
+        """
+        if self.repeat_threshold < 2:
+            msg = f"The repeated query threshold must be at least 2, got {self.repeat_threshold}"
+            raise ValueError(msg)
+
+    @classmethod
+    def from_env(cls) -> QueryProfiler:
+        """Create a QueryProfiler with the thresholds of the environment variables."""
+        return cls(
+            slow_threshold=float(os.getenv("DB_SLOW_QUERY_MS", "100")) / 1000,
+            repeat_threshold=int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", "5")),
+            log_parameters=os.getenv("DB_LOG_QUERY_PARAMETERS", "false").lower() == "true",
+        )
+
+    @property
+    def count(self) -> int:
+        """Return the number of executed statements."""
+        return len(self.queries)
+
+    def record(self, statement: str, parameters: Any, duration: float) -> None:  # noqa: ANN401
+        """Record an executed statement, logging it if it is slow."""
+        self.queries.append(QueryRecord(statement, parameters, duration))
+
+        shape = statement_shape(statement)
+        executions = self.shapes.get(shape, 0) + 1
+        self.shapes[shape] = executions
+        if executions == 2:
+            self.call_sites[shape] = call_site()
+
+        if duration >= self.slow_threshold:
+            if self.log_parameters:
+                logger.warning(
+                    "Slow query (%.1f ms) at %s: %s; parameters=%r",
+                    duration * 1000,
+                    call_site(),
+                    statement,
+                    parameters,
+                )
+            else:
+                logger.warning("Slow query (%.1f ms) at %s: %s", duration * 1000, call_site(), statement)
+
+    def repeated(self) -> dict[str, int]:
+        """Return the statement shapes executed at least `repeat_threshold` times."""
+        return {shape: count for shape, count in self.shapes.items() if count >= self.repeat_threshold}
+
+    def report(self) -> None:
+        """Log the number of statements of the session and the repeated statement shapes."""
+        logger.debug("Session executed %d statements", self.count)
+        for shape, count in self.repeated().items():
+            logger.warning(
+                "Statement executed %d times in one session (possible N+1) at %s: %s",
+                count,
+                self.call_sites.get(shape, "<unknown>"),
+                shape,
+            )
+
+
+def record_statement(statement: str, parameters: Any, duration: float) -> None:  # noqa: ANN401
+    """Record an executed statement in the profiler of the current context, if any.
+
+    This is called by the engine events installed by `src.utils.database.instrument_engine`.
+    """
+    profiler = _current_profiler.get()
+    while profiler is not None:
+        profiler.record(statement, parameters, duration)
+        profiler = profiler.parent
+
+
+@contextmanager
+def profile_queries(profiler: QueryProfiler | None = None) -> Generator[QueryProfiler, None, None]:
+    """Profile the statements executed in the current context, including the tasks it starts.
+
+    Profilers can be nested; the statements are recorded by every enclosing profiler.
+    The report is logged when the block exits.
+
+    Example:
+        ```python
+        with profile_queries() as profiler:
+            client.get("/v1/users/1")
+        print(profiler.count)
+        ```
+
+    Args:
+        profiler (QueryProfiler | None): The profiler to use. Defaults to one configured from the environment.
+
+    Yields:
+        QueryProfiler: The active profiler.
+    """
+    profiler = profiler if profiler is not None else QueryProfiler.from_env()
+    profiler.parent = _current_profiler.get()
+    token = _current_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _current_profiler.reset(token)
+        profiler.report()
+
+
+@contextmanager
+def assert_max_queries(max_queries: int) -> Generator[QueryProfiler, None, None]:
+    """Assert that at most `max_queries` statements are executed in the block.
+
+    Meant for tests, to catch regressions such as an endpoint querying the same row twice.
+
+    Example:
+        ```python
+        with assert_max_queries(1):
+            client.post("/v1/users", json=user_data)
+        ```
+
+    Args:
+        max_queries (int): The maximum number of statements.
+
+    Yields:
+        QueryProfiler: The active profiler.
+
+    Raises:
+        AssertionError: If more statements were executed.
+    """
+    with profile_queries() as profiler:
+        yield profiler
+
+    if profiler.count > max_queries:
+        statements = "\n".join(f"  {query.statement}" for query in profiler.queries)
+        msg = f"{profiler.count} statements executed, expected at most {max_queries}:\n{statements}"
+        raise AssertionError(msg)
@@ -0,0 +1,264 @@
+"""This module provides the token buckets of the rate limiting, see `src.middleware.rate_limit`.
+
+A bucket holds up to `burst` tokens and is refilled at `per_second` tokens per second; a request takes one token,
+and is rejected when the bucket is empty. The buckets live in the worker process, or in Redis to share the limits
+between the workers and the instances.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Protocol
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Mapping
+
+# Seconds of each unit of a rate, e.g. "100/minute"
+_UNITS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+@dataclass(frozen=True)
+class Rate:
+    """The limit of a token bucket.
+
+    Attributes:
+        per_second (float): The number of tokens added per second.
+        burst (float): The maximum number of tokens, i.e. of requests in a burst.
+    """
+
+    per_second: float
+    burst: float
+
+
+def parse_rate(value: str) -> Rate:
+    """Parse a rate such as `10/second`, `100/minute` or `1000/hour`.
+
+    The burst is the number of requests of the rate, e.g. 100 requests at once for `100/minute`.
+
+    Args:
+        value (str): The rate.
+
+    Returns:
+        Rate: The parsed rate.
+
+    Raises:
+        ValueError: If the rate is malformed.
+    """
+    count, _, unit = value.strip().partition("/")
+    try:
+        requests = float(count)
+        seconds = _UNITS[unit.strip().lower()]
+    except (ValueError, KeyError):
+        msg = f"Invalid rate: {value!r}, expected e.g. 10/second, 100/minute or 1000/hour"
+        raise ValueError(msg) from None
+    if requests <= 0:
+        msg = f"Invalid rate: {value!r}, the number of requests must be positive"
+        raise ValueError(msg)
+    return Rate(per_second=requests / seconds, burst=requests)
+
+
+def parse_route_rates(value: str) -> dict[str, Rate]:
+    """Parse the rates of routes, such as `POST /v1/users=10/second,GET /v1/users/{user_id}=100/second`.
+
+    Args:
+        value (str): The comma-separated `<method> <route template>=<rate>` items.
+
+    Returns:
+        dict[str, Rate]: The rates by `<method> <route template>`.
+
+    Raises:
+        ValueError: If an item is malformed.
+    """
+    rates = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        route, _, rate = item.rpartition("=")
+        method, _, path = route.strip().partition(" ")
+        if not method or not path.strip():
+            msg = f"Invalid route rate: {item!r}, expected e.g. POST /v1/users=10/second"
+            raise ValueError(msg)
+        rates[f"{method.upper()} {path.strip()}"] = parse_rate(rate)
+    return rates
+
+
+def exempt_paths() -> frozenset[str]:
+    """Return the paths never rate limited nor shed (env LIMIT_EXEMPT_PATHS), the probes and the metrics."""
+    value = os.getenv("LIMIT_EXEMPT_PATHS", "/healthz,/readyz,/metrics")
+    return frozenset(path.strip() for path in value.split(",") if path.strip())
+
+
+class TokenBuckets(ABC):
+    """The interface of the token bucket storages."""
+
+    async def take(self, key: str, rate: Rate) -> float:
+        """Take a token from the bucket of the key.
+
+        Args:
+            key (str): The bucket, e.g. the client and the route.
+            rate (Rate): The limit of the bucket.
+
+        Returns:
+            float: 0 if a token was taken, else the number of seconds until one is available.
+        """
+        return await self.take_all({key: rate})
+
+    @abstractmethod
+    async def take_all(self, buckets: Mapping[str, Rate]) -> float:
+        """Take a token from each bucket if every one has a token, else take none.
+
+        A request limited by several buckets, e.g. of its route and of the client, must not spend the tokens
+        of some of them when another one rejects it.
+
+        Args:
+            buckets (Mapping[str, Rate]): The limits by bucket.
+
+        Returns:
+            float: 0 if the tokens were taken, else the number of seconds until every bucket has one.
+        """
+
+
+class MemoryTokenBuckets(TokenBuckets):
+    """Token buckets stored in the worker process, each worker enforcing the limits on its own.
+
+    The least recently used buckets are dropped beyond `max_keys`, so that many clients can't exhaust the memory.
+
+    Attributes:
+        max_keys (int): The maximum number of buckets.
+    """
+
+    def __init__(self, max_keys: int = 100000) -> None:
+        """Initialize the MemoryTokenBuckets class.
+
+        Args:
+            max_keys (int): The maximum number of buckets.
+        """
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take_all(self, buckets: Mapping[str, Rate]) -> float:
+        """Take a token from each bucket if every one has a token, see `TokenBuckets.take_all`."""
+        now = time.monotonic()
+        refilled = {}
+        for key, rate in buckets.items():
+            tokens, updated = self._buckets.get(key, (rate.burst, now))
+            refilled[key] = min(rate.burst, tokens + (now - updated) * rate.per_second)
+
+        wait = max(
+            ((1 - tokens) / buckets[key].per_second for key, tokens in refilled.items() if tokens < 1), default=0.0
+        )
+        for key, tokens in refilled.items():
+            self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisScriptClient(Protocol):
+    """The subset of the `redis.asyncio.Redis` interface used by `RedisTokenBuckets`."""
+
+    async def eval(self, script: str, numkeys: int, *keys_and_args: str) -> Any:  # noqa: ANN401
+        """Run a Lua script."""
+
+
+# Refill the buckets, and take a token from each one only if every one has a token, atomically and with
+# the clock of the server so that every worker agrees on the time. ARGV holds the rate and burst of each key.
+# The reply is a string, Lua numbers are truncated to integers in replies.
+_TAKE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+  local per_second = tonumber(ARGV[2 * i - 1])
+  local burst = tonumber(ARGV[2 * i])
+  local bucket = redis.call('HMGET', key, 'tokens', 'updated')
+  local available = tonumber(bucket[1]) or burst
+  local updated = tonumber(bucket[2]) or now
+  tokens[i] = math.min(burst, available + math.max(0, now - updated) * per_second)
+  if tokens[i] < 1 then
+    wait = math.max(wait, (1 - tokens[i]) / per_second)
+  end
+end
+for i, key in ipairs(KEYS) do
+  local per_second = tonumber(ARGV[2 * i - 1])
+  local burst = tonumber(ARGV[2 * i])
+  if wait == 0 then
+    tokens[i] = tokens[i] - 1
+  end
+  redis.call('HSET', key, 'tokens', tostring(tokens[i]), 'updated', tostring(now))
+  redis.call('EXPIRE', key, math.ceil(burst / per_second) + 1)
+end
+return tostring(wait)
+"""
+
+
+class RedisTokenBuckets(TokenBuckets):
+    """Token buckets stored in Redis, shared by every worker and instance.
+
+    Attributes:
+        client (RedisScriptClient): The async Redis client.
+        prefix (str): The prefix of every key of the buckets.
+    """
+
+    def __init__(self, client: RedisScriptClient, prefix: str = "ratelimit") -> None:
+        """Initialize the RedisTokenBuckets class.
+
+        Args:
+            client (RedisScriptClient): The async Redis client, e.g. `redis.asyncio.Redis`.
+            prefix (str): The prefix of every key of the buckets.
+        """
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "ratelimit") -> RedisTokenBuckets:
+        """Create RedisTokenBuckets connected to the given URL.
+
+        This requires the optional `redis` package.
+
+        Args:
+            url (str): The Redis URL, e.g. `redis://localhost:6379/0`.
+            prefix (str): The prefix of every key of the buckets.
+
+        Returns:
+            RedisTokenBuckets: The token buckets.
+        """
+        from redis.asyncio import Redis  # noqa: PLC0415
+
+        return cls(Redis.from_url(url), prefix=prefix)
+
+    async def take_all(self, buckets: Mapping[str, Rate]) -> float:
+        """Take a token from each bucket if every one has a token, see `TokenBuckets.take_all`."""
+        keys = [f"{self.prefix}:{key}" for key in buckets]
+        rates = [value for rate in buckets.values() for value in (repr(rate.per_second), repr(rate.burst))]
+        wait = await self.client.eval(_TAKE_SCRIPT, len(keys), *keys, *rates)
+        return float(wait.decode() if isinstance(wait, bytes) else wait)
+
+
+def create_token_buckets() -> TokenBuckets:
+    """Create the token bucket storage configured from the environment variables.
+
+    - RATE_LIMIT_BACKEND: `memory` (default) or `redis`
+    - RATE_LIMIT_MAX_KEYS: The maximum number of buckets of the memory backend (default: 100000)
+    - REDIS_URL: The URL of the redis backend (default: redis://localhost:6379/0)
+
+    Returns:
+        TokenBuckets: The token bucket storage.
+
+    Raises:
+        ValueError: If RATE_LIMIT_BACKEND is unknown.
+    """
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "memory":
+        return MemoryTokenBuckets(max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+    if backend == "redis":
+        return RedisTokenBuckets.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+
+    msg = f"Unknown rate limit backend: {backend}"
+    raise ValueError(msg)
@@ -0,0 +1,127 @@
+"""This module provides the response classes of the FastAPI application.
+
+- `ORJSONResponse`: the JSON response class used by default
+- `PrecomputedResponse`: a static document encoded once and served with an ETag and compressed variants.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from src.utils.compression import ENCODINGS, STATIC_LEVELS, compress, negotiate_encoding
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterable
+
+    from starlette.requests import Request
+
+
+def _default(obj: Any) -> Any:  # noqa: ANN401
+    """Serialize the objects orjson does not support natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response serialized with orjson.
+
+    The content may contain Pydantic models, which are dumped without being validated again.
+    Endpoints can return `ORJSONResponse(model)` with `response_model` set on the route, so that
+    FastAPI documents the model but does not validate and encode the response a second time.
+
+    Example:
+        ```python
+        @router.get("/users/{user_id}", response_model=UserResponse)
+        async def get_user(user_id: int) -> ORJSONResponse:
+            return ORJSONResponse(UserResponse.model_validate(db_user))
+        ```
+    """
+
+    def render(self, content: Any) -> bytes:  # noqa: ANN401
+        """Serialize the content to JSON bytes."""
+        return orjson.dumps(content, default=_default)
+
+
+def etag_matches(if_none_match: str, etags: Iterable[str]) -> bool:
+    """Return whether an If-None-Match header matches one of the ETags, using the weak comparison.
+
+    Args:
+        if_none_match (str): The value of the If-None-Match request header.
+        etags (Iterable[str]): The current ETags of the resource, quoted, with or without `W/`.
+
+    Returns:
+        bool: True if the client already has the current representation.
+    """
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in candidates:
+        return True
+    return any(etag.removeprefix("W/") in candidates for etag in etags)
+
+
+@dataclass(frozen=True)
+class PrecomputedResponse:
+    """A static document encoded once, with a compressed variant per supported encoding.
+
+    Serving it costs a dictionary lookup: the body is neither serialized nor compressed per request.
+    Each variant has its own ETag, and a conditional request matching any of them is answered with 304.
+
+    Attributes:
+        media_type (str): The content type of the document.
+        variants (dict[str, bytes]): The body per content encoding, `identity` being the unencoded body.
+        etags (dict[str, str]): The ETag per content encoding.
+        cache_control (str): The Cache-Control header of the responses.
+    """
+
+    media_type: str
+    variants: dict[str, bytes]
+    etags: dict[str, str]
+    cache_control: str = "no-cache"
+
+    @classmethod
+    def build(cls, body: bytes, media_type: str, cache_control: str = "no-cache") -> PrecomputedResponse:
+        """Encode the document in every supported encoding.
+
+        Args:
+            body (bytes): The unencoded document.
+            media_type (str): The content type of the document.
+            cache_control (str): The Cache-Control header. `no-cache` makes clients revalidate with the ETag.
+
+        Returns:
+            PrecomputedResponse: The precomputed document.
+        """
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        variants = {"identity": body}
+        etags = {"identity": f'"{digest}"'}
+        for encoding in ENCODINGS:
+            # compressed once at startup, so the slowest levels cost nothing per request
+            variants[encoding] = compress(body, encoding, STATIC_LEVELS[encoding])
+            etags[encoding] = f'"{digest}-{encoding}"'
+        return cls(media_type=media_type, variants=variants, etags=etags, cache_control=cache_control)
+
+    def respond(self, request: Request) -> Response:
+        """Return the variant accepted by the client, or 304 if the client already has the document.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            Response: The response.
+        """
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), ENCODINGS) or "identity"
+        headers = {"etag": self.etags[encoding], "cache-control": self.cache_control, "vary": "Accept-Encoding"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, self.etags.values()):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+        return Response(content=self.variants[encoding], media_type=self.media_type, headers=headers)
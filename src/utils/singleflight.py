@@ -0,0 +1,109 @@
+"""This module provides request coalescing ("single-flight") for identical concurrent lookups.
+
+When many requests of a worker look up the same key at once, e.g. a popular user whose cache entry just expired,
+only the first one runs the lookup; the others wait for it and share its result, so the database receives
+one query instead of hundreds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from src.utils.metrics import Counter
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Awaitable, Callable
+
+SINGLEFLIGHT_CALLS = Counter("singleflight_calls_total", "Number of lookups actually executed.", ["group"])
+SINGLEFLIGHT_COALESCED = Counter(
+    "singleflight_coalesced_total", "Number of requests that shared the result of an in-flight lookup.", ["group"]
+)
+
+
+@dataclass
+class SingleFlightStats:
+    """Counters of a single-flight group.
+
+    Attributes:
+        calls (int): The number of lookups actually executed.
+        coalesced (int): The number of requests that waited for an in-flight lookup instead.
+    """
+
+    calls: int = 0
+    coalesced: int = 0
+
+
+class SingleFlight[T]:
+    """Deduplicate concurrent calls with the same key within one worker.
+
+    The lookup runs in its own task: a waiter that is cancelled (e.g. the client disconnected)
+    does not cancel the lookup shared by the others. An exception is raised to every waiter,
+    and nothing is remembered once the lookup is done, so the next call runs it again.
+
+    Example:
+        ```python
+        user_lookups: SingleFlight[dict | None] = SingleFlight("user")
+        user = await user_lookups.do(str(user_id), lambda: load_user(user_id))
+        ```
+
+    Attributes:
+        stats (SingleFlightStats): The call/coalesced counters, exposed on /metrics with the label `group=<name>`.
+    """
+
+    def __init__(self, name: str) -> None:
+        """Initialize the SingleFlight class.
+
+        Args:
+            name (str): The name of the group, used as metrics label.
+        """
+        self.stats = SingleFlightStats()
+        self._calls: dict[str, asyncio.Task[T]] = {}
+
+        stats = self.stats
+        SINGLEFLIGHT_CALLS.labels(name).set_function(lambda: stats.calls)
+        SINGLEFLIGHT_COALESCED.labels(name).set_function(lambda: stats.coalesced)
+
+    async def do(self, key: str, function: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of `function`, sharing the in-flight call for the same key if there is one.
+
+        Args:
+            key (str): The key identifying the lookup.
+            function (Callable[[], Awaitable[T]]): The lookup, called only if no call for the key is in flight.
+
+        Returns:
+            T: The result of the lookup.
+        """
+        call = self._calls.get(key)
+        # a call left by another event loop (e.g. in tests) can't be awaited from this one
+        if call is not None and call.get_loop() is asyncio.get_running_loop():
+            self.stats.coalesced += 1
+            return await asyncio.shield(call)
+
+        async def run() -> T:
+            return await function()
+
+        task = asyncio.ensure_future(run())
+        self._calls[key] = task
+        self.stats.calls += 1
+        task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task)
+
+    def forget(self, key: str) -> None:
+        """Stop sharing the in-flight call for the key, e.g. because a write made its result stale.
+
+        The call keeps running for the requests already waiting for it, and the next call runs the lookup again.
+
+        Args:
+            key (str): The key identifying the lookup.
+        """
+        self._calls.pop(key, None)
+
+    def _forget(self, key: str, task: asyncio.Task[T]) -> None:
+        """Remove a finished call, so that the next call for the key runs the lookup again."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # mark the exception as retrieved, in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
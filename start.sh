@@ -12,6 +12,9 @@ if [ $DEBUG = "True" ]; then
     LOG="log_config_debug.yaml"
     echo DEBUG Mode Enabled
     echo
+elif [ "$LOG_FORMAT" = "json" ]; then
+    # JSON lines written on a background thread, with request IDs and latencies
+    LOG="log_config_json.yaml"
 else
     LOG="log_config.yaml";
 fi
@@ -23,20 +26,16 @@ echo This software is released under the MIT License.
 echo http://opensource.org/licenses/mit-license.php
 echo 
 echo ------------------------------------------------
-echo Step1: Wait for 10 seconds for the database to start
-echo
-sleep 10
-
-
-echo ------------------------------------------------
+echo Step1: Wait for the database to start
 echo Step2: Update Database Model
 echo
 
-alembic upgrade head
+# Polls the database with backoff (STARTUP_DB_TIMEOUT) and runs alembic upgrade head
+python -m src.startup
 
 # Check the command exited correctly
 if [ $? -gt 0 ]; then
-    echo Error: Failed to update database model
+    echo Error: Failed to start the database or update the database model
     exit 1
 fi
 
@@ -45,5 +44,9 @@ echo ------------------------------------------------
 echo Step3: Start FastAPI Server
 echo
 
-
-/usr/local/bin/uvicorn src:app --reload --host 0.0.0.0 --port 5000 --log-config $LOG
\ No newline at end of file
+if [ "$DEBUG" = "True" ]; then
+    /usr/local/bin/uvicorn src:app --reload --host 0.0.0.0 --port 5000 --log-config $LOG
+else
+    # Production: multiple workers, uvloop/httptools, no file watcher. See src/server.py for the settings.
+    LOG_CONFIG=$LOG exec python -m src.server
+fi
\ No newline at end of file
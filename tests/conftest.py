@@ -0,0 +1,23 @@
+"""This module contains the fixtures shared by the tests."""
+
+import asyncio
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+from src.endpoints.v1.user import user_cache
+from src.utils.async_database import dispose_async_engines
+from src.utils.database import dispose_engines
+
+
+@pytest.fixture
+def test_db(tmp_path: Path) -> Generator[str, None, None]:
+    """Fixture for creating a temporary test database."""
+    path = f"sqlite:///{tmp_path / 'test.db'}"
+    yield path
+    asyncio.run(user_cache.clear())
+    asyncio.run(dispose_async_engines())
+    dispose_engines()
+    # path[0:10] is "sqlite:///", so we start from path[10:]
+    Path(path[10:]).unlink(missing_ok=True)
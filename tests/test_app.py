@@ -0,0 +1,31 @@
+"""This module contains tests for the FastAPI application lifecycle."""
+
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from starlette.middleware.cors import CORSMiddleware
+
+from src.app import app
+from src.middleware.load_shedding import LoadSheddingMiddleware
+from src.middleware.metrics import MetricsMiddleware
+from src.middleware.rate_limit import RateLimitMiddleware
+from src.utils.database import Database
+
+
+def test_lifespan_shares_and_disposes_engine() -> None:
+    """Test that the engine is created at startup, shared by requests and disposed at shutdown."""
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": "sqlite:///:memory:"}):
+        with TestClient(app):
+            engine = Database().connect().engine
+            assert Database().connect().engine is engine
+
+        assert Database().connect().engine is not engine
+
+
+def test_limits_are_wrapped_by_cors_and_metrics() -> None:
+    """Test that the 429 and 503 responses of the limits go through the CORS and metrics middleware."""
+    # the first middleware of the list is the outermost one
+    order: list[object] = [middleware.cls for middleware in app.user_middleware]
+    for limit in (RateLimitMiddleware, LoadSheddingMiddleware):
+        assert order.index(CORSMiddleware) < order.index(limit)
+        assert order.index(MetricsMiddleware) < order.index(limit)
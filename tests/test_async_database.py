@@ -0,0 +1,95 @@
+"""This module contains tests for the AsyncDatabase class."""
+
+import asyncio
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from sqlalchemy import select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.models import User
+from src.utils.async_database import AsyncDatabase, dispose_async_engines, get_async_session, to_async_url
+
+
+def test_to_async_url() -> None:
+    """Test that connection strings are converted to their async drivers."""
+    assert to_async_url("mysql://user:pass@db/test_db") == "mysql+aiomysql://user:pass@db/test_db"
+    assert to_async_url("mysql+mysqldb://user:pass@db/test_db") == "mysql+aiomysql://user:pass@db/test_db"
+    assert to_async_url("sqlite:///:memory:") == "sqlite+aiosqlite:///:memory:"
+
+
+def test_to_async_url_unsupported_backend() -> None:
+    """Test that to_async_url() raises ValueError for a backend without async driver."""
+    with pytest.raises(ValueError, match="No async driver for the database backend"):
+        to_async_url("oracle://user:pass@db/test_db")
+
+
+def test_async_database_initialization_with_missing_mysql_params() -> None:
+    """Test that AsyncDatabase initialization validates parameters like Database."""
+    with pytest.raises(ValueError, match="You must provide host, db_name, db_user, db_pass"):
+        AsyncDatabase(host="localhost", db_name="test_db", db_user="user")
+
+
+def test_async_database_engine_shared() -> None:
+    """Test that AsyncDatabase instances with the same path share one engine."""
+
+    async def run() -> None:
+        first = AsyncDatabase(sqlite_path="sqlite:///:memory:").connect()
+        second = AsyncDatabase(sqlite_path="sqlite:///:memory:").connect()
+        assert first.engine is second.engine
+        assert first.connect() is first
+        await dispose_async_engines()
+
+    asyncio.run(run())
+
+
+def test_async_database_session_commit_and_rollback() -> None:
+    """Test that AsyncDatabase.session() commits and rolls back the transaction."""
+
+    async def run() -> None:
+        db = AsyncDatabase(sqlite_path="sqlite:///:memory:").connect()
+        async with db.session() as session:
+            assert (await session.execute(text("SELECT 1"))).scalar() == 1
+
+        with pytest.raises(SQLAlchemyError, match="Error in session"):
+            async with db.session() as session:
+                await session.execute(text("INVALID SQL SYNTAX"))
+
+        await dispose_async_engines()
+
+    asyncio.run(run())
+
+
+def test_async_database_session_after_close() -> None:
+    """Test that AsyncDatabase.session() raises ValueError after close."""
+
+    async def run() -> None:
+        db = AsyncDatabase(sqlite_path="sqlite:///:memory:").connect()
+        db.close()
+        with pytest.raises(ValueError, match="Database connection is not established"):
+            async with db.session():
+                pass
+
+    asyncio.run(run())
+
+
+def test_async_database_connect_failure_wrong_path() -> None:
+    """Test that AsyncDatabase.connect() raises SQLAlchemyError when the engine cannot be created."""
+    db = AsyncDatabase(sqlite_path="sqlite:///:memory:")
+    db.db_path = "invalid_db_path"
+    with pytest.raises(SQLAlchemyError, match="Error connecting to the database"):
+        db.connect()
+
+
+def test_get_async_session_creates_tables(monkeypatch: MonkeyPatch) -> None:
+    """Test that the session dependency creates the tables in testing mode."""
+    monkeypatch.setenv("PYTEST", "true")
+    monkeypatch.setenv("PYTEST_DB", "sqlite:///:memory:")
+
+    async def run() -> None:
+        async for session in get_async_session():
+            result = await session.execute(select(User))
+            assert result.scalars().all() == []
+        await dispose_async_engines()
+
+    asyncio.run(run())
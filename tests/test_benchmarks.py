@@ -0,0 +1,71 @@
+"""This module contains tests for the load benchmark in `benchmarks.load` and the memory benchmark."""
+
+import tempfile
+from pathlib import Path
+
+import orjson
+
+from benchmarks.indexes import main as indexes_main
+from benchmarks.load import ScenarioResult, compare, main
+from benchmarks.memory import main as memory_main
+
+
+def test_scenario_result_percentiles() -> None:
+    """Test that the latencies are summarized in milliseconds."""
+    result = ScenarioResult.from_latencies([i / 1000 for i in range(1, 101)], errors=1, duration=2)
+    assert result.requests == 100
+    assert result.errors == 1
+    assert result.throughput_rps == 50
+    assert 50 <= result.p50_ms <= 51
+    assert 95 <= result.p95_ms <= 96
+    assert 99 <= result.p99_ms <= 100
+
+
+def test_compare() -> None:
+    """Test that only the latencies above the baseline plus the threshold are reported."""
+    baseline = {"scenarios": {"get_user": {"p95_ms": 10.0, "p99_ms": 20.0}, "removed": {"p95_ms": 1, "p99_ms": 1}}}
+    results = {"scenarios": {"get_user": {"p95_ms": 11.9, "p99_ms": 24.1}}}
+
+    regressions = compare(results, baseline, threshold=0.2)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("get_user p99_ms")
+    assert compare(results, baseline, threshold=0.5) == []
+
+
+def test_main_in_process() -> None:
+    """Test a small in-process run, its JSON output and the comparison with a baseline."""
+    directory = Path(tempfile.mkdtemp())
+    output = directory / "results.json"
+
+    assert main(["--requests", "20", "--concurrency", "4", "--output", str(output)]) == 0
+    results = orjson.loads(output.read_bytes())
+    assert set(results["scenarios"]) == {"get_version", "create_user", "get_user", "delete_user"}
+    assert all(result["errors"] == 0 for result in results["scenarios"].values())
+
+    baseline = directory / "baseline.json"
+    fast = {name: {"p95_ms": 0, "p99_ms": 0} for name in results["scenarios"]}
+    baseline.write_bytes(orjson.dumps({"scenarios": fast}))
+    assert main(["--requests", "20", "--concurrency", "4", "--baseline", str(baseline)]) == 1
+
+
+def test_memory_benchmark() -> None:
+    """Test a small run of the memory benchmark, and that the Core rows allocate less than the ORM instances."""
+    output = Path(tempfile.mkdtemp()) / "memory.json"
+    argv = ["--users", "200", "--lookups", "20", "--traced-lookups", "20", "--page-size", "50", "--output", str(output)]
+    assert memory_main(argv) == 0
+
+    results = orjson.loads(output.read_bytes())
+    orm, core = results["modes"]["orm"], results["modes"]["core"]
+    assert core["alloc_kib_per_lookup"] < orm["alloc_kib_per_lookup"]
+    assert all(mode["rss_mib"] > 0 and mode["lookups_per_second"] > 0 for mode in (orm, core))
+
+
+def test_indexes_benchmark() -> None:
+    """Test a small run of the index benchmark, and its JSON output."""
+    output = Path(tempfile.mkdtemp()) / "indexes.json"
+    assert indexes_main(["--rows", "500", "--rows", "100", "--iterations", "5", "--output", str(output)]) == 0
+
+    results = orjson.loads(output.read_bytes())
+    assert results["rows"] == [100, 500]
+    assert set(results["lookup_us"]) == {"name", "nickname"}
+    assert all(timing > 0 for timings in results["lookup_us"].values() for timing in timings.values())
@@ -0,0 +1,190 @@
+"""This module contains tests for the cache backends."""
+
+import asyncio
+import fnmatch
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from src.utils.cache import CacheGenerations, LRUCache, NullCache, RedisCache, create_cache
+
+
+class FakeRedis:
+    """A local stand-in for `redis.asyncio.Redis` storing keys in a dict."""
+
+    def __init__(self) -> None:
+        """Initialize the FakeRedis class."""
+        self.data: dict[str, str] = {}
+        self.expiry: dict[str, int | None] = {}
+
+    async def get(self, name: str) -> str | None:
+        """Return the value of the key."""
+        return self.data.get(name)
+
+    async def set(self, name: str, value: str, ex: int | None = None) -> bool:
+        """Set the value of the key."""
+        self.data[name] = value
+        self.expiry[name] = ex
+        return True
+
+    async def delete(self, *names: str) -> int:
+        """Delete the keys."""
+        return sum(self.data.pop(name, None) is not None for name in names)
+
+    async def scan_iter(self, match: str | None = None) -> AsyncIterator[str]:
+        """Iterate over the keys matching the pattern."""
+        for key in list(self.data):
+            if match is None or fnmatch.fnmatch(key, match):
+                yield key
+
+
+def test_lru_cache_hit_and_miss() -> None:
+    """Test that LRUCache counts hits and misses."""
+    cache = LRUCache(max_size=10, ttl=60)
+
+    async def run() -> None:
+        assert await cache.get("1") is None
+        await cache.set("1", {"id": 1})
+        assert await cache.get("1") == {"id": 1}
+
+    asyncio.run(run())
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.evictions) == (1, 1, 0)
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    """Test that LRUCache evicts the least recently used entry when full."""
+    cache = LRUCache(max_size=2, ttl=60)
+
+    async def run() -> None:
+        await cache.set("1", 1)
+        await cache.set("2", 2)
+        await cache.get("1")
+        await cache.set("3", 3)
+        assert await cache.get("2") is None
+        assert await cache.get("1") == 1
+        assert await cache.get("3") == 3
+
+    asyncio.run(run())
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+
+
+def test_lru_cache_expires_entries() -> None:
+    """Test that LRUCache does not return expired entries."""
+    cache = LRUCache(max_size=2, ttl=-1)
+
+    async def run() -> None:
+        await cache.set("1", 1)
+        assert await cache.get("1") is None
+
+    asyncio.run(run())
+    assert len(cache) == 0
+    assert cache.stats.evictions == 1
+
+
+def test_lru_cache_delete_and_clear() -> None:
+    """Test that LRUCache removes entries on delete and clear."""
+    cache = LRUCache()
+
+    async def run() -> None:
+        await cache.set("1", 1)
+        await cache.set("2", 2)
+        await cache.delete("1")
+        await cache.delete("unknown")
+        assert await cache.get("1") is None
+        await cache.clear()
+        assert await cache.get("2") is None
+
+    asyncio.run(run())
+
+
+def test_null_cache() -> None:
+    """Test that NullCache stores nothing."""
+    cache = NullCache()
+
+    async def run() -> None:
+        await cache.set("1", 1)
+        assert await cache.get("1") is None
+        await cache.delete("1")
+        await cache.clear()
+
+    asyncio.run(run())
+    assert cache.stats.misses == 1
+
+
+def test_cache_generations() -> None:
+    """Test that a fill sees the invalidations made while it is in progress, and only those."""
+    generations = CacheGenerations()
+    # invalidations without a fill in progress are not tracked
+    generations.bump("1")
+
+    generation = generations.begin("1")
+    assert not generations.changed("1", generation)
+    other = generations.begin("1")
+    generations.bump("1")
+    assert generations.changed("1", generation)
+    assert generations.changed("1", other)
+    generations.end("1")
+    # a fill started after the invalidation is not affected by it
+    latest = generations.begin("1")
+    assert not generations.changed("1", latest)
+    generations.end("1")
+    generations.end("1")
+    assert generations._generations == {}  # noqa: SLF001
+    assert generations._fills == {}  # noqa: SLF001
+
+
+def test_redis_cache() -> None:
+    """Test RedisCache against a local stand-in."""
+    client = FakeRedis()
+    cache = RedisCache(client, prefix="user", ttl=30)
+    client.data["other:1"] = "1"
+
+    async def run() -> None:
+        assert await cache.get("1") is None
+        await cache.set("1", {"id": 1, "name": "John"})
+        assert client.expiry["user:1"] == 30
+        assert await cache.get("1") == {"id": 1, "name": "John"}
+        await cache.set("2", 2)
+        await cache.delete("1")
+        assert await cache.get("1") is None
+        await cache.clear()
+        await cache.clear()
+        assert await cache.get("2") is None
+
+    asyncio.run(run())
+    assert client.data == {"other:1": "1"}
+    assert (cache.stats.hits, cache.stats.misses) == (1, 3)
+
+
+@pytest.mark.parametrize(("backend", "cache_class"), [("memory", LRUCache), ("none", NullCache)])
+def test_create_cache(monkeypatch: MonkeyPatch, backend: str, cache_class: Any) -> None:  # noqa: ANN401
+    """Test that create_cache() selects the backend from the environment."""
+    monkeypatch.setenv("CACHE_BACKEND", backend)
+    assert isinstance(create_cache("user"), cache_class)
+
+
+def test_create_cache_redis(monkeypatch: MonkeyPatch) -> None:
+    """Test that create_cache() creates a RedisCache from REDIS_URL."""
+    monkeypatch.setenv("CACHE_BACKEND", "redis")
+    monkeypatch.setenv("REDIS_URL", "redis://cache:6379/1")
+    created: list[str] = []
+
+    def from_url(cls: type[RedisCache], url: str, prefix: str, ttl: int) -> RedisCache:
+        created.append(url)
+        return cls(FakeRedis(), prefix=prefix, ttl=ttl)
+
+    monkeypatch.setattr(RedisCache, "from_url", classmethod(from_url))
+    cache = create_cache("user")
+    assert isinstance(cache, RedisCache)
+    assert cache.prefix == "user"
+    assert created == ["redis://cache:6379/1"]
+
+
+def test_create_cache_unknown_backend(monkeypatch: MonkeyPatch) -> None:
+    """Test that create_cache() raises ValueError for an unknown backend."""
+    monkeypatch.setenv("CACHE_BACKEND", "memcached")
+    with pytest.raises(ValueError, match="Unknown cache backend: memcached"):
+        create_cache("user")
@@ -0,0 +1,132 @@
+"""This module contains tests for the content encodings and the compression middleware."""
+
+import gzip
+import zlib
+from collections.abc import AsyncGenerator
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from src.middleware import compression
+from src.middleware.compression import CompressionMiddleware
+from src.utils.compression import StreamCompressor, compress, negotiate_encoding
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        ("gzip, br", "br"),
+        ("gzip, br;q=0.5", "gzip"),
+        ("gzip;q=0, br;q=0", None),
+        ("identity", None),
+        ("", None),
+        ("*", "br"),
+        ("*;q=0.1, gzip", "gzip"),
+        ("GZIP;q=invalid, br", "br"),
+    ],
+)
+def test_negotiate_encoding(accept_encoding: str, expected: str | None) -> None:
+    """Test that the preferred encoding accepted by the client is chosen."""
+    assert negotiate_encoding(accept_encoding, ("br", "gzip")) == expected
+
+
+def test_compress_gzip() -> None:
+    """Test that gzip compression is deterministic and reversible."""
+    body = b'{"users":[]}' * 100
+    assert compress(body, "gzip") == compress(body, "gzip")
+    assert gzip.decompress(compress(body, "gzip", level=1)) == body
+
+
+def test_compress_unsupported() -> None:
+    """Test that compress() raises for an unknown encoding."""
+    with pytest.raises(ValueError, match="Unsupported content encoding"):
+        compress(b"body", "deflate")
+
+
+def _app() -> Starlette:
+    """Create an application with responses of several sizes behind the compression middleware."""
+
+    async def small(_: Request) -> Response:
+        return PlainTextResponse("small")
+
+    async def large(_: Request) -> Response:
+        return JSONResponse({"data": "x" * 1000}, headers={"etag": '"strong"'})
+
+    async def encoded(_: Request) -> Response:
+        return Response(gzip.compress(b"y" * 1000), media_type="text/plain", headers={"content-encoding": "gzip"})
+
+    async def image(_: Request) -> Response:
+        return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+    async def stream(_: Request) -> Response:
+        async def lines() -> AsyncGenerator[str, None]:
+            for i in range(100):
+                yield f'{{"id": {i}}}\n'
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    routes = [
+        Route("/small", small),
+        Route("/large", large),
+        Route("/encoded", encoded),
+        Route("/image", image),
+        Route("/stream", stream),
+    ]
+    return Starlette(routes=routes, middleware=[Middleware(CompressionMiddleware, minimum_size=500)])
+
+
+def test_compression_middleware() -> None:
+    """Test that bodies above the threshold are compressed with gzip and their strong ETag is weakened."""
+    response = TestClient(_app()).get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"strong"'
+    assert int(response.headers["content-length"]) < 1000
+    assert response.json() == {"data": "x" * 1000}
+
+
+@pytest.mark.parametrize(("configured", "expected"), [("", 6), ("2", 2)])
+def test_compression_middleware_level(monkeypatch: MonkeyPatch, configured: str, expected: int) -> None:
+    """Test that per-request bodies use the fast level by default, not the maximum of precomputed documents."""
+    monkeypatch.setenv("COMPRESSION_LEVEL", configured)
+    levels: list[int | None] = []
+
+    def recording_compress(body: bytes, encoding: str, level: int | None = None) -> bytes:
+        levels.append(level)
+        return compress(body, encoding, level)
+
+    monkeypatch.setattr(compression, "compress", recording_compress)
+    response = TestClient(_app()).get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.json() == {"data": "x" * 1000}
+    assert levels == [expected]
+
+
+def test_compression_middleware_skips() -> None:
+    """Test that small, already encoded and incompressible bodies, and clients without gzip, are left alone."""
+    client = TestClient(_app())
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/image", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+    assert client.get("/encoded", headers={"Accept-Encoding": "gzip"}).text == "y" * 1000
+
+
+def test_compression_middleware_streaming() -> None:
+    """Test that streaming responses are compressed chunk by chunk."""
+    response = TestClient(_app()).get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert len(response.text.splitlines()) == 100
+
+
+def test_stream_compressor() -> None:
+    """Test that the flushed chunks can be decoded as they arrive."""
+    compressor = StreamCompressor("gzip")
+    decompressor = zlib.decompressobj(31)
+    assert decompressor.decompress(compressor.compress(b"line 1\n")) == b"line 1\n"
+    assert decompressor.decompress(compressor.compress(b"line 2\n") + compressor.finish()) == b"line 2\n"
@@ -0,0 +1,87 @@
+"""This module contains tests for the precomputed OpenAPI document and documentation pages."""
+
+import gzip
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src import openapi
+from src.app import app
+from src.app_detail import APIDetail
+from src.endpoints.docs import build_docs, include_docs
+
+client = TestClient(app)
+
+
+def test_openapi_document() -> None:
+    """Test that the OpenAPI document is served with an ETag and revalidation headers."""
+    response = client.get(APIDetail.OPENAPI_URL, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["cache-control"] == "no-cache"
+    assert "content-encoding" not in response.headers
+    assert response.json() == app.openapi()
+
+
+def test_openapi_document_gzip() -> None:
+    """Test that the gzip variant is served to clients accepting it."""
+    response = client.get(APIDetail.OPENAPI_URL, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"].endswith('-gzip"')
+    assert response.json() == app.openapi()
+
+
+def test_openapi_document_not_modified() -> None:
+    """Test that a conditional request with the current ETag is answered with 304."""
+    etag = client.get(APIDetail.OPENAPI_URL).headers["etag"]
+    response = client.get(APIDetail.OPENAPI_URL, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get(APIDetail.OPENAPI_URL, headers={"If-None-Match": '"outdated"'})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("url", [APIDetail.DOCS_URL, APIDetail.DOCS_URL + "/oauth2-redirect", APIDetail.REDOC_URL])
+def test_docs_pages(url: str) -> None:
+    """Test that the documentation pages are served."""
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/html; charset=utf-8"
+    assert "etag" in response.headers
+
+
+def test_docs_disabled(monkeypatch: MonkeyPatch) -> None:
+    """Test that no documentation route is registered when the docs are disabled."""
+    monkeypatch.setattr(APIDetail, "DOCS_ENABLED", False)
+    disabled = FastAPI(openapi_url=None, docs_url=None, redoc_url=None)
+    include_docs(disabled)
+
+    disabled_client = TestClient(disabled)
+    for url in (APIDetail.OPENAPI_URL, APIDetail.DOCS_URL, APIDetail.REDOC_URL):
+        assert disabled_client.get(url).status_code == 404
+
+
+def test_openapi_file(monkeypatch: MonkeyPatch) -> None:
+    """Test that the OpenAPI document generated at build time is loaded from OPENAPI_FILE."""
+    path = Path(tempfile.gettempdir()) / "openapi_test.json"
+    assert openapi.main([str(path)]) == 0
+    document = json.loads(path.read_bytes())
+    assert document == app.openapi()
+
+    document["info"]["title"] = "Built"
+    path.write_text(json.dumps(document))
+    monkeypatch.setenv("OPENAPI_FILE", str(path))
+    try:
+        other = FastAPI(openapi_url=None, docs_url=None, redoc_url=None)
+        documents = build_docs(other)
+        assert json.loads(gzip.decompress(documents.openapi.variants["gzip"]))["info"]["title"] == "Built"
+    finally:
+        path.unlink()
@@ -0,0 +1,85 @@
+"""This module contains tests for the write batching in `src.utils.group_commit`."""
+
+import asyncio
+import time
+
+import pytest
+
+from src.utils.group_commit import GroupCommit
+
+
+class Recorder:
+    """A write function that records its batches and fails on negative items."""
+
+    def __init__(self) -> None:
+        """Initialize the Recorder class."""
+        self.batches: list[list[int]] = []
+
+    async def __call__(self, items: list[int]) -> list[int]:
+        """Record the batch and return the items doubled."""
+        self.batches.append(items)
+        await asyncio.sleep(0)
+        if any(item < 0 for item in items):
+            msg = "negative item"
+            raise ValueError(msg)
+        return [item * 2 for item in items]
+
+
+def test_concurrent_items_share_a_batch() -> None:
+    """Test that the items submitted within the window are written together, each caller getting its result."""
+    write = Recorder()
+    group: GroupCommit[int, int] = GroupCommit("test_batch", write, window=0.05, max_size=100)
+
+    async def run() -> list[int]:
+        return await asyncio.gather(*(group.submit(i) for i in range(10)))
+
+    assert asyncio.run(run()) == [i * 2 for i in range(10)]
+    assert write.batches == [list(range(10))]
+    assert group.stats.batches == 1
+    assert group.stats.items == 10
+
+
+def test_full_batch_is_written_without_waiting() -> None:
+    """Test that a full batch does not wait for the window and the batches are capped at max_size."""
+    write = Recorder()
+    group: GroupCommit[int, int] = GroupCommit("test_full", write, window=10, max_size=4)
+
+    async def run() -> list[int]:
+        return await asyncio.gather(*(group.submit(i) for i in range(8)))
+
+    start = time.monotonic()
+    assert asyncio.run(run()) == [i * 2 for i in range(8)]
+    assert time.monotonic() - start < 1
+    assert write.batches == [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+
+def test_single_item_waits_at_most_the_window() -> None:
+    """Test that an item alone is written once the window has passed."""
+    write = Recorder()
+    group: GroupCommit[int, int] = GroupCommit("test_window", write, window=0.02, max_size=100)
+
+    start = time.monotonic()
+    assert asyncio.run(group.submit(1)) == 2
+    assert 0.02 <= time.monotonic() - start < 0.5
+
+
+def test_errors_are_isolated() -> None:
+    """Test that a failing item fails only its caller, the others of its batch are written."""
+    write = Recorder()
+    group: GroupCommit[int, int] = GroupCommit("test_errors", write, window=0.05, max_size=100)
+
+    async def run() -> list[int | BaseException]:
+        return await asyncio.gather(*(group.submit(i) for i in (1, -1, 2)), return_exceptions=True)
+
+    first, failed, second = asyncio.run(run())
+    assert (first, second) == (2, 4)
+    assert isinstance(failed, ValueError)
+    assert write.batches == [[1, -1, 2], [1], [-1], [2]]
+    assert group.stats.retried == 3
+
+
+def test_error_of_single_item() -> None:
+    """Test that the error of a batch of one item is raised to its caller."""
+    group: GroupCommit[int, int] = GroupCommit("test_single_error", Recorder(), window=0, max_size=100)
+    with pytest.raises(ValueError, match="negative item"):
+        asyncio.run(group.submit(-1))
@@ -0,0 +1,68 @@
+"""This module contains tests for the liveness and readiness endpoints."""
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from database.models import User
+from src.app import app
+from src.endpoints.v1.user import user_cache
+from src.startup import startup_state
+from src.utils.database import Database
+
+
+def wait_until_ready(client: TestClient, timeout: float = 5.0) -> dict:
+    """Poll /readyz until the worker is ready and return the last response body."""
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get("/readyz")
+        if response.status_code == 200 or time.monotonic() > deadline:
+            return response.json()
+        time.sleep(0.01)
+
+
+def test_healthz() -> None:
+    """Test that the liveness endpoint answers without the lifespan."""
+    response = TestClient(app).get("/healthz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_readyz_not_ready() -> None:
+    """Test that the readiness endpoint answers 503 with the phase while warming up."""
+    startup_state.reset()
+    startup_state.phase = "database"
+    try:
+        response = TestClient(app).get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["status"] == "not ready"
+        assert response.json()["phase"] == "database"
+    finally:
+        startup_state.reset()
+
+
+def test_warm_up() -> None:
+    """Test that the worker warms up in the background, primes the cache and becomes ready."""
+    path = Path(tempfile.gettempdir()) / "warm_up.db"
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": f"sqlite:///{path}", "WARMUP_CACHE_USERS": "2"}):
+        with Database().connect().session() as session:
+            session.add_all([User(name=f"user{i}", fullname=f"User {i}", nickname=f"u{i}") for i in range(3)])
+
+        try:
+            with TestClient(app) as client:
+                body = wait_until_ready(client)
+                assert body["status"] == "ready"
+                assert body["completed"] == ["database", "openapi", "cache"]
+                assert app.state.docs is not None
+                assert asyncio.run(user_cache.get("3")) is not None
+                assert asyncio.run(user_cache.get("1")) is None
+
+            assert startup_state.phase == "stopping"
+        finally:
+            asyncio.run(user_cache.clear())
+            startup_state.reset()
+            path.unlink()
@@ -0,0 +1,202 @@
+"""This module contains tests for the Idempotency-Key stores."""
+
+import asyncio
+import fnmatch
+from collections.abc import AsyncIterator
+from unittest.mock import patch
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from sqlalchemy import select
+
+from database.models import IdempotencyKey
+from src.utils.async_database import AsyncDatabase, dispose_async_engines
+from src.utils.idempotency import (
+    DatabaseIdempotencyStore,
+    IdempotencyStore,
+    MemoryIdempotencyStore,
+    RedisIdempotencyStore,
+    create_idempotency_store,
+)
+
+
+class FakeRedis:
+    """A local stand-in for `redis.asyncio.Redis` storing keys in a dict, with `SET NX`."""
+
+    def __init__(self) -> None:
+        """Initialize the FakeRedis class."""
+        self.data: dict[str, str] = {}
+        self.expiry: dict[str, int | None] = {}
+
+    async def get(self, name: str) -> str | None:
+        """Return the value of the key."""
+        return self.data.get(name)
+
+    async def set(self, name: str, value: str, ex: int | None = None, nx: bool = False) -> bool | None:  # noqa: FBT001, FBT002
+        """Set the value of the key, only if it does not exist with `nx`."""
+        if nx and name in self.data:
+            return None
+        self.data[name] = value
+        self.expiry[name] = ex
+        return True
+
+    async def delete(self, *names: str) -> int:
+        """Delete the keys."""
+        return sum(self.data.pop(name, None) is not None for name in names)
+
+    async def scan_iter(self, match: str | None = None) -> AsyncIterator[str]:
+        """Iterate over the keys matching the pattern."""
+        for key in list(self.data):
+            if match is None or fnmatch.fnmatch(key, match):
+                yield key
+
+
+async def check_reservation(store: IdempotencyStore) -> None:
+    """Check the reservation, completion and release of a key, common to every store."""
+    assert await store.acquire("key") is None
+    assert await store.get("key") is None
+    # held by the first request
+    assert await store.reserve("key") is False
+
+    await store.complete("key", {"user": {"id": 1}})
+    assert await store.get("key") == {"user": {"id": 1}}
+    assert await store.acquire("key") == {"user": {"id": 1}}
+    # a stored response is not dropped by a release
+    await store.release("key")
+    assert await store.reserve("key") is False
+
+    assert await store.reserve("failed") is True
+    await store.release("failed")
+    assert await store.reserve("failed") is True
+
+    await store.clear()
+    assert await store.get("key") is None
+
+
+def test_memory_store() -> None:
+    """Test the reservation of the keys in MemoryIdempotencyStore."""
+    asyncio.run(check_reservation(MemoryIdempotencyStore()))
+
+
+def test_memory_store_expires_reservations() -> None:
+    """Test that a reservation whose request did not finish in time is taken over."""
+    store = MemoryIdempotencyStore(pending_ttl=-1)
+
+    async def run() -> None:
+        assert await store.reserve("key") is True
+        assert await store.reserve("key") is True
+
+    asyncio.run(run())
+
+
+def test_memory_store_evicts_least_recently_used() -> None:
+    """Test that MemoryIdempotencyStore keeps at most `max_size` keys."""
+    store = MemoryIdempotencyStore(max_size=2)
+
+    async def run() -> None:
+        for key in ("1", "2", "3"):
+            await store.complete(key, {"id": key})
+        assert await store.get("1") is None
+        assert await store.get("3") == {"id": "3"}
+
+    asyncio.run(run())
+    assert len(store) == 2
+
+
+def test_acquire_waits_for_the_request_holding_the_key() -> None:
+    """Test that acquire() waits for the response of the request holding the key, e.g. on another worker."""
+    store = MemoryIdempotencyStore(poll_interval=0.01)
+
+    async def run() -> None:
+        assert await store.reserve("key") is True
+        waiting = asyncio.create_task(store.acquire("key"))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        await store.complete("key", {"id": 1})
+        assert await asyncio.wait_for(waiting, timeout=5) == {"id": 1}
+
+    asyncio.run(run())
+
+
+def test_redis_store() -> None:
+    """Test that RedisIdempotencyStore reserves the keys with SET NX under its prefix."""
+    client = FakeRedis()
+    store = RedisIdempotencyStore(client, ttl=600, pending_ttl=10)
+
+    async def run() -> None:
+        assert await store.reserve("expiry") is True
+        assert client.expiry["idempotency:expiry"] == 10
+        await store.complete("expiry", {"id": 1})
+        assert client.expiry["idempotency:expiry"] == 600
+        client.data["other:key"] = "kept"
+        await check_reservation(store)
+
+    asyncio.run(run())
+    assert client.data == {"other:key": "kept"}
+
+
+def test_database_store(test_db: str) -> None:
+    """Test the reservation of the keys in the idempotency_keys table."""
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": test_db}):
+        asyncio.run(check_reservation(DatabaseIdempotencyStore()))
+        asyncio.run(dispose_async_engines())
+
+
+def test_database_store_expires_keys(test_db: str) -> None:
+    """Test that the expired keys of the idempotency_keys table can be reserved again."""
+    store = DatabaseIdempotencyStore(ttl=-1, pending_ttl=-1)
+
+    async def run() -> None:
+        assert await store.reserve("key") is True
+        assert await store.reserve("key") is True
+        await store.complete("key", {"id": 1})
+        assert await store.get("key") is None
+        assert await store.acquire("key") is None
+
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": test_db}):
+        asyncio.run(run())
+        asyncio.run(dispose_async_engines())
+
+
+def test_database_store_purge_survives_a_collision(test_db: str) -> None:
+    """Test that the expired keys are purged even when the reservation that triggered the purge collides."""
+    expired = DatabaseIdempotencyStore(pending_ttl=-1)
+    store = DatabaseIdempotencyStore()
+
+    async def keys() -> list[str]:
+        async with AsyncDatabase().connect().session() as session:
+            return list(await session.scalars(select(IdempotencyKey.key).order_by(IdempotencyKey.key)))
+
+    async def run() -> None:
+        assert await store.reserve("held") is True
+        for key in ("old-1", "old-2"):
+            assert await expired.reserve(key) is True
+        assert await keys() == ["held", "old-1", "old-2"]
+
+        # due again, as if the purge interval had elapsed
+        store._next_purge = 0.0  # noqa: SLF001
+        assert await store.reserve("held") is False
+        assert await keys() == ["held"]
+
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": test_db}):
+        asyncio.run(run())
+        asyncio.run(dispose_async_engines())
+
+
+def test_create_idempotency_store(monkeypatch: MonkeyPatch) -> None:
+    """Test that create_idempotency_store() reads its own settings, not those of the cache."""
+    monkeypatch.setenv("CACHE_BACKEND", "none")
+    monkeypatch.delenv("IDEMPOTENCY_BACKEND", raising=False)
+    assert isinstance(create_idempotency_store(), DatabaseIdempotencyStore)
+
+    monkeypatch.setenv("IDEMPOTENCY_BACKEND", "memory")
+    monkeypatch.setenv("IDEMPOTENCY_MAX_SIZE", "5")
+    monkeypatch.setenv("IDEMPOTENCY_TTL", "60")
+    monkeypatch.setenv("IDEMPOTENCY_PENDING_TTL", "7")
+    store = create_idempotency_store()
+    assert isinstance(store, MemoryIdempotencyStore)
+    assert (store.max_size, store.ttl, store.pending_ttl) == (5, 60, 7)
+
+    monkeypatch.setenv("IDEMPOTENCY_BACKEND", "none")
+    with pytest.raises(ValueError, match="Unknown idempotency backend"):
+        create_idempotency_store()
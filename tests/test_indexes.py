@@ -0,0 +1,46 @@
+"""This module contains tests for the indexes of the users table.
+
+The lookups by name and nickname are checked to use their index: no full scan, and no sort for the order by ID.
+Their timing on tables of growing size is measured by `benchmarks/indexes.py`.
+"""
+
+import tempfile
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Engine, text
+
+from benchmarks.indexes import seed
+from database.models import User
+from src.endpoints.v1.user import users_by_query
+
+# Number of rows of the table, enough for the plan not to depend on its size
+TABLE_ROWS = 1000
+
+
+@pytest.fixture(scope="module")
+def engine() -> Generator[Engine, None, None]:
+    """Fixture seeding a users table."""
+    path = Path(tempfile.mkdtemp()) / "test_indexes.db"
+    seeded = seed(path, TABLE_ROWS)
+    yield seeded
+    seeded.dispose()
+    path.unlink()
+
+
+def query_plan(engine: Engine, column_name: str) -> str:
+    """Return the SQLite query plan of the lookup by the given column."""
+    stmt = users_by_query(getattr(User, column_name), "name5", 0).order_by(User.id).limit(101)
+    sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as connection:
+        return " | ".join(row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+@pytest.mark.parametrize(("column_name", "index"), [("name", "ix_users_name"), ("nickname", "ix_users_nickname")])
+def test_lookup_uses_index(engine: Engine, column_name: str, index: str) -> None:
+    """Test that the lookup searches the index and needs no sort for the order by ID."""
+    plan = query_plan(engine, column_name)
+    assert index in plan
+    assert "SCAN" not in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,126 @@
+"""This module contains tests for the JSON logging pipeline and the request IDs."""
+
+import io
+import logging
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import orjson
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.middleware.request_context import access_logger
+from src.utils.log import SamplingFilter, queue_handler
+
+client = TestClient(app)
+
+
+def read_records(stream: io.StringIO) -> list[dict]:
+    """Return the JSON records written to the stream."""
+    return [orjson.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_queue_handler_writes_json_lines() -> None:
+    """Test that the records are formatted as JSON lines by the listener thread."""
+    stream = io.StringIO()
+    handler = queue_handler(stream, sample_rate=1)
+    logger = logging.getLogger("test_log.json")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        logger.info("hello %s", "world", extra={"user_id": 1})
+        try:
+            raise ValueError("boom")  # noqa: EM101, TRY301
+        except ValueError:
+            logger.exception("failed")
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+    first, second = read_records(stream)
+    assert first["message"] == "hello world"
+    assert first["level"] == "INFO"
+    assert first["logger"] == "test_log.json"
+    assert first["user_id"] == 1
+    assert first["request_id"] is None
+    assert second["level"] == "ERROR"
+    assert "ValueError: boom" in second["exception"]
+
+
+def test_sampling_filter() -> None:
+    """Test that a fraction of the info records and every warning are kept."""
+    sampling = SamplingFilter(rate=0.1)
+    info = logging.makeLogRecord({"levelno": logging.INFO})
+    warning = logging.makeLogRecord({"levelno": logging.WARNING})
+
+    kept = sum(sampling.filter(info) for _ in range(10000))
+    assert 500 < kept < 1500
+    assert all(sampling.filter(warning) for _ in range(100))
+    assert all(SamplingFilter(rate=1).filter(info) for _ in range(100))
+
+
+def test_request_id_and_access_log() -> None:
+    """Test that the records of a request carry its ID and latency, and its completion is logged."""
+    stream = io.StringIO()
+    handler = queue_handler(stream, sample_rate=1)
+    access_logger.addHandler(handler)
+    access_logger.setLevel(logging.INFO)
+    try:
+        response = client.get("/healthz", headers={"X-Request-ID": "request-1"})
+        generated = client.get("/healthz").headers["x-request-id"]
+    finally:
+        access_logger.removeHandler(handler)
+        access_logger.setLevel(logging.NOTSET)
+        handler.close()
+
+    assert response.headers["x-request-id"] == "request-1"
+    assert len(generated) == 32
+
+    first, second = read_records(stream)
+    assert first["request_id"] == "request-1"
+    assert first["message"] == "GET /healthz 200"
+    assert first["status"] == 200
+    assert first["latency_ms"] >= 0
+    assert second["request_id"] == generated
+
+
+def test_logging_does_not_block_on_slow_stream() -> None:
+    """Test that logging returns immediately even if the stream is slow, the listener thread writes it."""
+
+    class SlowStream(io.StringIO):
+        def write(self, s: str) -> int:
+            time.sleep(0.05)
+            return super().write(s)
+
+    stream = SlowStream()
+    handler = queue_handler(stream, sample_rate=1)
+    logger = logging.getLogger("test_log.slow")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        start = time.perf_counter()
+        for i in range(20):
+            logger.info("record %d", i)
+        assert time.perf_counter() - start < 0.5
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    assert len(read_records(stream)) == 20
+
+
+def test_log_config_json() -> None:
+    """Test that log_config_json.yaml writes JSON lines, including the records queued at exit."""
+    code = (
+        "import logging.config, yaml;"
+        "logging.config.dictConfig(yaml.safe_load(open('log_config_json.yaml')));"
+        "logging.getLogger('uvicorn.error').info('started');"
+        "logging.getLogger('uvicorn.access').info('hidden')"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=Path(__file__).parent.parent, capture_output=True, text=True, check=True
+    )
+    (record,) = [orjson.loads(line) for line in result.stderr.splitlines()]
+    assert record["message"] == "started"
+    assert record["logger"] == "uvicorn.error"
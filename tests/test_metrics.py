@@ -0,0 +1,130 @@
+"""This module contains tests for the metrics registry, middleware and endpoint."""
+
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.utils.database import Database
+from src.utils.metrics import Counter, Gauge, Histogram, Registry
+
+client = TestClient(app)
+# The label added to every sample of the application registry
+WORKER = f'worker="{os.getpid()}"'
+
+
+def test_registry_render() -> None:
+    """Test that the registry renders metrics in the Prometheus text format."""
+    registry = Registry()
+    counter = Counter("test_total", "A counter.", ["route"], registry=registry)
+    gauge = Gauge("test_gauge", "A gauge.", registry=registry)
+    histogram = Histogram("test_seconds", "A histogram.", buckets=[0.1, 1], registry=registry)
+
+    counter.labels('/a"b').inc()
+    counter.labels('/a"b').inc(2)
+    gauge.inc(3)
+    gauge.dec()
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    assert registry.render() == (
+        "# HELP test_total A counter.\n"
+        "# TYPE test_total counter\n"
+        'test_total{route="/a\\"b"} 3\n'
+        "# HELP test_gauge A gauge.\n"
+        "# TYPE test_gauge gauge\n"
+        "test_gauge 2\n"
+        "# HELP test_seconds A histogram.\n"
+        "# TYPE test_seconds histogram\n"
+        'test_seconds_bucket{le="0.1"} 1\n'
+        'test_seconds_bucket{le="1"} 2\n'
+        'test_seconds_bucket{le="+Inf"} 3\n'
+        "test_seconds_sum 5.55\n"
+        "test_seconds_count 3\n"
+    )
+
+
+def test_metric_function_and_set() -> None:
+    """Test that a metric can be read from a function or set directly."""
+    registry = Registry()
+    counter = Counter("test_total", "A counter.", registry=registry)
+    gauge = Gauge("test_gauge", "A gauge.", registry=registry)
+    counter.labels().set_function(lambda: 42)
+    gauge.set(1.5)
+    assert "test_total 42\n" in registry.render()
+    assert "test_gauge 1.5\n" in registry.render()
+
+
+def test_metric_wrong_labels() -> None:
+    """Test that using the wrong number of labels raises ValueError."""
+    counter = Counter("test_total", "A counter.", ["route"], registry=Registry())
+    with pytest.raises(ValueError, match="expects labels"):
+        counter.inc()
+
+
+def test_registry_worker_label() -> None:
+    """Test that the worker label is added to every sample, after the labels of the series."""
+    registry = Registry(worker_label="worker")
+    Counter("test_total", "A counter.", ["route"], registry=registry).labels("/a").inc()
+    Gauge("test_gauge", "A gauge.", registry=registry).set(2)
+    Histogram("test_seconds", "A histogram.", buckets=[1], registry=registry).observe(0.5)
+
+    with patch("src.utils.metrics.os.getpid", return_value=123):
+        text = registry.render()
+    assert 'test_total{route="/a",worker="123"} 1\n' in text
+    assert 'test_gauge{worker="123"} 2\n' in text
+    assert 'test_seconds_bucket{le="1",worker="123"} 1\n' in text
+    assert 'test_seconds_count{worker="123"} 1\n' in text
+
+
+def test_registry_duplicate_metric() -> None:
+    """Test that a metric name can only be registered once."""
+    registry = Registry()
+    Counter("test_total", "A counter.", registry=registry)
+    with pytest.raises(ValueError, match="Metric already registered"):
+        Counter("test_total", "A counter.", registry=registry)
+
+
+def test_metrics_endpoint_records_requests() -> None:
+    """Test that requests are recorded per route template and exposed on /metrics."""
+    client.get("/v1/")
+    client.get("/does-not-exist")
+    client.request("BREW", "/v1/")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert f'http_requests_total{{method="GET",route="/v1/",status="200",{WORKER}}}' in response.text
+    assert f'http_requests_total{{method="GET",route="<unmatched>",status="404",{WORKER}}}' in response.text
+    assert f'http_request_duration_seconds_count{{method="GET",route="/v1/",{WORKER}}}' in response.text
+    # unknown methods share one label
+    assert f'http_requests_total{{method="OTHER",route="/v1/",status="405",{WORKER}}}' in response.text
+    assert "BREW" not in response.text
+    assert f"http_requests_in_progress{{{WORKER}}} 1" in response.text
+
+
+def test_metrics_endpoint_records_database(test_db: str) -> None:
+    """Test that statement timings, pool checkouts and cache counters are exposed on /metrics."""
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": test_db}):
+        Database().connect()
+        user_data = {"name": "John", "fullname": "John Doe", "nickname": "johnny"}
+        user_id = client.post("/v1/users", json=user_data).json()["id"]
+        client.get(f"/v1/users/{user_id}")
+
+    text = client.get("/metrics").text
+    sync_pool = f"sqlite//{test_db[10:]}"
+    async_pool = f"sqlite+aiosqlite//{test_db[10:]}"
+    assert f'db_statement_duration_seconds_count{{pool="{async_pool}",operation="INSERT",{WORKER}}} 1' in text
+    assert f'db_statement_duration_seconds_count{{pool="{async_pool}",operation="SELECT",{WORKER}}}' in text
+    assert f'db_pool_checkout_wait_seconds_count{{pool="{async_pool}",{WORKER}}}' in text
+    assert f'db_pool_checked_out_connections{{pool="{async_pool}",{WORKER}}} 0' in text
+    assert f'db_pool_saturation{{pool="{sync_pool}",{WORKER}}} 0' in text
+    assert f'cache_misses_total{{cache="user",{WORKER}}}' in text
+
+
+def test_metrics_not_in_openapi() -> None:
+    """Test that /metrics is not part of the OpenAPI schema."""
+    assert "/metrics" not in client.get("/openapi.json").json()["paths"]
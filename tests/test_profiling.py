@@ -0,0 +1,138 @@
+"""This module contains tests for the profiling endpoints and middleware."""
+
+import threading
+from collections.abc import Iterator
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.endpoints.admin import include_admin
+from src.middleware.profiling import ProfilingMiddleware
+from src.utils.profiling import SamplingProfiler, memory_profiler, profiling_enabled, request_profiles
+
+ADMIN_TOKEN = "secret"  # noqa: S105
+AUTHORIZATION = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+
+@pytest.fixture
+def client() -> Iterator[TestClient]:
+    """Create an application with profiling enabled."""
+    with patch.dict("os.environ", {"PROFILING_ENABLED": "true", "ADMIN_TOKEN": ADMIN_TOKEN}):
+        app = FastAPI()
+
+        @app.get("/hello")
+        async def hello() -> dict[str, str]:
+            return {"hello": "world"}
+
+        include_admin(app)
+        app.add_middleware(ProfilingMiddleware)
+        yield TestClient(app)
+
+
+def test_profiling_disabled() -> None:
+    """Test that the admin routes are not registered unless enabled with a token."""
+    for env in ({"PROFILING_ENABLED": "false", "ADMIN_TOKEN": ADMIN_TOKEN}, {"PROFILING_ENABLED": "true"}):
+        with patch.dict("os.environ", env, clear=True):
+            assert not profiling_enabled()
+            app = FastAPI()
+            include_admin(app)
+            assert TestClient(app).get("/admin/profile/requests", headers=AUTHORIZATION).status_code == 404
+
+
+def test_admin_token_required(client: TestClient) -> None:
+    """Test that the admin routes require the token, and are not in the OpenAPI schema."""
+    assert client.get("/admin/profile/requests").status_code == 401
+    response = client.get("/admin/profile/requests", headers={"Authorization": "Bearer wrong"})
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+    assert client.get("/admin/profile/requests", headers=AUTHORIZATION).status_code == 200
+    assert not any(path.startswith("/admin") for path in client.app.openapi()["paths"])  # type: ignore[attr-defined]
+
+
+def test_profile_cpu(client: TestClient) -> None:
+    """Test that the CPU profile returns the sampled stacks in the collapsed format."""
+    response = client.get("/admin/profile/cpu", params={"seconds": 0.05, "interval_ms": 1}, headers=AUTHORIZATION)
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].endswith('.collapsed"')
+    lines = response.text.splitlines()
+    assert lines
+    for line in lines:
+        stack, _, count = line.rpartition(" ")
+        assert ";" in stack
+        assert int(count) > 0
+
+    response = client.get("/admin/profile/cpu", params={"seconds": 3600}, headers=AUTHORIZATION)
+    assert response.status_code == 400
+
+
+def test_profile_cpu_busy(client: TestClient) -> None:
+    """Test that only one CPU profile runs at a time."""
+    with SamplingProfiler.lock:
+        response = client.get("/admin/profile/cpu", params={"seconds": 0.01}, headers=AUTHORIZATION)
+    assert response.status_code == 409
+
+
+def test_sampling_profiler() -> None:
+    """Test that the profiler samples the stacks of the other threads."""
+    stop = threading.Event()
+
+    def busy_function() -> None:
+        while not stop.is_set():
+            sum(range(100))
+
+    thread = threading.Thread(target=busy_function, name="busy")
+    thread.start()
+    try:
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.run(0.05)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert profiler.samples > 0
+    assert any(stack.startswith("busy;") and "busy_function (test_profiling.py:" in stack for stack in profiler.stacks)
+
+
+def test_profile_memory(client: TestClient) -> None:
+    """Test that the memory profile reports the top allocation sites and their growth between snapshots."""
+    memory_profiler.stop()
+    assert client.get("/admin/profile/memory", headers=AUTHORIZATION).status_code == 409
+
+    assert client.post("/admin/profile/memory/start", headers=AUTHORIZATION).json() == {"tracing": True}
+    try:
+        first = client.get("/admin/profile/memory", headers=AUTHORIZATION).json()
+        assert first["diff"] is None
+        retained = [bytearray(1000) for _ in range(100)]
+        second = client.get("/admin/profile/memory", params={"limit": 5}, headers=AUTHORIZATION).json()
+        assert len(second["top"]) <= 5
+        assert second["traced"] > 0
+        assert any("test_profiling.py:" in site["location"] and site["size_diff"] >= 100000 for site in second["diff"])
+        del retained
+    finally:
+        assert client.post("/admin/profile/memory/stop", headers=AUTHORIZATION).json() == {"tracing": False}
+
+
+def test_request_profile(client: TestClient) -> None:
+    """Test that requests with the X-Profile header are profiled, and their report served."""
+    assert "x-profile-id" not in client.get("/hello").headers
+    assert "x-profile-id" not in client.get("/hello", headers={"X-Profile": "wrong"}).headers
+
+    response = client.get("/hello", headers={"X-Profile": ADMIN_TOKEN})
+    assert response.json() == {"hello": "world"}
+    profile_id = response.headers["x-profile-id"]
+
+    profiles = client.get("/admin/profile/requests", headers=AUTHORIZATION).json()
+    assert profiles[0]["id"] == profile_id
+    assert profiles[0]["path"] == "/hello"
+    assert profiles[0]["status"] == 200
+
+    report = client.get(f"/admin/profile/requests/{profile_id}", headers=AUTHORIZATION)
+    assert report.status_code == 200
+    assert "function calls" in report.text
+
+    # only the most recent profiles are kept
+    for _ in range(request_profiles.max_size):
+        client.get("/hello", headers={"X-Profile": ADMIN_TOKEN})
+    assert client.get(f"/admin/profile/requests/{profile_id}", headers=AUTHORIZATION).status_code == 404
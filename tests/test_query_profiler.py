@@ -0,0 +1,144 @@
+"""This module contains tests for the query profiler."""
+
+import asyncio
+import logging
+
+import pytest
+from _pytest.logging import LogCaptureFixture
+from _pytest.monkeypatch import MonkeyPatch
+from sqlalchemy import text
+
+from src.utils.async_database import AsyncDatabase, dispose_async_engines
+from src.utils.database import Database
+from src.utils.query_profiler import QueryProfiler, assert_max_queries, profile_queries, statement_shape
+
+
+def test_statement_shape() -> None:
+    """Test that statements differing only by their parameters have the same shape."""
+    assert statement_shape("SELECT *\n  FROM users WHERE id IN (?, ?, ?)") == "SELECT * FROM users WHERE id IN (?)"
+    assert statement_shape("SELECT * FROM users WHERE id IN (%s)") == "SELECT * FROM users WHERE id IN (?)"
+    assert statement_shape("INSERT INTO users (name) VALUES (:name)") == "INSERT INTO users (name) VALUES (?)"
+
+
+def test_profile_queries_counts_statements() -> None:
+    """Test that profile_queries() records the statements of the current context only."""
+    db = Database(sqlite_path="sqlite:///:memory:").connect()
+    with db.session() as session:
+        session.execute(text("SELECT 1"))
+
+    with profile_queries() as profiler, db.session() as session:
+        session.execute(text("SELECT 1"))
+        session.execute(text("SELECT 2"))
+
+    assert profiler.count == 2
+    assert [query.statement for query in profiler.queries] == ["SELECT 1", "SELECT 2"]
+
+
+def test_slow_query_logged_with_call_site(caplog: LogCaptureFixture) -> None:
+    """Test that slow statements are logged with the SQL and the call site."""
+    db = Database(sqlite_path="sqlite:///:memory:").connect()
+    with (
+        caplog.at_level(logging.WARNING),
+        profile_queries(QueryProfiler(slow_threshold=0)),
+        db.session() as session,
+    ):
+        session.execute(text("SELECT :value"), {"value": 42})
+
+    assert "Slow query" in caplog.text
+    assert "SELECT ?" in caplog.text
+    assert "42" not in caplog.text
+    assert f"{__file__}:" in caplog.text
+
+    caplog.clear()
+    with (
+        caplog.at_level(logging.WARNING),
+        profile_queries(QueryProfiler(slow_threshold=0, log_parameters=True)),
+        db.session() as session,
+    ):
+        session.execute(text("SELECT :value"), {"value": 42})
+    assert "parameters=(42,)" in caplog.text
+
+
+def test_repeated_statements_reported(caplog: LogCaptureFixture) -> None:
+    """Test that statements of the same shape repeated in a session are reported as N+1."""
+    db = Database(sqlite_path="sqlite:///:memory:").connect()
+    with (
+        caplog.at_level(logging.WARNING),
+        profile_queries(QueryProfiler(repeat_threshold=3)) as profiler,
+        db.session() as session,
+    ):
+        for value in range(3):
+            session.execute(text("SELECT :value"), {"value": value})
+        session.execute(text("SELECT 1"))
+
+    assert profiler.repeated() == {"SELECT ?": 3}
+    assert "Statement executed 3 times in one session (possible N+1)" in caplog.text
+    assert f"{__file__}:" in caplog.text
+
+
+def test_repeat_threshold_validated(monkeypatch: MonkeyPatch) -> None:
+    """Test that a repeated query threshold below 2 is rejected, as every statement would be reported."""
+    for threshold in ("0", "1"):
+        monkeypatch.setenv("DB_REPEATED_QUERY_THRESHOLD", threshold)
+        with pytest.raises(ValueError, match="at least 2"):
+            QueryProfiler.from_env()
+
+
+def test_database_session_profiled_from_env(monkeypatch: MonkeyPatch, caplog: LogCaptureFixture) -> None:
+    """Test that Database.session() profiles its statements when DB_PROFILE is set."""
+    monkeypatch.setenv("DB_PROFILE", "true")
+    monkeypatch.setenv("DB_REPEATED_QUERY_THRESHOLD", "2")
+    db = Database(sqlite_path="sqlite:///:memory:").connect()
+    assert db.profile_enabled is True
+
+    with caplog.at_level(logging.WARNING), db.session() as session:
+        session.execute(text("SELECT 1"))
+        session.execute(text("SELECT 1"))
+
+    assert "Statement executed 2 times in one session (possible N+1)" in caplog.text
+
+
+def test_async_database_session_profiled_from_env(monkeypatch: MonkeyPatch, caplog: LogCaptureFixture) -> None:
+    """Test that AsyncDatabase.session() profiles its statements and finds their call site."""
+    monkeypatch.setenv("DB_PROFILE", "true")
+    monkeypatch.setenv("DB_SLOW_QUERY_MS", "0")
+
+    async def run() -> None:
+        db = AsyncDatabase(sqlite_path="sqlite:///:memory:").connect()
+        async with db.session() as session:
+            await session.execute(text("SELECT 1"))
+        await dispose_async_engines()
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(run())
+
+    assert "Slow query" in caplog.text
+    assert f"{__file__}:" in caplog.text
+    assert "in run" in caplog.text
+
+
+def test_assert_max_queries() -> None:
+    """Test that assert_max_queries() fails when too many statements are executed."""
+    db = Database(sqlite_path="sqlite:///:memory:").connect()
+    with assert_max_queries(1), db.session() as session:
+        session.execute(text("SELECT 1"))
+
+    with (  # noqa: PT012
+        pytest.raises(AssertionError, match="2 statements executed, expected at most 1"),
+        assert_max_queries(1),
+        db.session() as session,
+    ):
+        session.execute(text("SELECT 1"))
+        session.execute(text("SELECT 2"))
+
+
+def test_nested_profilers() -> None:
+    """Test that statements are recorded by every enclosing profiler."""
+    db = Database(sqlite_path="sqlite:///:memory:").connect()
+    with profile_queries() as outer, db.session() as session:
+        session.execute(text("SELECT 1"))
+        with profile_queries() as inner:
+            session.execute(text("SELECT 2"))
+
+    assert outer.count == 2
+    assert inner.count == 1
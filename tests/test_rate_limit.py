@@ -0,0 +1,259 @@
+"""This module contains tests for the rate limiting and load shedding middleware."""
+
+import asyncio
+import time
+from collections.abc import Mapping
+from unittest.mock import patch
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from src.middleware.load_shedding import LoadSheddingMiddleware
+from src.middleware.rate_limit import RateLimitMiddleware
+from src.utils.metrics import DecayingAverage
+from src.utils.rate_limit import (
+    MemoryTokenBuckets,
+    Rate,
+    RedisTokenBuckets,
+    create_token_buckets,
+    parse_rate,
+    parse_route_rates,
+)
+
+
+def test_parse_rate() -> None:
+    """Test that rates are parsed into tokens per second with a burst of the number of requests."""
+    assert parse_rate("10/second") == Rate(per_second=10, burst=10)
+    assert parse_rate(" 120/Minute ") == Rate(per_second=2, burst=120)
+    for invalid in ("10", "ten/second", "10/day", "0/second"):
+        with pytest.raises(ValueError, match="Invalid rate"):
+            parse_rate(invalid)
+
+
+def test_parse_route_rates() -> None:
+    """Test that route rates are keyed by method and route template."""
+    assert parse_route_rates("post /v1/users=10/second, GET /v1/users/{user_id}=60/minute,") == {
+        "POST /v1/users": Rate(per_second=10, burst=10),
+        "GET /v1/users/{user_id}": Rate(per_second=1, burst=60),
+    }
+    assert parse_route_rates("") == {}
+    with pytest.raises(ValueError, match="Invalid route rate"):
+        parse_route_rates("/v1/users=10/second")
+
+
+def test_memory_token_buckets() -> None:
+    """Test that a bucket allows its burst, then refills at its rate, and that old buckets are dropped."""
+    buckets = MemoryTokenBuckets(max_keys=2)
+    rate = Rate(per_second=10, burst=2)
+
+    async def main() -> None:
+        assert await buckets.take("a", rate) == 0
+        assert await buckets.take("a", rate) == 0
+        assert 0 < await buckets.take("a", rate) <= 0.1
+        await asyncio.sleep(0.11)
+        assert await buckets.take("a", rate) == 0
+
+        await buckets.take("b", rate)
+        await buckets.take("c", rate)
+        assert list(buckets._buckets) == ["b", "c"]  # noqa: SLF001
+
+    asyncio.run(main())
+
+
+class _FakeRedis:
+    """A Redis client answering the token bucket script with a fixed wait."""
+
+    def __init__(self, wait: bytes) -> None:
+        self.wait = wait
+        self.calls: list[tuple[str, ...]] = []
+
+    async def eval(self, _script: str, _numkeys: int, *keys_and_args: str) -> bytes:
+        self.calls.append(keys_and_args)
+        return self.wait
+
+
+def test_redis_token_buckets() -> None:
+    """Test that the Redis buckets run the script on the prefixed key with the rate."""
+    client = _FakeRedis(b"0.25")
+    buckets = RedisTokenBuckets(client, prefix="test")
+    assert asyncio.run(buckets.take("client", Rate(per_second=4, burst=8))) == 0.25
+    assert client.calls == [("test:client", "4", "8")]
+
+    client.calls.clear()
+    buckets_rates = {"client:GET /items": Rate(per_second=1, burst=2), "client": Rate(per_second=4, burst=8)}
+    asyncio.run(buckets.take_all(buckets_rates))
+    assert client.calls == [("test:client:GET /items", "test:client", "1", "2", "4", "8")]
+
+
+def test_create_token_buckets() -> None:
+    """Test that the backend is chosen by RATE_LIMIT_BACKEND."""
+    with patch.dict("os.environ", {"RATE_LIMIT_BACKEND": "memory", "RATE_LIMIT_MAX_KEYS": "10"}):
+        buckets = create_token_buckets()
+    assert isinstance(buckets, MemoryTokenBuckets)
+    assert buckets.max_keys == 10
+    with patch.dict("os.environ", {"RATE_LIMIT_BACKEND": "unknown"}), pytest.raises(ValueError, match="Unknown"):
+        create_token_buckets()
+
+
+def _routes() -> list[Route]:
+    """Create the routes of the test applications."""
+
+    async def item(_: Request) -> Response:
+        return PlainTextResponse("item")
+
+    async def healthz(_: Request) -> Response:
+        return PlainTextResponse("ok")
+
+    return [Route("/items/{item_id}", item, methods=["GET", "POST"]), Route("/healthz", healthz)]
+
+
+def _rate_limited_app(
+    default: Rate | None = None, routes: dict[str, Rate] | None = None, key_header: str | None = None
+) -> Starlette:
+    """Create an application behind the rate limit middleware."""
+    app = Starlette(routes=_routes())
+    app.add_middleware(
+        RateLimitMiddleware,
+        router=app.router,
+        default=default,
+        routes=routes or {},
+        buckets=MemoryTokenBuckets(),
+        key_header=key_header or "",
+    )
+    return app
+
+
+def test_rate_limit_default() -> None:
+    """Test that each client is limited to the default rate, and answered 429 with Retry-After beyond it."""
+    client = TestClient(_rate_limited_app(default=Rate(per_second=0.5, burst=2), key_header="x-api-key"))
+    assert [client.get("/items/1", headers={"x-api-key": "a"}).status_code for _ in range(3)] == [200, 200, 429]
+
+    response = client.get("/items/2", headers={"x-api-key": "a"})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2"
+    assert response.json() == {"detail": "Too many requests"}
+
+    # another client has its own bucket, and the probes are never limited
+    assert client.get("/items/1", headers={"x-api-key": "b"}).status_code == 200
+    assert all(client.get("/healthz", headers={"x-api-key": "a"}).status_code == 200 for _ in range(5))
+
+
+def test_rate_limit_routes() -> None:
+    """Test that route limits apply per method and route template, on top of the default."""
+    client = TestClient(_rate_limited_app(routes={"POST /items/{item_id}": Rate(per_second=0.1, burst=1)}))
+    assert client.post("/items/1").status_code == 200
+    assert client.post("/items/2").status_code == 429
+    assert all(client.get("/items/1").status_code == 200 for _ in range(5))
+
+
+def test_rate_limit_route_rejection_does_not_spend_default() -> None:
+    """Test that a request rejected by one bucket does not take a token from the other."""
+    buckets = MemoryTokenBuckets()
+    route_rate, default_rate = Rate(per_second=0.01, burst=1), Rate(per_second=0.01, burst=3)
+
+    async def main() -> None:
+        assert await buckets.take_all({"a:route": route_rate, "a": default_rate}) == 0
+        # the route bucket is empty, the client bucket keeps its 2 tokens
+        for _ in range(5):
+            assert await buckets.take_all({"a:route": route_rate, "a": default_rate}) > 0
+        assert await buckets.take("a", default_rate) == 0
+        assert await buckets.take("a", default_rate) == 0
+        assert await buckets.take("a", default_rate) > 0
+        # and the other way around
+        assert await buckets.take_all({"a:other": route_rate, "a": default_rate}) > 0
+        assert buckets._buckets["a:other"][0] == 1  # noqa: SLF001
+
+    asyncio.run(main())
+
+    client = TestClient(
+        _rate_limited_app(
+            default=Rate(per_second=0.01, burst=2), routes={"POST /items/{item_id}": Rate(per_second=0.01, burst=1)}
+        )
+    )
+    assert [client.post("/items/1").status_code for _ in range(3)] == [200, 429, 429]
+    assert client.get("/items/1").status_code == 200
+
+
+def test_rate_limit_disabled() -> None:
+    """Test that without limits, no backend is created and requests are passed through."""
+    with patch.dict("os.environ", {"RATE_LIMIT": "", "RATE_LIMIT_ROUTES": "", "RATE_LIMIT_BACKEND": "unknown"}):
+        app = Starlette(routes=_routes(), middleware=[Middleware(RateLimitMiddleware)])
+        client = TestClient(app)
+        assert all(client.get("/items/1").status_code == 200 for _ in range(5))
+
+
+def test_rate_limit_fails_open() -> None:
+    """Test that requests are let through when the backend fails."""
+
+    class _Failing(MemoryTokenBuckets):
+        async def take_all(self, buckets: Mapping[str, Rate]) -> float:
+            raise ConnectionError(buckets)
+
+    app = Starlette(routes=_routes())
+    app.add_middleware(RateLimitMiddleware, default=Rate(per_second=1, burst=1), buckets=_Failing())
+    client = TestClient(app)
+    assert [client.get("/items/1").status_code for _ in range(3)] == [200, 200, 200]
+
+
+def test_load_shedding_in_flight() -> None:
+    """Test that requests beyond the maximum in flight are answered 503 with Retry-After."""
+    release = asyncio.Event()
+
+    async def slow(_: Request) -> Response:
+        await release.wait()
+        return PlainTextResponse("slow")
+
+    app = Starlette(
+        routes=[Route("/slow", slow), *_routes()],
+        middleware=[Middleware(LoadSheddingMiddleware, max_in_flight=1, max_pool_wait=0, retry_after=3)],
+    )
+
+    async def main() -> None:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            slow_request = asyncio.create_task(client.get("/slow"))
+            await asyncio.sleep(0.05)
+
+            response = await client.get("/items/1")
+            assert response.status_code == 503
+            assert response.headers["retry-after"] == "3"
+            assert (await client.get("/healthz")).status_code == 200
+
+            release.set()
+            assert (await slow_request).status_code == 200
+            assert (await client.get("/items/1")).status_code == 200
+
+    asyncio.run(main())
+
+
+def test_load_shedding_pool_wait() -> None:
+    """Test that requests are shed while the recent pool checkout wait is above the threshold."""
+    recent_wait = DecayingAverage(half_life=0.05, weight=1)
+    app = Starlette(
+        routes=_routes(), middleware=[Middleware(LoadSheddingMiddleware, max_in_flight=0, max_pool_wait=0.1)]
+    )
+    client = TestClient(app)
+    with patch("src.middleware.load_shedding.DB_POOL_RECENT_WAIT", recent_wait):
+        assert client.get("/items/1").status_code == 200
+        recent_wait.observe(1.0)
+        assert client.get("/items/1").status_code == 503
+        # the wait decays once connections are no longer waited for
+        time.sleep(0.3)
+        assert client.get("/items/1").status_code == 200
+
+
+def test_decaying_average() -> None:
+    """Test that the average moves towards the observations and halves every half-life."""
+    average = DecayingAverage(half_life=60, weight=0.5)
+    average.observe(1.0)
+    assert average.get() == pytest.approx(0.5, rel=1e-3)
+    average.observe(1.0)
+    assert average.get() == pytest.approx(0.75, rel=1e-3)
+    with patch("src.utils.metrics.time.monotonic", return_value=time.monotonic() + 60):
+        assert average.get() == pytest.approx(0.375, rel=1e-3)
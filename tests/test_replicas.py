@@ -0,0 +1,170 @@
+"""This module contains tests for the read replica routing, with SQLite files standing in for the replicas."""
+
+import asyncio
+import tempfile
+import time
+from collections.abc import Generator
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.models import Base, User
+from src.app import app
+from src.endpoints.v1.user import user_cache
+from src.middleware.read_your_writes import parse_last_write
+from src.utils.async_database import AsyncDatabase, dispose_async_engines
+from src.utils.database import Database, dispose_engines
+from src.utils.replicas import ReadYourWrites, ReplicaSet, clear_replica_sets, read_your_writes
+
+UNREACHABLE = "sqlite:////nonexistent-directory/replica.db"
+
+
+@pytest.fixture
+def databases() -> Generator[dict[str, str], None, None]:
+    """Fixture for a primary and two replicas, each holding one user named after the database."""
+    directory = Path(tempfile.mkdtemp())
+    paths = {name: f"sqlite:///{directory / name}.db" for name in ("primary", "replica1", "replica2")}
+    for name, path in paths.items():
+        engine = create_engine(path)
+        Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(insert(User.__table__).values(name=name, fullname=name, nickname=name))
+        engine.dispose()
+
+    yield paths
+
+    clear_replica_sets()
+    asyncio.run(user_cache.clear())
+    asyncio.run(dispose_async_engines())
+    dispose_engines()
+    for path in paths.values():
+        Path(path[10:]).unlink()
+
+
+def environ(databases: dict[str, str], replicas: list[str] | None = None) -> dict[str, str]:
+    """Return the environment using the primary and the replicas (both test replicas by default)."""
+    replicas = replicas if replicas is not None else [databases["replica1"], databases["replica2"]]
+    return {"PYTEST": "true", "PYTEST_DB": databases["primary"], "PYTEST_REPLICA_DBS": ",".join(replicas)}
+
+
+def read_name(db: Database, *, read_only: bool) -> str:
+    """Return the name of the first user, i.e. the database that served the session."""
+    with db.session(read_only=read_only) as session:
+        return str(session.execute(select(User.name).order_by(User.id)).scalars().first())
+
+
+def test_round_robin() -> None:
+    """Test that the replicas are chosen in turn, skipping those out of rotation."""
+    replicas = ReplicaSet(["sqlite:///a.db", "sqlite:///b.db"], strategy="round_robin", retry_interval=60)
+    assert [replicas.choose() for _ in range(4)] == ["sqlite:///a.db", "sqlite:///b.db"] * 2
+
+    replicas.mark_down("sqlite:///a.db")
+    assert {replicas.choose() for _ in range(4)} == {"sqlite:///b.db"}
+    replicas.mark_down("sqlite:///b.db")
+    assert replicas.choose() is None
+    replicas.mark_up("sqlite:///a.db")
+    assert replicas.choose() == "sqlite:///a.db"
+
+
+def test_failed_replica_returns_after_retry_interval() -> None:
+    """Test that a replica taken out of rotation is tried again after the retry interval."""
+    replicas = ReplicaSet(["sqlite:///a.db"], retry_interval=0.05)
+    replicas.mark_down("sqlite:///a.db")
+    assert replicas.choose() is None
+    time.sleep(0.06)
+    assert replicas.choose() == "sqlite:///a.db"
+
+
+def test_least_connections() -> None:
+    """Test that the replica with the fewest sessions in flight is chosen."""
+    replicas = ReplicaSet(["sqlite:///a.db", "sqlite:///b.db"], strategy="least_connections")
+    with replicas.track("sqlite:///a.db"):
+        assert replicas.choose() == "sqlite:///b.db"
+        with replicas.track("sqlite:///b.db"), replicas.track("sqlite:///b.db"):
+            assert replicas.choose() == "sqlite:///a.db"
+
+
+def test_unknown_strategy() -> None:
+    """Test that an unknown strategy is refused."""
+    with pytest.raises(ValueError, match="Unknown replica strategy"):
+        ReplicaSet(["sqlite:///a.db"], strategy="random")
+
+
+def test_recent_write_uses_primary() -> None:
+    """Test that the reads of a client that just wrote use the primary."""
+    replicas = ReplicaSet(["sqlite:///a.db"])
+    token = read_your_writes.set(ReadYourWrites(last_write=time.time()))
+    try:
+        assert replicas.choose() is None
+    finally:
+        read_your_writes.reset(token)
+    assert replicas.choose() == "sqlite:///a.db"
+
+
+def test_database_read_only_sessions(databases: dict[str, str]) -> None:
+    """Test that read-only sessions go to the replicas in turn and the other sessions to the primary."""
+    with patch.dict("os.environ", environ(databases)):
+        db = Database().connect()
+        assert [read_name(db, read_only=True) for _ in range(4)] == ["replica1", "replica2"] * 2
+        assert read_name(db, read_only=False) == "primary"
+
+        # without replicas, read-only sessions use the primary
+        assert read_name(Database(replica_paths=[]).connect(), read_only=True) == "primary"
+
+
+def test_unreachable_replica_is_taken_out_of_rotation(databases: dict[str, str]) -> None:
+    """Test that a replica that fails a session is no longer chosen."""
+    with patch.dict("os.environ", environ(databases, [UNREACHABLE, databases["replica1"]])):
+        db = Database().connect()
+        assert db.replicas is not None
+        with pytest.raises(SQLAlchemyError):
+            read_name(db, read_only=True)
+        assert db.replicas.healthy() == [databases["replica1"]]
+        assert {read_name(db, read_only=True) for _ in range(3)} == {"replica1"}
+
+
+def test_check_replicas(databases: dict[str, str]) -> None:
+    """Test that the health check takes the unreachable replicas out of rotation and puts the others back."""
+    with patch.dict("os.environ", environ(databases, [UNREACHABLE, databases["replica2"]])):
+        db = AsyncDatabase().connect()
+        assert db.replicas is not None
+        db.replicas.mark_down(databases["replica2"])
+
+        assert asyncio.run(db.check_replicas(check_timeout=1)) == {UNREACHABLE: False, databases["replica2"]: True}
+        assert db.replicas.healthy() == [databases["replica2"]]
+        asyncio.run(dispose_async_engines())
+
+
+def test_read_your_writes(databases: dict[str, str]) -> None:
+    """Test that the list endpoint reads from a replica, and from the primary right after a write of the client."""
+    client = TestClient(app)
+    with patch.dict("os.environ", environ(databases, [databases["replica1"]])):
+        names = [user["name"] for user in client.get("/v1/users").json()["users"]]
+        assert names == ["replica1"]
+
+        response = client.post("/v1/users", json={"name": "new", "fullname": "New Doe", "nickname": "new"})
+        assert response.status_code == 200
+        assert "last_write=" in response.headers["set-cookie"]
+
+        # the client sends the cookie back, its reads stay on the primary
+        names = [user["name"] for user in client.get("/v1/users").json()["users"]]
+        assert names == ["primary", "new"]
+
+        # another client reads from the replica
+        names = [user["name"] for user in TestClient(app).get("/v1/users").json()["users"]]
+        assert names == ["replica1"]
+
+
+def test_parse_last_write() -> None:
+    """Test that the last_write cookie is ignored unless finite, and capped in the future."""
+    assert parse_last_write(b"last_write=1700000000.5") == 1700000000.5
+    assert parse_last_write(b"other=1") is None
+    assert parse_last_write(b"last_write=soon") is None
+    for value in (b"inf", b"-inf", b"nan", b"1e400"):
+        assert parse_last_write(b"last_write=" + value) is None
+    with patch.dict("os.environ", {"DB_REPLICA_STICKY_SECONDS": "2"}):
+        assert parse_last_write(b"last_write=1e300") <= time.time() + 2  # type: ignore[operator]
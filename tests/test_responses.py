@@ -0,0 +1,54 @@
+"""This module contains tests for the response classes."""
+
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.scheme.user import UserListResponse, UserResponse
+from src.utils.responses import ORJSONResponse, PrecomputedResponse, etag_matches
+
+
+def test_orjson_response_renders_models() -> None:
+    """Test that ORJSONResponse serializes nested Pydantic models."""
+    user = UserResponse(id=1, name="John", fullname="John Doe", nickname="johnny")
+    response = ORJSONResponse(UserListResponse(users=[user], missing=[2]))
+    assert response.body == (
+        b'{"users":[{"id":1,"name":"John","fullname":"John Doe","nickname":"johnny","version":1}],'
+        b'"missing":[2],"next_cursor":null}'
+    )
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_orjson_response_unsupported_type() -> None:
+    """Test that ORJSONResponse raises for objects it cannot serialize."""
+    with pytest.raises(TypeError):
+        ORJSONResponse(object())
+
+
+def test_response_models_documented() -> None:
+    """Test that endpoints returning ORJSONResponse still document their response model."""
+    client = TestClient(app)
+    paths = client.get("/openapi.json").json()["paths"]
+    schema = paths["/v1/users/{user_id}"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert schema == {"$ref": "#/components/schemas/UserResponse"}
+
+
+def test_etag_matches() -> None:
+    """Test the weak comparison of If-None-Match with the current ETags."""
+    assert etag_matches('"a"', ['"a"'])
+    assert etag_matches('W/"a"', ['"a"'])
+    assert etag_matches('"b", W/"a"', ['W/"a"'])
+    assert etag_matches("*", ['"a"'])
+    assert not etag_matches('"b"', ['"a"'])
+
+
+def test_precomputed_response() -> None:
+    """Test that a precomputed document is served from its encoded variants."""
+    document = PrecomputedResponse.build(b"x" * 1000, "text/plain")
+    assert document.variants["identity"] == b"x" * 1000
+    assert gzip.decompress(document.variants["gzip"]) == b"x" * 1000
+    # compressed once, so with the maximum level rather than the one of per-request bodies
+    assert document.variants["gzip"] == gzip.compress(b"x" * 1000, compresslevel=9, mtime=0)
+    assert document.etags["gzip"] != document.etags["identity"]
@@ -0,0 +1,101 @@
+"""This module contains tests for the production server entry point."""
+
+import os
+from typing import Any
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from src import server
+
+
+def test_server_options_defaults(monkeypatch: MonkeyPatch) -> None:
+    """Test the default server options."""
+    for name in ("HOST", "PORT", "WEB_CONCURRENCY", "BACKLOG", "KEEP_ALIVE_TIMEOUT", "LIMIT_CONCURRENCY", "LOG_CONFIG"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(server, "cpu_count", lambda: 3)
+
+    options = server.server_options()
+    assert options["host"] == "0.0.0.0"  # noqa: S104
+    assert options["port"] == 5000
+    assert options["workers"] == 3
+    assert options["backlog"] == 2048
+    assert options["timeout_keep_alive"] == 75
+    assert options["limit_concurrency"] is None
+    assert options["log_config"] == "log_config.yaml"
+    assert options["lifespan"] == "on"
+    assert "reload" not in options
+
+
+def test_server_options_from_env(monkeypatch: MonkeyPatch) -> None:
+    """Test that the server options are read from the environment."""
+    monkeypatch.setenv("PORT", "8000")
+    monkeypatch.setenv("WEB_CONCURRENCY", "8")
+    monkeypatch.setenv("BACKLOG", "4096")
+    monkeypatch.setenv("LIMIT_CONCURRENCY", "500")
+    monkeypatch.setenv("ACCESS_LOG", "false")
+
+    options = server.server_options()
+    assert options["port"] == 8000
+    assert options["workers"] == 8
+    assert options["backlog"] == 4096
+    assert options["limit_concurrency"] == 500
+    assert options["access_log"] is False
+
+
+def test_server_options_event_loop(monkeypatch: MonkeyPatch) -> None:
+    """Test that uvloop and httptools are used only when installed."""
+    monkeypatch.setattr(server, "find_spec", lambda name: object() if name == "uvloop" else None)
+    options = server.server_options()
+    assert options["loop"] == "uvloop"
+    assert options["http"] == "h11"
+
+
+def test_cpu_count() -> None:
+    """Test that at least one CPU is reported."""
+    assert server.cpu_count() >= 1
+
+
+def test_main(monkeypatch: MonkeyPatch) -> None:
+    """Test that main() starts uvicorn with the application import string."""
+    uvicorn = pytest.importorskip("uvicorn")
+    calls: list[tuple[str, dict[str, Any]]] = []
+    monkeypatch.setattr(uvicorn, "run", lambda app, **kwargs: calls.append((app, kwargs)))
+    monkeypatch.setenv("CACHE_BACKEND", "none")
+
+    server.main()
+    assert calls == [("src:app", server.server_options())]
+
+
+def test_main_rejects_memory_idempotency_with_several_workers(monkeypatch: MonkeyPatch) -> None:
+    """Test that main() refuses to run several workers that would each keep their own Idempotency-Keys."""
+    uvicorn = pytest.importorskip("uvicorn")
+    monkeypatch.setattr(uvicorn, "run", lambda *_, **__: pytest.fail("the server started"))
+    monkeypatch.setenv("IDEMPOTENCY_BACKEND", "memory")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+
+    with pytest.raises(SystemExit, match="IDEMPOTENCY_BACKEND=memory"):
+        server.main()
+
+
+def test_main_cache_backend_with_several_workers(monkeypatch: MonkeyPatch) -> None:
+    """Test that several workers run without cache by default, and refuse a cache per worker."""
+    uvicorn = pytest.importorskip("uvicorn")
+    calls: list[str] = []
+    monkeypatch.setattr(uvicorn, "run", lambda app, **_: calls.append(app))
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    # set then deleted, so that the value set by main() is removed after the test
+    monkeypatch.setenv("CACHE_BACKEND", "memory")
+    monkeypatch.delenv("CACHE_BACKEND")
+
+    server.main()
+    assert calls == ["src:app"]
+    assert os.environ["CACHE_BACKEND"] == "none"
+
+    monkeypatch.setenv("CACHE_BACKEND", "memory")
+    with pytest.raises(SystemExit, match="CACHE_BACKEND=memory"):
+        server.main()
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    server.main()
+    assert calls == ["src:app", "src:app"]
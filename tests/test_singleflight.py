@@ -0,0 +1,97 @@
+"""This module contains tests for the request coalescing in `src.utils.singleflight`."""
+
+import asyncio
+import os
+
+import pytest
+
+from src.utils.metrics import REGISTRY
+from src.utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_are_coalesced() -> None:
+    """Test that concurrent calls for the same key run the lookup once and share its result."""
+    group: SingleFlight[int] = SingleFlight("test_coalesced")
+    calls = []
+
+    async def lookup(key: str) -> int:
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return len(key)
+
+    async def run() -> list[int]:
+        requests = [group.do("a", lambda: lookup("a")) for _ in range(100)]
+        requests.append(group.do("bb", lambda: lookup("bb")))
+        return await asyncio.gather(*requests)
+
+    results = asyncio.run(run())
+    assert results == [1] * 100 + [2]
+    assert calls == ["a", "bb"]
+    assert group.stats.calls == 2
+    assert group.stats.coalesced == 99
+    assert f'singleflight_coalesced_total{{group="test_coalesced",worker="{os.getpid()}"}} 99' in REGISTRY.render()
+
+    # the lookup is done, the next call runs it again
+    assert asyncio.run(group.do("a", lambda: lookup("a"))) == 1
+    assert calls == ["a", "bb", "a"]
+
+
+def test_exception_is_shared() -> None:
+    """Test that every waiter receives the exception of the lookup."""
+    group: SingleFlight[int] = SingleFlight("test_exception")
+
+    async def lookup() -> int:
+        await asyncio.sleep(0.01)
+        raise RuntimeError
+
+    async def run() -> list[int | BaseException]:
+        return await asyncio.gather(*(group.do("a", lookup) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+    assert group.stats.calls == 1
+
+
+def test_cancelled_waiter_does_not_cancel_lookup() -> None:
+    """Test that cancelling the request that started the lookup does not cancel it for the others."""
+    group: SingleFlight[str] = SingleFlight("test_cancel")
+
+    async def lookup() -> str:
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run() -> str:
+        first = asyncio.create_task(group.do("a", lookup))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(group.do("a", lookup))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
+    assert group.stats.calls == 1
+    assert group.stats.coalesced == 1
+
+
+def test_forget_starts_a_new_lookup() -> None:
+    """Test that the calls after `forget` run a new lookup, while the earlier waiters keep the first one."""
+    group: SingleFlight[int] = SingleFlight("test_forget")
+    versions = iter(range(1, 10))
+
+    async def lookup() -> int:
+        version = next(versions)
+        await asyncio.sleep(0.01)
+        return version
+
+    async def run() -> list[int]:
+        before = asyncio.ensure_future(group.do("a", lookup))
+        await asyncio.sleep(0)
+        group.forget("a")
+        after = [group.do("a", lookup) for _ in range(2)]
+        return await asyncio.gather(before, *after)
+
+    assert asyncio.run(run()) == [1, 2, 2]
+    assert group.stats.calls == 2
+    # nothing is remembered once both lookups are done
+    assert group._calls == {}  # noqa: SLF001
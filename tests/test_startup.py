@@ -0,0 +1,134 @@
+"""This module contains tests for the startup routine and the startup benchmark of the application.
+
+For the benchmark, the application is imported in a fresh interpreter with `python -X importtime`, which reports
+the cumulative import time of every module. Importing must not need database settings nor load a database driver.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from src.startup import backoff_delays, run_migrations, wait_for_database
+
+# Database drivers are loaded when the first engine is created, never at import time.
+DATABASE_DRIVERS = {"MySQLdb", "pymysql", "aiomysql", "aiosqlite"}
+
+# The budget of `import src`, in milliseconds
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "5000"))
+
+
+def import_times(module: str) -> dict[str, float]:
+    """Import the module in a fresh interpreter and return the cumulative import time of every module in ms.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        dict[str, float]: The cumulative import time per imported module.
+    """
+    env = {name: value for name, value in os.environ.items() if not name.startswith(("MYSQL_", "PYTEST", "PYTHONPATH"))}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times: dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def test_import_src_does_not_load_database_drivers() -> None:
+    """Test that importing the application creates no engine and loads no database driver."""
+    times = import_times("src")
+    assert "src" in times
+    assert DATABASE_DRIVERS.isdisjoint(times)
+
+
+def test_import_models_is_metadata_only() -> None:
+    """Test that the models can be imported without database settings, e.g. by Alembic."""
+    times = import_times("database.models")
+    assert "database.models" in times
+    assert DATABASE_DRIVERS.isdisjoint(times)
+
+
+def test_import_src_time_budget() -> None:
+    """Test that importing the application stays within the budget (env IMPORT_TIME_BUDGET_MS)."""
+    times = import_times("src")
+    print(f"import src: {times['src']:.1f} ms")
+    assert times["src"] < IMPORT_TIME_BUDGET_MS
+
+
+def test_backoff_delays() -> None:
+    """Test that the delays double up to the maximum."""
+    delays = backoff_delays(initial=0.5, maximum=3)
+    assert [next(delays) for _ in range(5)] == [0.5, 1, 2, 3, 3]
+
+
+def test_wait_for_database() -> None:
+    """Test that a reachable database is detected on the first attempt."""
+    assert wait_for_database("sqlite:///:memory:", timeout=1) == 1
+
+
+def test_wait_for_database_timeout() -> None:
+    """Test that wait_for_database() gives up after the timeout."""
+    with pytest.raises(TimeoutError, match="Database is unreachable after"):
+        wait_for_database("sqlite:////nonexistent-directory/startup.db", timeout=0.3)
+
+
+def test_run_migrations() -> None:
+    """Test that the migrations are applied to the configured database."""
+    path = Path(tempfile.gettempdir()) / "startup_migrations.db"
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": f"sqlite:///{path}"}):
+        run_migrations()
+
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        assert "alembic_version" in inspect(engine).get_table_names()
+        assert "version" in {column["name"] for column in inspect(engine).get_columns("users")}
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT version_num FROM alembic_version")).scalar() is not None
+    finally:
+        engine.dispose()
+        path.unlink()
+
+
+def test_run_migrations_existing_users_table() -> None:
+    """Test that the version column and the indexes are added to a users table created before the migrations."""
+    path = Path(tempfile.gettempdir()) / "startup_existing.db"
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    "CREATE TABLE users "
+                    "(id INTEGER PRIMARY KEY, name VARCHAR(255), fullname VARCHAR(255), nickname VARCHAR(255))"
+                )
+            )
+            connection.execute(text("INSERT INTO users (name) VALUES ('old')"))
+
+        with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": f"sqlite:///{path}"}):
+            run_migrations()
+
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT version FROM users")).scalar() == 1
+        assert {index["name"] for index in inspect(engine).get_indexes("users")} == {
+            "ix_users_name",
+            "ix_users_nickname",
+        }
+    finally:
+        engine.dispose()
+        path.unlink()
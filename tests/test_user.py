@@ -1,30 +1,28 @@
 """This module contains tests for user-related operations."""
 
-import random
-import tempfile
-from collections.abc import Generator
-from pathlib import Path
+import asyncio
+import json
+from typing import Any
 from unittest.mock import patch
 
+import httpx
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy.dialects.sqlite.base import SQLiteDialect
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.models import User
 from src.app import app
+from src.endpoints.v1 import user as user_module
+from src.endpoints.v1.user import idempotent_creates, user_cache, user_creates, user_lookups
+from src.utils.async_database import dispose_async_engines
 from src.utils.database import Database
+from src.utils.query_profiler import assert_max_queries
 
 client = TestClient(app)
 
 
-@pytest.fixture
-def test_db() -> Generator[str, None, None]:
-    """Fixture for creating a temporary test database."""
-    path = f"sqlite:///{tempfile.gettempdir()}/{random.randint(1,1000)}test.db"
-    yield path
-    # path[0:10] is "sqlite:///", so we start from path[10:]
-    Path(path[10:]).unlink()
-
-
 def test_create_user(test_db: str) -> None:
     """Test creating a user."""
     path = test_db
@@ -97,3 +95,595 @@ def test_delete_user_notfound(test_db: str) -> None:
 
         data = response.json()
         assert data["detail"] == "User not found"
+
+
+def test_create_duplicate_users_get_distinct_ids(test_db: str) -> None:
+    """Test that identical users each get the ID generated by their own insert."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        user_data = {"name": "Twin", "fullname": "Twin Doe", "nickname": "twin"}
+        first = client.post("/v1/users", json=user_data).json()
+        second = client.post("/v1/users", json=user_data).json()
+        assert first["id"] != second["id"]
+
+        response = client.get(f"/v1/users/{second['id']}")
+        assert response.status_code == 200
+        assert response.json() == second
+
+
+def test_create_user_lastrowid(test_db: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the generated ID is read from lastrowid on dialects without INSERT ... RETURNING."""
+    path = test_db
+    monkeypatch.setattr(SQLiteDialect, "insert_returning", False)
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        user_data = {"name": "Row", "fullname": "Row Doe", "nickname": "row"}
+        created = client.post("/v1/users", json=user_data).json()
+
+        response = client.get(f"/v1/users/{created['id']}")
+        assert response.status_code == 200
+        assert response.json() == created
+
+
+def test_create_users_batch(test_db: str) -> None:
+    """Test creating users in a batch with an invalid item."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        users_data = [
+            {"name": "Ann", "fullname": "Ann Doe", "nickname": "ann"},
+            {"name": "Bob", "fullname": "Bob Doe"},
+            {"name": "Cid", "fullname": "Cid Doe", "nickname": "cid"},
+        ]
+        response = client.post("/v1/users:batch", json=users_data)
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [result["index"] for result in results] == [0, 1, 2]
+        assert results[0]["user"]["nickname"] == "ann"
+        assert results[1]["user"] is None
+        assert "nickname" in results[1]["error"]
+        assert results[2]["user"]["nickname"] == "cid"
+
+        for index in (0, 2):
+            response = client.get(f"/v1/users/{results[index]['user']['id']}")
+            assert response.json() == results[index]["user"]
+
+
+def test_create_users_batch_malformed_items(test_db: str) -> None:
+    """Test that items that are not objects are reported by index, and that the schema documents the items."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        users_data = [5, {"name": "Dee", "fullname": "Dee Doe", "nickname": "dee"}, None, "user"]
+        response = client.post("/v1/users:batch", json=users_data)
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [result["index"] for result in results] == [0, 1, 2, 3]
+        assert results[1]["user"]["nickname"] == "dee"
+        for index in (0, 2, 3):
+            assert results[index]["user"] is None
+            assert results[index]["error"].startswith("Input should be a valid dictionary")
+
+    schema = app.openapi()["paths"]["/v1/users:batch"]["post"]["requestBody"]["content"]["application/json"]["schema"]
+    assert {"$ref": "#/components/schemas/UserCreate"} in schema["items"]["anyOf"]
+
+
+def test_create_users_batch_without_returning(test_db: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test creating users in a batch on dialects without executemany RETURNING."""
+    path = test_db
+    monkeypatch.setattr(SQLiteDialect, "insert_executemany_returning_sort_by_parameter_order", False)
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        users_data = [{"name": f"User{i}", "fullname": f"User {i}", "nickname": f"user{i}"} for i in range(3)]
+        results = client.post("/v1/users:batch", json=users_data).json()["results"]
+        ids = [result["user"]["id"] for result in results]
+        assert len(set(ids)) == 3
+
+        response = client.get("/v1/users", params={"ids": ids})
+        assert [user["nickname"] for user in response.json()["users"]] == ["user0", "user1", "user2"]
+
+
+def test_create_users_batch_too_large(test_db: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a batch larger than the configured maximum is rejected."""
+    path = test_db
+    monkeypatch.setattr("src.endpoints.v1.user.BATCH_CREATE_MAX_SIZE", 2)
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        users_data = [{"name": "A", "fullname": "A A", "nickname": f"a{i}"} for i in range(3)]
+        response = client.post("/v1/users:batch", json=users_data)
+        assert response.status_code == 400
+
+
+def test_get_users_by_ids(test_db: str) -> None:
+    """Test retrieving many users by ID, in request order and with missing IDs reported."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        users_data = [{"name": f"User{i}", "fullname": f"User {i}", "nickname": f"user{i}"} for i in range(3)]
+        results = client.post("/v1/users:batch", json=users_data).json()["results"]
+        ids = [result["user"]["id"] for result in results]
+
+        response = client.get("/v1/users", params={"ids": [ids[2], -1, ids[0], ids[2]]})
+        assert response.status_code == 200
+        data = response.json()
+        assert [user["id"] for user in data["users"]] == [ids[2], ids[0]]
+        assert data["missing"] == [-1]
+
+
+def test_get_users_by_ids_too_many(test_db: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a lookup of more IDs than the configured maximum is rejected."""
+    path = test_db
+    monkeypatch.setattr("src.endpoints.v1.user.BATCH_LOOKUP_MAX_SIZE", 2)
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        response = client.get("/v1/users", params={"ids": [1, 2, 3]})
+        assert response.status_code == 400
+
+
+def test_list_users_keyset_pagination(test_db: str) -> None:
+    """Test listing users page by page with the opaque cursor."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        users_data = [{"name": f"User{i}", "fullname": f"User {i}", "nickname": f"user{i}"} for i in range(5)]
+        client.post("/v1/users:batch", json=users_data)
+
+        nicknames: list[str] = []
+        params: dict[str, str | int] = {"limit": 2}
+        pages = 0
+        while True:
+            response = client.get("/v1/users", params=params)
+            assert response.status_code == 200
+            data = response.json()
+            nicknames += [user["nickname"] for user in data["users"]]
+            pages += 1
+            if data["next_cursor"] is None:
+                break
+            params["cursor"] = data["next_cursor"]
+
+        assert nicknames == [f"user{i}" for i in range(5)]
+        assert pages == 3
+
+
+def test_list_users_invalid_cursor(test_db: str) -> None:
+    """Test that a malformed cursor is rejected."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        response = client.get("/v1/users", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_list_users_stream(test_db: str) -> None:
+    """Test streaming users after a cursor as NDJSON."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        users_data = [{"name": f"User{i}", "fullname": f"User {i}", "nickname": f"user{i}"} for i in range(5)]
+        client.post("/v1/users:batch", json=users_data)
+        cursor = client.get("/v1/users", params={"limit": 2}).json()["next_cursor"]
+
+        response = client.get("/v1/users", params={"stream": True, "cursor": cursor})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [user["nickname"] for user in lines] == ["user2", "user3", "user4"]
+
+        response = client.get("/v1/users", params={"stream": True, "ids": [1, 2]})
+        assert response.status_code == 400
+
+
+def test_list_users_stream_chunks(test_db: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the stream sends one chunk per partition of the cursor, not one per row."""
+    monkeypatch.setattr(user_module, "STREAM_CHUNK_SIZE", 2)
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        users_data = [{"name": f"User{i}", "fullname": f"User {i}", "nickname": f"user{i}"} for i in range(5)]
+        client.post("/v1/users:batch", json=users_data)
+
+        async def collect() -> list[bytes]:
+            chunks = [chunk async for chunk in user_module._stream_users(0)]  # noqa: SLF001
+            await dispose_async_engines()
+            return chunks
+
+        chunks = asyncio.run(collect())
+        assert [chunk.count(b"\n") for chunk in chunks] == [2, 2, 1]
+        assert [json.loads(line)["nickname"] for line in b"".join(chunks).splitlines()] == [
+            f"user{i}" for i in range(5)
+        ]
+
+
+def test_get_user_cached(test_db: str) -> None:
+    """Test that a user read is served from the cache until the user is deleted."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        user_data = {"name": "Cache", "fullname": "Cache Doe", "nickname": "cache"}
+        user_id = client.post("/v1/users", json=user_data).json()["id"]
+
+        hits = user_cache.stats.hits
+        assert client.get(f"/v1/users/{user_id}").status_code == 200
+        assert user_cache.stats.hits == hits
+
+        # the row is changed behind the cache's back, the cached value is still served
+        db = Database().connect()
+        with db.session() as session:
+            session.query(User).filter(User.id == user_id).update({"nickname": "changed"})
+
+        response = client.get(f"/v1/users/{user_id}")
+        assert response.json()["nickname"] == "cache"
+        assert user_cache.stats.hits == hits + 1
+
+        assert client.delete(f"/v1/users/{user_id}").status_code == 200
+        assert client.get(f"/v1/users/{user_id}").status_code == 404
+
+
+def test_user_endpoints_query_count(test_db: str) -> None:
+    """Test the number of statements executed by the user endpoints."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        # the first request creates the tables
+        client.get("/v1/users/0")
+
+        user_data = {"name": "Count", "fullname": "Count Doe", "nickname": "count"}
+        with assert_max_queries(1):
+            user_id = client.post("/v1/users", json=user_data).json()["id"]
+
+        with assert_max_queries(1):
+            client.get(f"/v1/users/{user_id}")
+
+        # served from the cache
+        with assert_max_queries(0):
+            client.get(f"/v1/users/{user_id}")
+
+        with assert_max_queries(1):
+            client.get("/v1/users", params={"ids": [user_id, 0]})
+
+
+def test_get_user_conditional(test_db: str) -> None:
+    """Test that a user has a weak ETag and a matching If-None-Match is answered with 304."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        user_id = client.post("/v1/users", json={"name": "Etag", "fullname": "E Tag", "nickname": "et"}).json()["id"]
+
+        response = client.get(f"/v1/users/{user_id}")
+        etag = response.headers["etag"]
+        assert etag.startswith('W/"')
+
+        # the user is cached now, the 304 is answered without reading the database
+        with assert_max_queries(0):
+            response = client.get(f"/v1/users/{user_id}", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        asyncio.run(user_cache.clear())
+        response = client.get(f"/v1/users/{user_id}", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        response = client.get(f"/v1/users/{user_id}", headers={"If-None-Match": 'W/"other"'})
+        assert response.status_code == 200
+        assert response.headers["etag"] == etag
+
+
+def test_list_users_conditional(test_db: str) -> None:
+    """Test that pages of users have a weak ETag that changes when a user is deleted."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        users_data = [{"name": f"User{i}", "fullname": f"User {i}", "nickname": f"user{i}"} for i in range(3)]
+        ids = [result["user"]["id"] for result in client.post("/v1/users:batch", json=users_data).json()["results"]]
+
+        etag = client.get("/v1/users").headers["etag"]
+        assert client.get("/v1/users", headers={"If-None-Match": etag}).status_code == 304
+        ids_etag = client.get("/v1/users", params={"ids": [*ids, -1]}).headers["etag"]
+        assert ids_etag != etag
+
+        client.delete(f"/v1/users/{ids[1]}")
+        assert client.get("/v1/users", headers={"If-None-Match": etag}).status_code == 200
+        response = client.get("/v1/users", params={"ids": [*ids, -1]}, headers={"If-None-Match": ids_etag})
+        assert response.status_code == 200
+
+
+def test_list_users_compressed(test_db: str) -> None:
+    """Test that large responses are compressed for clients accepting gzip."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        users_data = [{"name": f"User{i}", "fullname": f"User {i}", "nickname": f"user{i}"} for i in range(20)]
+        client.post("/v1/users:batch", json=users_data)
+
+        response = client.get("/v1/users", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.json()["users"]) == 20
+
+
+def test_update_user(test_db: str) -> None:
+    """Test updating a user with a single statement, which increments its version."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        created = client.post("/v1/users", json={"name": "Pat", "fullname": "Pat Doe", "nickname": "pat"}).json()
+        assert created["version"] == 1
+        client.get(f"/v1/users/{created['id']}")
+
+        with assert_max_queries(1):
+            response = client.patch(f"/v1/users/{created['id']}", json={"nickname": "patty"})
+        assert response.status_code == 200
+        assert response.json() == {**created, "nickname": "patty", "version": 2}
+        assert response.headers["etag"] == 'W/"2"'
+
+        # the cached user was invalidated
+        assert client.get(f"/v1/users/{created['id']}").json()["nickname"] == "patty"
+
+
+def test_update_user_if_match(test_db: str) -> None:
+    """Test that an update with an outdated If-Match is rejected, so concurrent updates are not lost."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        created = client.post("/v1/users", json={"name": "Pat", "fullname": "Pat Doe", "nickname": "pat"}).json()
+        url = f"/v1/users/{created['id']}"
+        etag = client.get(url).headers["etag"]
+
+        assert client.patch(url, json={"name": "First"}, headers={"If-Match": etag}).status_code == 200
+        response = client.patch(url, json={"name": "Second"}, headers={"If-Match": etag})
+        assert response.status_code == 412
+        assert client.get(url).json()["name"] == "First"
+
+        assert client.patch(url, json={"name": "Second"}, headers={"If-Match": '"2"'}).status_code == 200
+        assert client.patch(url, json={"name": "Third"}, headers={"If-Match": "invalid"}).status_code == 412
+        assert client.patch(url, json={}).status_code == 400
+        assert client.patch("/v1/users/999999", json={"name": "Nobody"}).status_code == 404
+
+
+def test_update_user_rejects_null(test_db: str) -> None:
+    """Test that an explicit null is rejected instead of being ignored, as the fields can't be cleared."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        created = client.post("/v1/users", json={"name": "Pat", "fullname": "Pat Doe", "nickname": "pat"}).json()
+        url = f"/v1/users/{created['id']}"
+
+        response = client.patch(url, json={"name": "Patricia", "nickname": None})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "nickname"]
+        assert client.get(url).json() == created
+
+
+def test_delete_user_if_match(test_db: str) -> None:
+    """Test that a delete with an outdated If-Match is rejected with a single statement per attempt."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        created = client.post("/v1/users", json={"name": "Del", "fullname": "Del Doe", "nickname": "del"}).json()
+        url = f"/v1/users/{created['id']}"
+        client.patch(url, json={"name": "Changed"})
+
+        assert client.delete(url, headers={"If-Match": 'W/"1"'}).status_code == 412
+        assert client.get(url).status_code == 200
+
+        with assert_max_queries(1):
+            response = client.delete(url, headers={"If-Match": 'W/"2"'})
+        assert response.status_code == 200
+        assert response.json()["name"] == "Changed"
+        assert client.get(url).status_code == 404
+
+
+def test_update_and_delete_user_without_returning(test_db: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the conditional update and delete on dialects without UPDATE/DELETE ... RETURNING."""
+    path = test_db
+    monkeypatch.setattr(SQLiteDialect, "update_returning", False)
+    monkeypatch.setattr(SQLiteDialect, "delete_returning", False)
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        created = client.post("/v1/users", json={"name": "My", "fullname": "My Sql", "nickname": "my"}).json()
+        url = f"/v1/users/{created['id']}"
+
+        response = client.patch(url, json={"name": "Maria"}, headers={"If-Match": 'W/"1"'})
+        assert response.json() == {**created, "name": "Maria", "version": 2}
+        assert client.patch(url, json={"name": "Lost"}, headers={"If-Match": 'W/"1"'}).status_code == 412
+
+        assert client.delete(url, headers={"If-Match": 'W/"1"'}).status_code == 412
+        assert client.delete(url, headers={"If-Match": 'W/"2"'}).json()["name"] == "Maria"
+        assert client.delete(url).status_code == 404
+
+
+def test_user_version_orm(test_db: str) -> None:
+    """Test that ORM updates increment the version and stale ORM updates fail."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        db = Database().connect()
+        with db.session() as session:
+            db_user = User(name="Orm", fullname="Orm Doe", nickname="orm")
+            session.add(db_user)
+        assert db_user.version == 1
+
+        with db.session() as session:
+            stored = session.get(User, db_user.id)
+            assert stored is not None
+            stored.name = "Orm2"  # type: ignore[assignment]
+        assert stored.version == 2
+
+        def update_stale() -> None:
+            with db.session() as session:
+                session.add(stored)
+                stored.name = "Stale"  # type: ignore[assignment]
+
+        client.patch(f"/v1/users/{db_user.id}", json={"name": "Api"})
+        with pytest.raises(SQLAlchemyError, match="expected to update 1 row"):
+            update_stale()
+
+
+def test_get_users_by_name(test_db: str) -> None:
+    """Test listing the users with a name, paginated by ID."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        users_data = [{"name": f"Same{i % 2}", "fullname": f"User {i}", "nickname": f"nick{i % 3}"} for i in range(6)]
+        ids = [result["user"]["id"] for result in client.post("/v1/users:batch", json=users_data).json()["results"]]
+
+        first = client.get("/v1/users/by-name/Same0", params={"limit": 2}).json()
+        assert [user["id"] for user in first["users"]] == [ids[0], ids[2]]
+        second = client.get("/v1/users/by-name/Same0", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+        assert [user["id"] for user in second["users"]] == [ids[4]]
+        assert second["next_cursor"] is None
+
+        response = client.get("/v1/users/by-nickname/nick1")
+        assert [user["id"] for user in response.json()["users"]] == [ids[1], ids[4]]
+        assert client.get("/v1/users/by-name/Nobody").json()["users"] == []
+
+
+def test_get_user_concurrent_requests_are_coalesced(test_db: str) -> None:
+    """Test that concurrent cache misses for the same user run a single query."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        user_data = {"name": "Popular", "fullname": "Popular Doe", "nickname": "popular"}
+        user_id = client.post("/v1/users", json=user_data).json()["id"]
+        asyncio.run(user_cache.clear())
+
+        async def get_concurrently() -> list[httpx.Response]:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                return await asyncio.gather(*(async_client.get(f"/v1/users/{user_id}") for _ in range(50)))
+
+        coalesced = user_lookups.stats.coalesced
+        with assert_max_queries(1):
+            responses = asyncio.run(get_concurrently())
+        assert {response.status_code for response in responses} == {200}
+        assert {response.json()["nickname"] for response in responses} == {"popular"}
+        assert user_lookups.stats.coalesced - coalesced == 49
+        asyncio.run(dispose_async_engines())
+
+
+def test_load_user_does_not_cache_a_row_deleted_during_the_read(test_db: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a cache miss whose read interleaves with a delete does not store the deleted row."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        user_data = {"name": "Racy", "fullname": "Racy Doe", "nickname": "racy"}
+        user_id = client.post("/v1/users", json=user_data).json()["id"]
+        asyncio.run(user_cache.clear())
+
+        async def delete_during_load() -> None:
+            read, release = asyncio.Event(), asyncio.Event()
+            execute = AsyncSession.execute
+
+            async def paused_execute(self: AsyncSession, *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+                result = await execute(self, *args, **kwargs)
+                read.set()
+                await release.wait()
+                return result
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                with monkeypatch.context() as m:
+                    m.setattr(AsyncSession, "execute", paused_execute)
+                    load = asyncio.create_task(user_module.load_user(user_id))
+                    await read.wait()
+                # the row is deleted and invalidated after the read, before the fill
+                assert (await async_client.delete(f"/v1/users/{user_id}")).status_code == 200
+                release.set()
+                assert (await load) is not None
+            assert await user_cache.get(str(user_id)) is None
+            await dispose_async_engines()
+
+        asyncio.run(delete_during_load())
+        assert client.get(f"/v1/users/{user_id}").status_code == 404
+
+
+def test_get_user_after_delete_does_not_join_an_earlier_lookup(test_db: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a read after a delete runs a new lookup instead of sharing one started before the delete."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        user_data = {"name": "Joiner", "fullname": "Joiner Doe", "nickname": "joiner"}
+        user_id = client.post("/v1/users", json=user_data).json()["id"]
+        asyncio.run(user_cache.clear())
+
+        async def get_around_delete() -> tuple[int, int]:
+            read, release = asyncio.Event(), asyncio.Event()
+            execute = AsyncSession.execute
+
+            async def paused_execute(self: AsyncSession, *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+                result = await execute(self, *args, **kwargs)
+                read.set()
+                await release.wait()
+                return result
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                with monkeypatch.context() as m:
+                    m.setattr(AsyncSession, "execute", paused_execute)
+                    before = asyncio.create_task(async_client.get(f"/v1/users/{user_id}"))
+                    await read.wait()
+                assert (await async_client.delete(f"/v1/users/{user_id}")).status_code == 200
+                # would wait for the paused lookup if it shared it
+                after = await asyncio.wait_for(async_client.get(f"/v1/users/{user_id}"), timeout=5)
+                release.set()
+                response = await before
+            await dispose_async_engines()
+            return response.status_code, after.status_code
+
+        calls = user_lookups.stats.calls
+        assert asyncio.run(get_around_delete()) == (200, 404)
+        assert user_lookups.stats.calls == calls + 2
+        assert asyncio.run(user_cache.get(str(user_id))) is None
+
+
+def test_create_users_group_commit(test_db: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that concurrent creates are inserted in one batch and each request gets its own ID."""
+    monkeypatch.setattr(user_module, "GROUP_COMMIT_ENABLED", True)
+    monkeypatch.setattr(user_creates, "window", 0.05)
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        # the first request creates the tables
+        client.get("/v1/users/0")
+
+        async def create_concurrently() -> list[httpx.Response]:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                users = [{"name": f"group{i}", "fullname": "Group Doe", "nickname": f"g{i}"} for i in range(20)]
+                return await asyncio.gather(*(async_client.post("/v1/users", json=user) for user in users))
+
+        batches = user_creates.stats.batches
+        responses = asyncio.run(create_concurrently())
+        asyncio.run(dispose_async_engines())
+        assert user_creates.stats.batches == batches + 1
+
+        assert {response.status_code for response in responses} == {200}
+        created = {response.json()["id"]: response.json()["name"] for response in responses}
+        assert len(created) == 20
+        for user_id, name in created.items():
+            assert client.get(f"/v1/users/{user_id}").json()["name"] == name
+
+
+def test_create_user_idempotency_key(test_db: str) -> None:
+    """Test that a retry with the same Idempotency-Key replays the stored response without inserting again."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        user_data = {"name": "Retry", "fullname": "Retry Doe", "nickname": "retry"}
+        headers = {"Idempotency-Key": "create-retry-1"}
+        first = client.post("/v1/users", json=user_data, headers=headers)
+        assert first.status_code == 200
+        assert "idempotent-replayed" not in first.headers
+
+        # the lookup of the stored response, without touching the users table
+        with assert_max_queries(1) as profiler:
+            retry = client.post("/v1/users", json=user_data, headers=headers)
+        assert all("users" not in query.statement for query in profiler.queries)
+        assert retry.status_code == 200
+        assert retry.json() == first.json()
+        assert retry.headers["idempotent-replayed"] == "true"
+
+        other = client.post("/v1/users", json={**user_data, "nickname": "other"}, headers=headers)
+        assert other.status_code == 422
+        assert client.post("/v1/users", json=user_data, headers={"Idempotency-Key": "x" * 256}).status_code == 400
+
+        assert [user["id"] for user in client.get("/v1/users/by-name/Retry").json()["users"]] == [first.json()["id"]]
+
+
+def test_create_user_idempotency_key_concurrent(test_db: str) -> None:
+    """Test that concurrent requests with the same Idempotency-Key wait for the first one and create one user."""
+    path = test_db
+    with patch.dict("os.environ", {"PYTEST": "true", "PYTEST_DB": path}):
+        # the first request creates the tables
+        client.get("/v1/users/0")
+        user_data = {"name": "Storm", "fullname": "Storm Doe", "nickname": "storm"}
+
+        async def create_concurrently() -> list[httpx.Response]:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                return await asyncio.gather(
+                    *(
+                        async_client.post("/v1/users", json=user_data, headers={"Idempotency-Key": "storm"})
+                        for _ in range(20)
+                    )
+                )
+
+        coalesced = idempotent_creates.stats.coalesced
+        responses = asyncio.run(create_concurrently())
+        asyncio.run(dispose_async_engines())
+        assert {response.status_code for response in responses} == {200}
+        assert len({response.json()["id"] for response in responses}) == 1
+        assert idempotent_creates.stats.coalesced - coalesced == 19
+        assert len(client.get("/v1/users/by-name/Storm").json()["users"]) == 1